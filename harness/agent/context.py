@@ -0,0 +1,159 @@
+import json
+from typing import Callable, Dict, List, Optional, Tuple
+
+from harness.agent.tool_cache import norm_path, normalize_args
+from harness.config import env_int
+from harness.tokens import estimate_tokens
+
+
+# Tools whose results go stale once a path is modified
+READ_TOOLS = {"READ"}
+# Tools whose results list locations across files; stale once any listed file is modified
+LISTING_TOOLS = {"LIST_TREE", "GREP", "FIND_SYMBOL", "FIND_REFERENCES"}
+# Tools that modify the path given in their `path` argument
+MUTATING_TOOLS = {"WRITE", "REPLACE", "REPLACE_LINES"}
+# Most recent turns are always sent verbatim
+KEEP_RECENT_TURNS = 2
+ASSISTANT_KEEP_CHARS = 400
+
+
+def get_context_budget_default() -> int:
+    return env_int("EDIT_CONTEXT_BUDGET", 24000)
+
+
+def _args_key(tool: str, args: Dict) -> str:
+    # Same normalisation as the tool cache: `./a.py` and `a.py`, explicit defaults
+    return tool + ":" + normalize_args(tool, args)
+
+
+def _path(args: Dict) -> Optional[str]:
+    return norm_path(args["path"]) if args.get("path") else None
+
+
+def _ok(text: str) -> bool:
+    """Whether a ```result block reports success; a failed write leaves the file as it was."""
+    body = text[len("```result\n") : -len("\n```")] if text.startswith("```result\n") else text
+    try:
+        return json.loads(body).get("ok") is True
+    except (ValueError, AttributeError):
+        return False
+
+
+class _Result:
+    def __init__(self, tool: Optional[str], args: Dict, text: str) -> None:
+        self.tool = tool
+        self.args = args
+        self.text = text
+        self.elided: Optional[str] = None
+
+    def render(self) -> str:
+        if self.elided is None:
+            return self.text
+        stub = {"ok": True, "elided": self.elided, "tool": self.tool}
+        if self.args.get("path"):
+            stub["path"] = self.args["path"]
+        return f"```result\n{json.dumps(stub)}\n```"
+
+
+class _Turn:
+    def __init__(self, assistant: str, results: List[_Result]) -> None:
+        self.assistant = assistant
+        self.results = results
+        self.assistant_trimmed = False
+
+    def assistant_text(self) -> str:
+        if not self.assistant_trimmed or len(self.assistant) <= ASSISTANT_KEEP_CHARS:
+            return self.assistant
+        return self.assistant[:ASSISTANT_KEEP_CHARS] + f"\n[... {len(self.assistant) - ASSISTANT_KEEP_CHARS} chars elided]"
+
+
+class EditContext:
+    """Conversation history for the edit loop, compacted to a token budget.
+
+    The system prompt and task message are a fixed prefix so provider prompt
+    caching can hit. Older tool results are elided when superseded (a READ of a
+    path later written successfully, a listing such as GREP or FIND_SYMBOL that
+    names such a path, or a repeat of the same call) and, if the history is
+    still over budget, oldest-first. Elisions are sticky (nothing elided comes
+    back), but superseded elision rewrites earlier turns, so only the prefix
+    is guaranteed stable across calls.
+    """
+
+    def __init__(
+        self, system: str, task: str, budget: Optional[int] = None, count: Optional[Callable[[str], int]] = None
+    ) -> None:
+        self.prefix = [{"role": "system", "content": system}, {"role": "user", "content": task}]
+        self.budget = get_context_budget_default() if budget is None else budget
+        self.count = count or estimate_tokens
+        self.turns: List[_Turn] = []
+        self.raw_tokens_per_turn: List[int] = []
+        self.sent_tokens_per_turn: List[int] = []
+        self.elided = 0
+
+    def add_turn(self, assistant: str, results: List[Tuple[Optional[str], Dict, str]]) -> None:
+        """Record an assistant reply and the result blocks sent back for it."""
+        self.turns.append(_Turn(assistant, [_Result(t, a or {}, txt) for t, a, txt in results]))
+        if self.budget:
+            self._elide_superseded()
+
+    def _elide(self, res: _Result, reason: str) -> None:
+        if res.elided is None:
+            res.elided = reason
+            self.elided += 1
+
+    def _elide_superseded(self) -> None:
+        latest = self.turns[-1]
+        written = {_path(r.args) for r in latest.results if r.tool in MUTATING_TOOLS and r.args.get("path") and _ok(r.text)}
+        keys = {_args_key(r.tool, r.args) for r in latest.results if r.tool}
+        for turn in self.turns[:-1]:
+            for res in turn.results:
+                if res.tool in READ_TOOLS and _path(res.args) in written:
+                    self._elide(res, "superseded: file was modified later")
+                elif res.tool in LISTING_TOOLS and any(json.dumps(p) in res.text for p in written):
+                    self._elide(res, "superseded: lists a file that was modified later")
+                elif res.tool and _args_key(res.tool, res.args) in keys:
+                    self._elide(res, "duplicate of a later identical call")
+
+    def _build(self) -> List[Dict[str, str]]:
+        msgs = list(self.prefix)
+        for turn in self.turns:
+            msgs.append({"role": "assistant", "content": turn.assistant_text()})
+            msgs.append({"role": "user", "content": "\n".join(r.render() for r in turn.results)})
+        return msgs
+
+    def _tokens(self, msgs: List[Dict[str, str]]) -> int:
+        return sum(self.count(m["content"]) for m in msgs)
+
+    def messages(self) -> List[Dict[str, str]]:
+        """Messages to send for the next call; also records per-turn token estimates."""
+        raw = self._tokens(self.prefix) + sum(
+            self.count(t.assistant) + sum(self.count(r.text) for r in t.results) for t in self.turns
+        )
+        msgs = self._build()
+        if self.budget:
+            old = self.turns[:-KEEP_RECENT_TURNS] if KEEP_RECENT_TURNS else self.turns
+            # Oldest results first, then oldest assistant replies (WRITE bodies etc.)
+            for turn in old:
+                if self._tokens(msgs) <= self.budget:
+                    break
+                for res in turn.results:
+                    self._elide(res, "dropped to fit the context budget")
+                msgs = self._build()
+            for turn in old:
+                if self._tokens(msgs) <= self.budget:
+                    break
+                turn.assistant_trimmed = True
+                msgs = self._build()
+        self.raw_tokens_per_turn.append(raw)
+        self.sent_tokens_per_turn.append(self._tokens(msgs))
+        return msgs
+
+    def stats(self) -> Dict:
+        return {
+            "budget": self.budget,
+            "elided_results": self.elided,
+            "est_prompt_tokens_per_turn_raw": self.raw_tokens_per_turn,
+            "est_prompt_tokens_per_turn_sent": self.sent_tokens_per_turn,
+            "est_prompt_tokens_total_raw": sum(self.raw_tokens_per_turn),
+            "est_prompt_tokens_total_sent": sum(self.sent_tokens_per_turn),
+        }
@@ -3,15 +3,29 @@ import os
 import re
 import shutil
 import tempfile
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
+from harness.config import env_int
 from harness.providers.openai_compat import OpenAICompatChat, OpenAICompatError
-from harness.preflight import ensure_repo
+from harness.preflight import ensure_repo, repo_lock
+from harness.agent.context import EditContext, get_context_budget_default
+from harness.agent.line_index import read_window
+from harness.agent.tool_cache import TOOL_CACHE, affected, norm_path, normalize_args
+from harness.agent.tree_manifest import get_manifest, list_tree, overlay_entries
+from harness.agent.symbol_index import find_references, find_symbol, get_symbol_index, overlay_index
+from harness.deadline import DeadlineExceeded, budget as time_budget, stop_reason, within
+from harness.status import set_stage
+from harness.tokens import TokenBudget, budget_for, fit_sections, truncate_text
 
 
 CALL_BLOCK_RE = re.compile(r"```call\n(\{[\s\S]*?\})\n```", re.MULTILINE)
+READ_ONLY_TOOLS = {"LIST_TREE", "GREP", "READ", "FIND_SYMBOL", "FIND_REFERENCES"}
+_TOOL_POOL = ThreadPoolExecutor(max_workers=env_int("EDIT_TOOL_WORKERS", 4), thread_name_prefix="edit-tool")
 
 
 def _safe_join(root: Path, rel: str) -> Path:
@@ -21,29 +35,6 @@ def _safe_join(root: Path, rel: str) -> Path:
     return p
 
 
-def _list_tree(root: Path, limit: int = 500) -> Dict:
-    entries = []
-    count = 0
-    for dirpath, dirnames, filenames in os.walk(root):
-        # Skip VCS
-        if ".git" in dirnames:
-            dirnames.remove(".git")
-        for fn in filenames:
-            fp = Path(dirpath) / fn
-            try:
-                st = fp.stat()
-                size = st.st_size
-            except OSError:
-                size = 0
-            ext = fp.suffix
-            rel = fp.relative_to(root).as_posix()
-            entries.append({"path": rel, "bytes": size, "ext": ext})
-            count += 1
-            if count >= limit:
-                return {"ok": True, "entries": entries, "truncated": True}
-    return {"ok": True, "entries": entries, "truncated": False}
-
-
 def _grep(root: Path, pattern: str, glob: str = "**/*.py", max_hits: int = 50) -> Dict:
     import fnmatch
     import io
@@ -72,16 +63,37 @@ def _grep(root: Path, pattern: str, glob: str = "**/*.py", max_hits: int = 50) -
     return {"ok": True, "hits": hits, "truncated": False}
 
 
-def _read(root: Path, path: str, max_bytes: int = 20000) -> Dict:
+def _read(
+    root: Path,
+    path: str,
+    max_bytes: int = 20000,
+    start_line: Optional[int] = None,
+    end_line: Optional[int] = None,
+    around_line: Optional[int] = None,
+    context: int = 40,
+) -> Dict:
     try:
         fp = _safe_join(root, path)
+        if around_line is not None:
+            start_line, end_line = around_line - context, around_line + context
+        if start_line is not None or end_line is not None:
+            res = read_window(str(fp), int(start_line or 1), None if end_line is None else int(end_line), max_bytes)
+            return {"ok": True, "path": path, **res, "encoding": "utf-8"}
         data = Path(fp).read_bytes()
         content = data[:max_bytes].decode("utf-8", errors="replace")
-        return {"ok": True, "content": content, "truncated": len(data) > max_bytes, "encoding": "utf-8"}
+        res = {"ok": True, "content": content, "truncated": len(data) > max_bytes, "encoding": "utf-8"}
+        if res["truncated"]:
+            res["total_lines"] = data.count(b"\n")
+            res["hint"] = "file truncated; READ with start_line/end_line or around_line for the rest"
+        return res
     except Exception as e:
         return {"ok": False, "error": str(e)}
 
 
+def _opt_int(v) -> Optional[int]:
+    return None if v is None else int(v)
+
+
 def _write(root: Path, path: str, content: str, encoding: str = "utf-8") -> Dict:
     try:
         fp = _safe_join(root, path)
@@ -94,6 +106,69 @@ def _write(root: Path, path: str, content: str, encoding: str = "utf-8") -> Dict
         return {"ok": False, "error": str(e)}
 
 
+def _atomic_write_bytes(fp: Path, data: bytes) -> None:
+    tmp = fp.with_suffix(fp.suffix + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, fp)
+
+
+def _replace(root: Path, path: str, old: str, new: str, replace_all: bool = False) -> Dict:
+    """Exact search/replace; `old` must match exactly once unless replace_all."""
+    try:
+        fp = _safe_join(root, path)
+        text = fp.read_bytes().decode("utf-8")
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+    if not old:
+        return {"ok": False, "error": "old must be non-empty"}
+    n = text.count(old)
+    if n == 0:
+        first = old.strip().splitlines()[0].strip() if old.strip() else ""
+        near = [i for i, ln in enumerate(text.splitlines(), 1) if first and first in ln][:5]
+        err = "old text not found (must match exactly, including indentation)"
+        if near:
+            err += f"; first line of old appears at line(s) {near} - READ around them and copy exactly"
+        return {"ok": False, "error": err}
+    if n > 1 and not replace_all:
+        return {"ok": False, "error": f"old text matches {n} times; include more context to make it unique or set all=true"}
+    line = text[: text.index(old)].count("\n") + 1
+    out = text.replace(old, new) if replace_all else text.replace(old, new, 1)
+    try:
+        _atomic_write_bytes(fp, out.encode("utf-8"))
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+    return {"ok": True, "replacements": n if replace_all else 1, "line": line}
+
+
+def _replace_lines(root: Path, path: str, start_line: int, end_line: int, content: str) -> Dict:
+    """Replace lines [start_line, end_line] (1-based, inclusive) with `content`.
+
+    end_line = start_line - 1 inserts before start_line without removing anything.
+    """
+    try:
+        fp = _safe_join(root, path)
+        lines = fp.read_bytes().decode("utf-8").splitlines(keepends=True)
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+    total = len(lines)
+    if start_line < 1 or start_line > total + 1 or end_line < start_line - 1 or end_line > total:
+        return {"ok": False, "error": f"invalid line range {start_line}-{end_line}; file has {total} lines"}
+    if content and not content.endswith("\n"):
+        content += "\n"
+    new_lines = content.splitlines(keepends=True)
+    lines[start_line - 1 : end_line] = new_lines
+    try:
+        _atomic_write_bytes(fp, "".join(lines).encode("utf-8"))
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+    return {
+        "ok": True,
+        "removed_lines": end_line - start_line + 1,
+        "inserted_lines": len(new_lines),
+        "total_lines": len(lines),
+    }
+
+
 def _init_git(root: Path) -> None:
     import subprocess
 
@@ -110,19 +185,201 @@ def _export_diff(root: Path) -> str:
     return proc.stdout
 
 
-def _prepare_workspace(repo: str, commit: str | None) -> Path:
-    cache = ensure_repo(repo)
-    # checkout specific commit into cache (best-effort)
-    if commit:
-        import subprocess
+def _prepare_workspace(repo: str, commit: str | None) -> Tuple[Path, bool]:
+    """Copy of the repo at `commit` in a fresh temp dir; returns (workspace, verified).
 
-        subprocess.run(["git", "-C", str(cache), "fetch", "--depth", "1", "origin", commit], check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        subprocess.run(["git", "-C", str(cache), "checkout", commit], check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    The checkout is best-effort. `verified` is True only when the clone's HEAD
+    was `commit` while it was copied; only then may snapshot caches (manifest,
+    symbol index, tool results) be keyed by that commit.
+    """
+    import subprocess
+
+    cache = ensure_repo(repo)
     ws = Path(tempfile.mkdtemp(prefix="ws_"))
-    # copy snapshot without .git
-    shutil.copytree(cache, ws, dirs_exist_ok=True, ignore=shutil.ignore_patterns(".git"))
-    _init_git(ws)
-    return ws
+    try:
+        with repo_lock(repo):
+            verified = False
+            if commit:
+                # checkout specific commit into cache (within the task's deadline)
+                subprocess.run(["git", "-C", str(cache), "fetch", "--depth", "1", "origin", commit], check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=time_budget(120))
+                subprocess.run(["git", "-C", str(cache), "checkout", commit], check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=time_budget(60))
+                head = subprocess.run(["git", "-C", str(cache), "rev-parse", "HEAD"], capture_output=True, text=True, timeout=time_budget(30))
+                verified = head.returncode == 0 and head.stdout.strip() == commit
+            # copy snapshot without .git
+            shutil.copytree(cache, ws, dirs_exist_ok=True, ignore=shutil.ignore_patterns(".git"))
+        _init_git(ws)
+    except BaseException:
+        shutil.rmtree(ws, ignore_errors=True)
+        raise
+    return ws, verified
+
+
+class _Session:
+    """Per-attempt workspace plus the paths its overlay has modified so far.
+
+    `commit` is the verified base commit of the workspace, or None; without
+    it nothing is shared with other attempts (no snapshot or tool caches).
+    """
+
+    def __init__(self, ws: Path, repo: str, commit: Optional[str]) -> None:
+        self.ws = ws
+        self.snapshot = (repo, commit)
+        self.dirty: set = set()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._manifest: Optional[List[Dict]] = None
+        self._symbols: Optional[Dict] = None
+        # Read blocks run in parallel on _TOOL_POOL; build the lazy state once
+        self._lock = threading.RLock()
+
+    def manifest(self) -> List[Dict]:
+        with self._lock:
+            if self._manifest is None:
+                self._manifest = get_manifest(self.ws, *self.snapshot)
+            return self._manifest
+
+    def symbols(self) -> Dict:
+        with self._lock:
+            if self._symbols is None:
+                paths = [e["path"] for e in self.manifest()]
+                self._symbols = get_symbol_index(self.ws, *self.snapshot, paths)
+            symbols = self._symbols
+        return overlay_index(symbols, self.ws, self.dirty)
+
+    def count_cache(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+
+def _dispatch(sess: _Session, payload: Dict) -> Dict:
+    ws = sess.ws
+    tool = payload.get("tool")
+    result = {"ok": False, "error": "unknown tool"}
+    t0 = time.time()
+    try:
+        if tool == "LIST_TREE":
+            result = list_tree(
+                overlay_entries(sess.manifest(), ws, sess.dirty),
+                str(payload.get("prefix", "")),
+                payload.get("glob"),
+                _opt_int(payload.get("depth")),
+                payload.get("cursor"),
+                int(payload.get("limit", 500)),
+            )
+        elif tool == "GREP":
+            result = _grep(ws, str(payload.get("pattern", ".")), str(payload.get("glob", "**/*.py")), int(payload.get("max_hits", 50)))
+        elif tool == "READ":
+            result = _read(
+                ws,
+                str(payload.get("path", "")),
+                int(payload.get("max_bytes", 20000)),
+                _opt_int(payload.get("start_line")),
+                _opt_int(payload.get("end_line")),
+                _opt_int(payload.get("around_line")),
+                int(payload.get("context", 40)),
+            )
+        elif tool == "FIND_SYMBOL":
+            result = find_symbol(sess.symbols(), str(payload.get("name", "")), payload.get("kind"), int(payload.get("limit", 20)))
+        elif tool == "FIND_REFERENCES":
+            result = find_references(sess.symbols(), str(payload.get("name", "")), int(payload.get("limit", 50)))
+            for ref in result["references"]:
+                try:
+                    ref["text"] = read_window(str(_safe_join(ws, ref["path"])), ref["line"], ref["line"])["content"].split("| ", 1)[-1].strip()[:200]
+                except (OSError, ValueError):
+                    pass
+        elif tool == "WRITE":
+            result = _write(ws, str(payload.get("path", "")), str(payload.get("content", "")), str(payload.get("encoding", "utf-8")))
+        elif tool == "REPLACE":
+            result = _replace(ws, str(payload.get("path", "")), str(payload.get("old", "")), str(payload.get("new", "")), bool(payload.get("all", False)))
+        elif tool == "REPLACE_LINES":
+            result = _replace_lines(ws, str(payload.get("path", "")), int(payload.get("start_line", 0)), int(payload.get("end_line", 0)), str(payload.get("content", "")))
+    except Exception as e:
+        result = {"ok": False, "error": str(e)}
+    result["duration_s"] = round(time.time() - t0, 3)
+    return result
+
+
+def _session_dispatch(sess: _Session, payload: Dict) -> Dict:
+    """Dispatch through the shared read-only cache while the overlay allows it."""
+    tool = payload.get("tool")
+    if tool in READ_ONLY_TOOLS and not sess.snapshot[1]:
+        # Unverified snapshot: results may not match the commit they would be keyed by
+        return _dispatch(sess, payload)
+    if tool in READ_ONLY_TOOLS:
+        if affected(tool, payload, sess.dirty):
+            TOOL_CACHE.note_bypass()
+            return _dispatch(sess, payload)
+        key = (*sess.snapshot, tool, normalize_args(tool, payload))
+        hit = TOOL_CACHE.get(key)
+        if hit is not None:
+            sess.count_cache(True)
+            hit["cached"] = True
+            hit["duration_s"] = 0.0
+            return hit
+        sess.count_cache(False)
+        result = _dispatch(sess, payload)
+        if result.get("ok"):
+            TOOL_CACHE.put(key, result)
+        return result
+    result = _dispatch(sess, payload)
+    if payload.get("path"):
+        # Count failed writes too: a partial failure may still have touched the file
+        sess.dirty.add(norm_path(payload["path"]))
+    return result
+
+
+def _run_calls(sess: _Session, blocks: List[str]) -> List[Tuple[Optional[str], Dict, str]]:
+    """Execute the call blocks of one reply; returns (tool, args, result_block) in order.
+
+    Consecutive read-only calls run concurrently on a small shared pool;
+    any other call is a barrier and runs alone, so writes stay ordered.
+    """
+    parsed: List[Optional[Dict]] = []
+    out: List[Optional[Tuple[Optional[str], Dict, str]]] = [None] * len(blocks)
+    for i, raw in enumerate(blocks):
+        try:
+            payload = json.loads(raw)
+            if not isinstance(payload, dict):
+                raise ValueError("call must be a JSON object")
+            parsed.append(payload)
+        except Exception as e:
+            parsed.append(None)
+            out[i] = (None, {}, f"```result\n{json.dumps({'ok': False, 'error': f'invalid JSON: {e}', 'call_index': i})}\n```")
+
+    def finish(i: int, payload: Dict, result: Dict) -> None:
+        if len(blocks) > 1:
+            result["call_index"] = i
+        out[i] = (payload.get("tool"), payload, f"```result\n{json.dumps(result)}\n```")
+
+    i = 0
+    while i < len(blocks):
+        if parsed[i] is None:
+            i += 1
+            continue
+        j = i
+        while j < len(blocks) and parsed[j] is not None and parsed[j].get("tool") in READ_ONLY_TOOLS:
+            j += 1
+        if j - i > 1:
+            # copy_context() carries the task's deadline, run control, status and usage ledger into the pool threads
+            futs = [(k, _TOOL_POOL.submit(copy_context().run, _session_dispatch, sess, parsed[k])) for k in range(i, j)]
+            for k, fut in futs:
+                finish(k, parsed[k], fut.result())
+            i = j
+        else:
+            finish(i, parsed[i], _session_dispatch(sess, parsed[i]))
+            i += 1
+    return [r for r in out if r is not None]
+
+
+def _cap_result(block: str, cap: int, estimator) -> str:
+    if estimator.count(block) <= cap:
+        return block
+    inner = block[len("```result\n") : -len("\n```")]
+    cut = truncate_text(inner, cap - 40, estimator, "tail")
+    return f"```result\n{cut}\n(result exceeded the prompt budget; narrow the call, e.g. a READ line window or smaller limit)\n```"
 
 
 def run_edit_attempt(
@@ -134,20 +391,57 @@ def run_edit_attempt(
     per_call_cap: float = 25.0,
     wall_time_cap: float = 90.0,
     max_calls: int = 12,
+    budget: Optional[TokenBudget] = None,
 ) -> Tuple[str, Dict]:
     """Runs a single editing attempt. Returns (diff, meta). diff may be ''.
+
+    The attempt (and so each model call in it) gets at most wall_time_cap
+    seconds, less when the task's deadline is nearer. The temporary
+    workspace is removed however the attempt ends.
     """
-    start = time.time()
+    import subprocess
+
+    set_stage("workspace")
+    try:
+        ws, verified = _prepare_workspace(instance.get("repo") or "", instance.get("base_commit"))
+    except (subprocess.TimeoutExpired, DeadlineExceeded) as e:
+        return "", {"error": f"edit: workspace setup stopped: {e}"}
+    try:
+        with within(wall_time_cap):
+            return _edit_loop(ws, client, instance, temperature, max_output_tokens, seed, max_calls, budget, verified)
+    finally:
+        shutil.rmtree(ws, ignore_errors=True)
+
+
+def _edit_loop(
+    ws: Path,
+    client: OpenAICompatChat,
+    instance: Dict,
+    temperature: float,
+    max_output_tokens: int,
+    seed: int,
+    max_calls: int,
+    budget: Optional[TokenBudget],
+    verified: bool = False,
+) -> Tuple[str, Dict]:
+    budget = budget or budget_for(None, max_output_tokens)
     repo = instance.get("repo") or ""
-    commit = instance.get("base_commit")
-    ws = _prepare_workspace(repo, commit)
+    sess = _Session(ws, repo, instance.get("base_commit") if verified else None)
 
     sys_prompt = (
         "You are editing a local repository to resolve a SWE-bench instance.\n"
         "Do not write patches. Use tools to read and write files.\n"
-        "Tools: LIST_TREE, GREP, READ, WRITE.\n"
+        "Tools: LIST_TREE, GREP, READ, FIND_SYMBOL, FIND_REFERENCES, WRITE, REPLACE, REPLACE_LINES.\n"
+        "FIND_SYMBOL {name[, kind: class|function|method|variable]} returns path, line range and signature of definitions; "
+        "FIND_REFERENCES {name} lists where an identifier is used. Prefer them over GREP to locate code.\n"
         "Protocol: issue commands inside fenced blocks labeled call containing JSON.\n"
-        "After each call, wait for a result block. When done, output exactly READY_FOR_DIFF.\n"
+        "LIST_TREE accepts prefix (directory), glob, depth (deeper files fold into dir rows), cursor (from next_cursor) and limit.\n"
+        "You may put several call blocks in one reply; they run in order (reads in parallel) and all results come back together.\n"
+        "After your calls, wait for the result blocks. When done, output exactly READY_FOR_DIFF.\n"
+        "READ accepts start_line/end_line or around_line (+context, default 40) and returns numbered lines; "
+        "prefer windows over whole-file reads of large files.\n"
+        "To change existing files use REPLACE {path, old, new[, all]} (old must match exactly once) or "
+        "REPLACE_LINES {path, start_line, end_line, content}; use WRITE only for new files.\n"
         "Constraints: no network; keep changes minimal; prefer targeted edits; preserve formatting.\n\n"
         "Example call/result:\n"
         "```call\n{\"tool\":\"LIST_TREE\",\"limit\":30}\n```\n"
@@ -155,73 +449,77 @@ def run_edit_attempt(
         "Continue issuing call blocks until you are done, then output READY_FOR_DIFF.\n"
     )
     # Provide a small initial tree sketch to orient the model
-    tree = _list_tree(ws, limit=300)
+    tree = _session_dispatch(sess, {"tool": "LIST_TREE", "limit": 300})
     grep_seed = []  # We can add keyword-derived hints later if needed
-    user_prompt = (
-        f"Instance: {instance.get('instance_id')}\nRepo: {repo}\n\n"
-        f"Task:\n{instance.get('problem_statement') or ''}\n\n"
-        "Tree sketch (first ~300 files):\n"
-        + "\n".join(f"- {e['path']} ({e['bytes']} bytes)" for e in tree.get("entries", [])[:50])
-        + "\n\nUse the tools; do not output patches; end with READY_FOR_DIFF."
-    )
-
-    messages = [
-        {"role": "system", "content": sys_prompt},
-        {"role": "user", "content": user_prompt},
+    sections = [
+        {"name": "header", "text": f"Instance: {instance.get('instance_id')}\nRepo: {repo}", "priority": 100, "trim": "none"},
+        {"name": "task", "text": f"Task:\n{instance.get('problem_statement') or ''}", "priority": 50, "trim": "both"},
+        {
+            "name": "tree",
+            "text": "Tree sketch (first ~300 files):\n"
+            + "\n".join(f"- {e['path']} ({e['bytes']} bytes)" for e in tree.get("entries", [])[:50]),
+            "priority": 20,
+            "trim": "tail",
+        },
+        {"name": "footer", "text": "Use the tools; do not output patches; end with READY_FOR_DIFF.", "priority": 100, "trim": "none"},
     ]
+    # The fixed prefix may take at most half the prompt budget; turns need the rest
+    user_prompt, fit = fit_sections(sections, budget.prompt_tokens // 2 - budget.count(sys_prompt), budget.estimator)
+
+    history_budget = get_context_budget_default()
+    history_budget = min(history_budget, budget.prompt_tokens) if history_budget else budget.prompt_tokens
+    ctx = EditContext(sys_prompt, user_prompt, budget=history_budget, count=budget.count)
+    # A single tool result may not take more than this; the latest turns are never elided
+    result_cap = max(1000, budget.prompt_tokens // 8)
+
+    def finish(diff: str) -> Tuple[str, Dict]:
+        meta["context"] = ctx.stats()
+        meta["tool_cache"] = {"hits": sess.cache_hits, "misses": sess.cache_misses}
+        # Estimated vs provider-reported prompt tokens, for calibrating the estimator
+        meta["estimator"] = budget.estimator.name
+        meta["est_prompt_tokens"] = meta["context"]["est_prompt_tokens_total_sent"]
+        meta["prompt_fit"] = {"budget": fit["budget"], "trimmed": fit["trimmed"]}
+        return diff, meta
 
     calls = 0
-    meta = {"calls": 0}
-    while time.time() - start < wall_time_cap and calls < max_calls:
+    meta = {"calls": 0, "turns": 0, "provider_prompt_tokens_per_turn": [], "completion_tokens_per_call": [], "backend_per_call": []}
+    while not stop_reason() and calls < max_calls:
+        meta["turns"] += 1
+        set_stage(f"edit turn {meta['turns']}")
         try:
-            text, usage = client.chat(messages, temperature=temperature, max_output_tokens=max_output_tokens, seed=seed)
+            text, usage = client.chat(ctx.messages(), temperature=temperature, max_output_tokens=max_output_tokens, seed=seed)
             meta.update({
                 "prompt_tokens": meta.get("prompt_tokens", 0) + usage.get("prompt_tokens", 0),
                 "completion_tokens": meta.get("completion_tokens", 0) + usage.get("completion_tokens", 0),
                 "total_tokens": meta.get("total_tokens", 0) + usage.get("total_tokens", 0),
             })
+            meta["provider_prompt_tokens_per_turn"].append(usage.get("prompt_tokens", 0))
+            meta["completion_tokens_per_call"].append(usage.get("completion_tokens", 0))
+            meta["backend_per_call"].append(usage.get("backend"))
         except OpenAICompatError as e:
-            return "", {"error": str(e)}
+            # Keep the usage of the turns that did complete
+            return "", {**meta, "error": str(e)}
 
-        if "READY_FOR_DIFF" in text:
+        blocks = CALL_BLOCK_RE.findall(text)
+        if "READY_FOR_DIFF" in text and not blocks:
             # Export diff and return
-            diff = _export_diff(ws)
-            return diff, meta
+            return finish(_export_diff(ws))
 
-        m = CALL_BLOCK_RE.search(text)
-        if not m:
+        if not blocks:
             # Ask the model to use tools explicitly
-            messages.append({"role": "assistant", "content": text})
-            messages.append({"role": "user", "content": "```result\n{\"ok\":false,\"error\":\"No call block found. Use LIST_TREE/GREP/READ/WRITE and end with READY_FOR_DIFF.\"}\n```"})
+            ctx.add_turn(text, [(None, {}, "```result\n{\"ok\":false,\"error\":\"No call block found. Use LIST_TREE/GREP/READ/WRITE/REPLACE/REPLACE_LINES and end with READY_FOR_DIFF.\"}\n```")])
             continue
-        calls += 1
+        # Every call block counts against max_calls; blocks past the budget are not run
+        runnable = blocks[: max_calls - calls]
+        calls += len(runnable)
         meta["calls"] = calls
-        try:
-            payload = json.loads(m.group(1))
-        except Exception as e:
-            messages.append({"role": "assistant", "content": text})
-            messages.append({"role": "user", "content": f"```result\n{{\"ok\":false,\"error\":\"invalid JSON: {str(e)}\"}}\n```"})
-            continue
-
-        tool = payload.get("tool")
-        result = {"ok": False, "error": "unknown tool"}
-        t0 = time.time()
-        try:
-            if tool == "LIST_TREE":
-                result = _list_tree(ws, int(payload.get("limit", 500)))
-            elif tool == "GREP":
-                result = _grep(ws, str(payload.get("pattern", ".")), str(payload.get("glob", "**/*.py")), int(payload.get("max_hits", 50)))
-            elif tool == "READ":
-                result = _read(ws, str(payload.get("path", "")), int(payload.get("max_bytes", 20000)))
-            elif tool == "WRITE":
-                result = _write(ws, str(payload.get("path", "")), str(payload.get("content", "")), str(payload.get("encoding", "utf-8")))
-        except Exception as e:
-            result = {"ok": False, "error": str(e)}
-        dt = time.time() - t0
-        result["duration_s"] = round(dt, 3)
-        messages.append({"role": "assistant", "content": text})
-        messages.append({"role": "user", "content": f"```result\n{json.dumps(result)}\n```"})
+        set_stage(f"tools (turn {meta['turns']})")
+        results = [(t, a, _cap_result(txt, result_cap, budget.estimator)) for t, a, txt in _run_calls(sess, runnable)]
+        for _ in blocks[len(runnable):]:
+            results.append((None, {}, "```result\n{\"ok\":false,\"error\":\"call budget exhausted; not executed\"}\n```"))
+        ctx.add_turn(text, results)
+        if "READY_FOR_DIFF" in text:
+            return finish(_export_diff(ws))
 
     # Budget exceeded
-    diff = _export_diff(ws)
-    return diff, meta
+    return finish(_export_diff(ws))
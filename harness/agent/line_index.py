@@ -0,0 +1,83 @@
+import mmap
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+_MAX_ENTRIES = 512
+_lock = threading.Lock()
+_offsets: "OrderedDict[Tuple[str, int, int], array]" = OrderedDict()
+
+
+def _build_offsets(mm) -> array:
+    offs = array("Q", [0])
+    pos = mm.find(b"\n")
+    while pos != -1:
+        offs.append(pos + 1)
+        pos = mm.find(b"\n", pos + 1)
+    return offs
+
+
+def line_offsets(path: str, mm=None) -> array:
+    """Start offsets of every line of `path`, cached per (path, mtime, size).
+
+    Invalidation is implicit: a rewrite changes mtime/size and misses the cache.
+    """
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    with _lock:
+        offs = _offsets.get(key)
+        if offs is not None:
+            _offsets.move_to_end(key)
+            return offs
+    if mm is None:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            offs = _build_offsets(m)
+    else:
+        offs = _build_offsets(mm)
+    with _lock:
+        _offsets[key] = offs
+        while len(_offsets) > _MAX_ENTRIES:
+            _offsets.popitem(last=False)
+    return offs
+
+
+def read_window(path: str, start_line: int, end_line: Optional[int], max_bytes: int = 20000) -> Dict:
+    """Return lines [start_line, end_line] (1-based, inclusive) prefixed with line numbers.
+
+    Only the requested byte range of the memory-mapped file is decoded; output
+    stops early (truncated=True) once `max_bytes` would be exceeded.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return {"content": "", "start_line": 0, "end_line": 0, "total_lines": 0, "truncated": False}
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        offs = line_offsets(path, mm)
+        total = len(offs) - 1 if offs[-1] == size else len(offs)
+        start = max(1, start_line)
+        end = total if end_line is None else min(max(end_line, start), total)
+        if start > total:
+            return {"content": "", "start_line": start, "end_line": start - 1, "total_lines": total, "truncated": False}
+        width = len(str(end))
+        out = []
+        used = 0
+        truncated = False
+        for n in range(start, end + 1):
+            lo = offs[n - 1]
+            hi = offs[n] if n < len(offs) else size
+            line = f"{n:>{width}}| " + mm[lo:hi].decode("utf-8", errors="replace").rstrip("\n")
+            if used + len(line) + 1 > max_bytes and out:
+                truncated = True
+                end = n - 1
+                break
+            out.append(line)
+            used += len(line) + 1
+    return {
+        "content": "\n".join(out) + "\n",
+        "start_line": start,
+        "end_line": end,
+        "total_lines": total,
+        "truncated": truncated,
+    }
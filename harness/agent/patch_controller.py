@@ -18,6 +18,11 @@ def build_patch_system_prompt() -> str:
 
 
 def build_patch_user_prompt(instance: Dict) -> str:
+    return "\n\n".join(s["text"] for s in build_patch_sections(instance))
+
+
+def build_patch_sections(instance: Dict) -> List[Dict]:
+    """Patch prompt as ordered sections with trim priorities (see harness.tokens.fit_sections)."""
     fields = []
     iid = instance.get("instance_id")
     repo = instance.get("repo")
@@ -28,8 +33,9 @@ def build_patch_user_prompt(instance: Dict) -> str:
         fields.append(f"Repo: {repo}")
     if title:
         fields.append(f"Title: {title}")
+    sections = [{"name": "header", "text": "\n\n".join(fields), "priority": 100, "trim": "none"}]
     if body:
-        fields.append("Issue:\n" + body.strip())
+        sections.append({"name": "issue", "text": "Issue:\n" + body.strip(), "priority": 50, "trim": "both"})
     # Repo path conventions (high-impact hints)
     repo = (instance.get("repo") or "").strip()
     repo_tips = {
@@ -56,13 +62,17 @@ def build_patch_user_prompt(instance: Dict) -> str:
         ],
     }
     if repo in repo_tips:
-        fields.append("Repo path conventions:\n- " + "\n- ".join(repo_tips[repo]))
+        sections.append(
+            {"name": "conventions", "text": "Repo path conventions:\n- " + "\n- ".join(repo_tips[repo]), "priority": 40, "trim": "tail"}
+        )
 
     # Try extracting file path hints from the issue text
     hints = extract_path_hints(instance)
     if hints:
-        fields.append("Likely target file(s):\n- " + "\n- ".join(hints[:2]))
-    fields.append(
+        sections.append(
+            {"name": "path_hints", "text": "Likely target file(s):\n- " + "\n- ".join(hints[:2]), "priority": 40, "trim": "tail"}
+        )
+    instructions = (
         "Instructions:\n"
         "- Target a SINGLE FILE (choose the most likely).\n"
         "- Start with: diff --git a/<path> b/<path>\n"
@@ -72,10 +82,10 @@ def build_patch_user_prompt(instance: Dict) -> str:
         "- Ensure every line ends with a newline.\n"
         f"- Print ONLY the patch between lines '{BEGIN_MARK}' and '{END_MARK}'.\n"
     )
-    fields.append(BEGIN_MARK)
-    fields.append("<your unified diff here>")
-    fields.append(END_MARK)
-    return "\n\n".join(fields)
+    sections.append(
+        {"name": "instructions", "text": "\n\n".join([instructions, BEGIN_MARK, "<your unified diff here>", END_MARK]), "priority": 100, "trim": "none"}
+    )
+    return sections
 
 
 def extract_diff(text: str) -> str:
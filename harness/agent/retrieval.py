@@ -0,0 +1,274 @@
+import json
+import math
+import os
+import re
+import subprocess
+import threading
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from harness.config import env_int
+from harness.preflight import ensure_repo
+from harness.tokens import estimate_tokens
+
+
+RETRIEVAL_DIR = Path(".cache/retrieval")
+SOURCE_EXTS = (".py", ".pyi")
+CHUNK_LINES = 40
+MAX_FILE_BYTES = 1_000_000
+MAX_CHUNKS_PER_FILE = 2
+# Chunks scoring below this fraction of the best hit are noise
+MIN_RELATIVE_SCORE = 0.2
+# BM25 parameters (Robertson/Sparck Jones defaults)
+K1 = 1.2
+B = 0.75
+
+_IDENT_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+_STOP = frozenset(
+    "a an and are as at be but by can def do does for from has have if in import is it its "
+    "not of on or return self should that the this to was when which with would none true false".split()
+)
+
+_lock = threading.Lock()
+_key_locks: Dict[Tuple[str, str], threading.Lock] = {}
+# Indexes are large; keep only the most recent few (repo, commit) pairs
+_indexes: "OrderedDict[Tuple[str, str], _BM25Index]" = OrderedDict()
+_MAX_INDEXES = 2
+_snippets: Dict[str, Dict] = {}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased identifiers plus their snake/camel-case parts."""
+    out = []
+    for ident in _IDENT_RE.findall(text):
+        low = ident.lower()
+        parts = [p.lower() for piece in ident.split("_") for p in _CAMEL_RE.findall(piece)]
+        for t in [low] + (parts if len(parts) > 1 else []):
+            if len(t) > 1 and t not in _STOP:
+                out.append(t)
+    return out
+
+
+class _BM25Index:
+    """Inverted index over fixed-size line chunks of the repo's source files."""
+
+    def __init__(self) -> None:
+        self.chunks: List[Tuple[str, int, int]] = []  # (path, start_line, end_line)
+        self.lengths: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.files: Dict[str, List[str]] = {}
+
+    def add_file(self, path: str, text: str) -> None:
+        lines = text.splitlines()
+        self.files[path] = lines
+        path_terms = tokenize(path.replace("/", " ").replace(".", " "))
+        for lo in range(0, len(lines), CHUNK_LINES):
+            hi = min(lo + CHUNK_LINES, len(lines))
+            terms = tokenize("\n".join(lines[lo:hi])) + path_terms
+            if not terms:
+                continue
+            cid = len(self.chunks)
+            self.chunks.append((path, lo + 1, hi))
+            self.lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self.postings.setdefault(term, []).append((cid, tf))
+
+    def search(self, query: str, limit: int) -> List[Tuple[float, int]]:
+        n = len(self.chunks)
+        if not n:
+            return []
+        avgdl = sum(self.lengths) / n
+        scores: Dict[int, float] = {}
+        for term, qtf in Counter(tokenize(query)).items():
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            weight = idf * min(qtf, 3)
+            for cid, tf in plist:
+                norm = tf + K1 * (1 - B + B * self.lengths[cid] / avgdl)
+                scores[cid] = scores.get(cid, 0.0) + weight * tf * (K1 + 1) / norm
+        return sorted(((s, c) for c, s in scores.items()), reverse=True)[:limit]
+
+
+def _git(repo_dir: Path, *args: str, **kw) -> subprocess.CompletedProcess:
+    return subprocess.run(["git", "-C", str(repo_dir), *args], capture_output=True, **kw)
+
+
+def _build_index(repo: str, commit: Optional[str]) -> Optional[_BM25Index]:
+    """BM25 index of the repo at `commit` (HEAD when no commit is given).
+
+    Returns None when the commit cannot be resolved or git times out: code
+    from another revision must never be passed off as the base commit.
+    """
+    # Read blobs at the base commit straight from the object store so the
+    # shared checkout's working tree state does not matter.
+    repo_dir = ensure_repo(repo)
+    rev = "HEAD"
+    try:
+        if commit:
+            if _git(repo_dir, "cat-file", "-e", f"{commit}^{{commit}}", timeout=30).returncode != 0:
+                _git(repo_dir, "fetch", "--depth", "1", "origin", commit, timeout=60)
+            if _git(repo_dir, "cat-file", "-e", f"{commit}^{{commit}}", timeout=30).returncode != 0:
+                return None
+            rev = commit
+        tree = _git(repo_dir, "ls-tree", "-r", "-l", rev, text=True, timeout=60).stdout
+    except subprocess.TimeoutExpired:
+        return None
+    blobs = []
+    for ln in tree.splitlines():
+        meta, _, path = ln.partition("\t")
+        parts = meta.split()
+        if len(parts) != 4 or parts[1] != "blob" or not path.endswith(SOURCE_EXTS):
+            continue
+        if parts[3].isdigit() and int(parts[3]) <= MAX_FILE_BYTES:
+            blobs.append((parts[2], path))
+    index = _BM25Index()
+    if not blobs:
+        return index
+    try:
+        proc = subprocess.run(
+            ["git", "-C", str(repo_dir), "cat-file", "--batch"],
+            input="".join(sha + "\n" for sha, _ in blobs).encode(),
+            capture_output=True,
+            timeout=300,
+        )
+    except subprocess.TimeoutExpired:
+        return None
+    data = proc.stdout
+    pos = 0
+    for _, path in blobs:
+        nl = data.find(b"\n", pos)
+        if nl == -1:
+            break
+        header = data[pos:nl].split()
+        pos = nl + 1
+        if len(header) != 3:
+            continue
+        size = int(header[2])
+        index.add_file(path, data[pos : pos + size].decode("utf-8", errors="replace"))
+        pos += size + 1
+    return index
+
+
+def get_index(repo: str, commit: Optional[str]) -> Optional[_BM25Index]:
+    """Cached index of (repo, commit); None (and nothing cached) when the snapshot is unavailable."""
+    key = (repo, commit or "")
+    with _lock:
+        klock = _key_locks.setdefault(key, threading.Lock())
+    # Concurrent callers for the same snapshot wait for a single build
+    with klock:
+        with _lock:
+            index = _indexes.get(key)
+            if index is not None:
+                _indexes.move_to_end(key)
+                return index
+        index = _build_index(repo, commit)
+        with _lock:
+            # Waiters still hold the lock object; later callers find the index (or rebuild)
+            _key_locks.pop(key, None)
+            if index is None:
+                return None
+            _indexes[key] = index
+            while len(_indexes) > _MAX_INDEXES:
+                _indexes.popitem(last=False)
+        return index
+
+
+def select_snippets(index: _BM25Index, query: str, top_k: int, budget_tokens: int) -> List[Dict]:
+    """Top-scoring chunks (at most MAX_CHUNKS_PER_FILE per file) that fit the token budget."""
+    out: List[Dict] = []
+    per_file: Counter = Counter()
+    used = 0
+    hits = index.search(query, limit=top_k * 8)
+    floor = hits[0][0] * MIN_RELATIVE_SCORE if hits else 0.0
+    for score, cid in hits:
+        if len(out) >= top_k or score < floor:
+            break
+        path, lo, hi = index.chunks[cid]
+        if per_file[path] >= MAX_CHUNKS_PER_FILE:
+            continue
+        lines = index.files[path][lo - 1 : hi]
+        # Trim trailing blank lines
+        while lines and not lines[-1].strip():
+            lines.pop()
+            hi -= 1
+        width = len(str(hi))
+        code = "\n".join(f"{lo + i:>{width}}| {ln}" for i, ln in enumerate(lines))
+        cost = estimate_tokens(code) + 10
+        if used + cost > budget_tokens:
+            continue
+        used += cost
+        per_file[path] += 1
+        out.append({"path": path, "start_line": lo, "end_line": hi, "score": round(score, 3), "code": code})
+    out.sort(key=lambda s: (s["path"], s["start_line"]))
+    return out
+
+
+def retrieve_for_instance(instance: Dict) -> Dict:
+    """Snippets for an instance, computed once and shared by every model and attempt.
+
+    Results are memoized in memory and on disk under .cache/retrieval/ keyed by
+    instance id and retrieval settings, so only the first caller builds the index.
+    """
+    iid = str(instance.get("instance_id") or "")
+    repo = (instance.get("repo") or "").strip()
+    top_k = env_int("RETRIEVAL_TOP_K", 6)
+    budget = env_int("RETRIEVAL_TOKENS", 3000)
+    key = f"{iid}@{instance.get('base_commit') or ''}:{top_k}:{budget}"
+    with _lock:
+        cached = _snippets.get(key)
+    if cached is not None:
+        return cached
+    disk = RETRIEVAL_DIR / f"{iid.replace('/', '__')}.json"
+    if disk.exists():
+        try:
+            obj = json.loads(disk.read_text())
+            if obj.get("key") == key:
+                with _lock:
+                    _snippets[key] = obj
+                return obj
+        except ValueError:
+            pass
+    with _lock:
+        klock = _key_locks.setdefault(("snippets", key), threading.Lock())
+    with klock:
+        with _lock:
+            cached = _snippets.get(key)
+        if cached is not None:
+            return cached
+        query = "\n".join(
+            [
+                str(instance.get("title") or instance.get("issue_title") or ""),
+                str(instance.get("problem_statement") or instance.get("issue_body") or ""),
+            ]
+        )
+        index = get_index(repo, instance.get("base_commit"))
+        if index is None:
+            # Base commit unavailable right now: no snippets, and nothing cached so a later run retries
+            with _lock:
+                _key_locks.pop(("snippets", key), None)
+            return {"key": key, "snippets": [], "error": "base commit unavailable"}
+        obj = {"key": key, "snippets": select_snippets(index, query, top_k, budget)}
+        RETRIEVAL_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = disk.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(obj))
+        os.replace(tmp, disk)
+        with _lock:
+            _snippets[key] = obj
+            _key_locks.pop(("snippets", key), None)
+        return obj
+
+
+def format_snippets(snippets: List[Dict]) -> str:
+    if not snippets:
+        return ""
+    parts = [
+        "Relevant code from the repository at the base commit "
+        "(line numbers are for reference only; they are not part of the file):"
+    ]
+    for s in snippets:
+        parts.append(f"--- {s['path']} (lines {s['start_line']}-{s['end_line']})\n{s['code']}")
+    return "\n\n".join(parts)
@@ -0,0 +1,228 @@
+import ast
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from harness.config import env_int
+from harness.deadline import DeadlineExceeded, remaining
+
+
+SYMBOLS_DIR = Path(".cache/symbols")
+MAX_REFS_PER_NAME = 200
+
+_lock = threading.Lock()
+# One build lock per (repo, commit) so parallel FIND_* calls on a cold snapshot
+# index it once without blocking other repos; dropped once the index is cached
+_key_locks: Dict[Tuple[str, str], threading.Lock] = {}
+_indexes: Dict[Tuple[str, str], Dict] = {}
+
+
+def _signature(node) -> str:
+    try:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+            ret = f" -> {ast.unparse(node.returns)}" if node.returns is not None else ""
+            return f"{prefix} {node.name}({ast.unparse(node.args)}){ret}"
+        if isinstance(node, ast.ClassDef):
+            bases = ", ".join(ast.unparse(b) for b in node.bases + node.keywords)
+            return f"class {node.name}({bases})" if bases else f"class {node.name}"
+    except Exception:
+        pass
+    return getattr(node, "name", "")
+
+
+def index_source(rel: str, source: bytes) -> Tuple[List[Dict], Dict[str, List[int]]]:
+    """Definitions and referenced identifiers (name -> lines) of one Python file."""
+    try:
+        tree = ast.parse(source, filename=rel)
+    except (SyntaxError, ValueError):
+        return [], {}
+    defs: List[Dict] = []
+    text = None
+
+    def add(node, kind: str, qual: str, sig: str) -> None:
+        defs.append(
+            {
+                "name": qual.rsplit(".", 1)[-1],
+                "qualname": qual,
+                "kind": kind,
+                "path": rel,
+                "start_line": node.lineno,
+                "end_line": getattr(node, "end_lineno", node.lineno),
+                "signature": sig,
+            }
+        )
+
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            add(node, "class", node.name, _signature(node))
+            for sub in node.body:
+                if isinstance(sub, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    add(sub, "method", f"{node.name}.{sub.name}", _signature(sub))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            add(node, "function", node.name, _signature(node))
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for t in targets:
+                if isinstance(t, ast.Name):
+                    if text is None:
+                        text = source.decode("utf-8", "replace")
+                    add(node, "variable", t.id, ast.get_source_segment(text, node) or t.id)
+
+    refs: Dict[str, set] = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            refs.setdefault(node.id, set()).add(node.lineno)
+        elif isinstance(node, ast.Attribute):
+            refs.setdefault(node.attr, set()).add(node.lineno)
+    for d in defs:
+        lines = refs.get(d["name"])
+        if lines is not None:
+            lines.discard(d["start_line"])
+    for d in defs:
+        if d["kind"] == "variable" and len(d["signature"]) > 160:
+            d["signature"] = d["signature"][:160] + "..."
+    return defs, {k: sorted(v) for k, v in refs.items() if v}
+
+
+def _index_chunk(args) -> List[Tuple[str, List[Dict], Dict[str, List[int]]]]:
+    root, rels = args
+    out = []
+    for rel in rels:
+        try:
+            src = (Path(root) / rel).read_bytes()
+        except OSError:
+            continue
+        defs, refs = index_source(rel, src)
+        out.append((rel, defs, refs))
+    return out
+
+
+def build_index(root: Path, paths: Iterable[str], workers: Optional[int] = None) -> Dict:
+    """Index `paths` (relative .py files under root) using a process pool.
+
+    The pool uses the spawn start method: this runs on worker threads of a
+    heavily threaded process, where fork is not safe. `ref_counts` keeps the
+    number of references per name before the MAX_REFS_PER_NAME cap.
+    """
+    rels = sorted(p for p in paths if p.endswith(".py"))
+    workers = workers or env_int("SYMBOL_INDEX_WORKERS", min(4, os.cpu_count() or 1))
+    chunks = [(str(root), rels[i : i + 64]) for i in range(0, len(rels), 64)]
+    defs: List[Dict] = []
+    refs: Dict[str, List[List]] = {}
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as ex:
+            parts = list(ex.map(_index_chunk, chunks))
+    else:
+        parts = [_index_chunk(c) for c in chunks]
+    for part in parts:
+        for rel, d, r in part:
+            defs.extend(d)
+            for name, lines in r.items():
+                refs.setdefault(name, []).extend([rel, ln] for ln in lines)
+    # Only keep references to names the repo defines; the rest is noise
+    defined = {d["name"] for d in defs}
+    refs = {k: v for k, v in refs.items() if k in defined}
+    counts = {k: len(v) for k, v in refs.items()}
+    return {"defs": defs, "refs": {k: v[:MAX_REFS_PER_NAME] for k, v in refs.items()}, "ref_counts": counts}
+
+
+def get_symbol_index(root: Path, repo: str, commit: Optional[str], paths: Iterable[str]) -> Dict:
+    """Symbol index of the base snapshot, built once per (repo, commit) and cached on disk.
+
+    Pass `commit` only when `root` is known to be at it (edit_controller
+    verifies the clone's HEAD); without one the index is built and not cached.
+    """
+    if not commit:
+        return build_index(root, paths)
+    key = (repo, commit)
+    with _lock:
+        cached = _indexes.get(key)
+        klock = _key_locks.setdefault(key, threading.Lock()) if cached is None else None
+    if cached is not None:
+        return cached
+    # Wait for another thread's build only as long as the task's deadline allows
+    left = remaining()
+    if not klock.acquire(timeout=max(0.0, left) if left is not None else -1):
+        raise DeadlineExceeded(f"deadline: waiting for the symbol index of {repo}@{commit}")
+    try:
+        with _lock:
+            cached = _indexes.get(key)
+        if cached is not None:
+            return cached
+        disk = SYMBOLS_DIR / repo.replace("/", "__") / f"{commit}.json"
+        index = None
+        if disk.exists():
+            try:
+                index = json.loads(disk.read_text())
+            except ValueError:
+                index = None
+        if index is None:
+            index = build_index(root, paths)
+            disk.parent.mkdir(parents=True, exist_ok=True)
+            tmp = disk.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(index))
+            os.replace(tmp, disk)
+        with _lock:
+            _indexes.setdefault(key, index)
+            _key_locks.pop(key, None)
+            return _indexes[key]
+    finally:
+        klock.release()
+
+
+def overlay_index(base: Dict, root: Path, dirty: Iterable[str]) -> Dict:
+    """Base index with an attempt's modified .py files re-indexed in place."""
+    dirty = {p for p in dirty if p.endswith(".py")}
+    if not dirty:
+        return base
+    defs = [d for d in base["defs"] if d["path"] not in dirty]
+    refs = {k: [r for r in v if r[0] not in dirty] for k, v in base["refs"].items()}
+    base_counts = base.get("ref_counts") or {}
+    # Dropped references of dirty files come out of the true counts too
+    counts = {k: base_counts.get(k, len(v)) - (len(v) - len(refs[k])) for k, v in base["refs"].items()}
+    for rel in sorted(dirty):
+        fp = root / rel
+        if not fp.is_file():
+            continue
+        d, r = index_source(rel, fp.read_bytes())
+        defs.extend(d)
+        for name, lines in r.items():
+            refs.setdefault(name, []).extend([rel, ln] for ln in lines)
+            counts[name] = counts.get(name, 0) + len(lines)
+    return {"defs": defs, "refs": refs, "ref_counts": counts}
+
+
+def find_symbol(index: Dict, name: str, kind: Optional[str] = None, limit: int = 20) -> Dict:
+    """Exact name/qualname matches first, then dotted-suffix and case-insensitive substring."""
+    name = name.strip()
+    defs = [d for d in index["defs"] if not kind or d["kind"] == kind]
+    exact = [d for d in defs if d["name"] == name or d["qualname"] == name]
+    if not exact and "." in name:
+        exact = [d for d in defs if d["qualname"].endswith("." + name) or name.endswith("." + d["qualname"])]
+    fuzzy = False
+    if not exact:
+        low = name.lower()
+        exact = [d for d in defs if low in d["qualname"].lower()]
+        fuzzy = True
+    exact.sort(key=lambda d: (d["path"].startswith(("test", "tests/")) or "/tests/" in d["path"], d["path"], d["start_line"]))
+    return {"ok": True, "matches": exact[:limit], "total": len(exact), "fuzzy": fuzzy, "truncated": len(exact) > limit}
+
+
+def find_references(index: Dict, name: str, limit: int = 50) -> Dict:
+    """Locations (path, line) where identifier `name` is used as a name or attribute."""
+    short = name.strip().rsplit(".", 1)[-1]
+    hits = index["refs"].get(short, [])
+    # Stored lists stop at MAX_REFS_PER_NAME; the true count is kept alongside
+    total = max(len(hits), (index.get("ref_counts") or {}).get(short, 0))
+    return {
+        "ok": True,
+        "name": short,
+        "references": [{"path": p, "line": ln} for p, ln in hits[:limit]],
+        "total": total,
+        "truncated": total > limit,
+    }
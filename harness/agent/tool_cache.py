@@ -0,0 +1,111 @@
+import fnmatch
+import json
+import posixpath
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from harness.config import env_int
+
+
+# Defaults applied before keying so {"tool":"READ","path":"a.py"} and an
+# explicit max_bytes=20000 share an entry
+_DEFAULTS = {
+    "LIST_TREE": {"limit": 500},
+    "GREP": {"pattern": ".", "glob": "**/*.py", "max_hits": 50},
+    "READ": {"max_bytes": 20000},
+}
+
+
+def norm_path(path) -> str:
+    p = str(path)
+    while p.startswith("./"):
+        p = p[2:]
+    return posixpath.normpath(p) if p else "."
+
+
+def normalize_args(tool: str, payload: Dict) -> str:
+    args = dict(_DEFAULTS.get(tool, {}))
+    args.update({k: v for k, v in payload.items() if k not in ("tool", "duration_s")})
+    if "path" in args:
+        args["path"] = norm_path(args["path"])
+    return json.dumps(args, sort_keys=True)
+
+
+def affected(tool: str, payload: Dict, dirty: Iterable[str]) -> bool:
+    """True if the overlay's modified paths could change this call's result."""
+    dirty = set(dirty)
+    if not dirty:
+        return False
+    if tool == "READ":
+        return norm_path(payload.get("path", "")) in dirty
+    if tool == "GREP":
+        glob = str(payload.get("glob", _DEFAULTS["GREP"]["glob"]))
+        return any(fnmatch.fnmatch(p, glob) for p in dirty)
+    # LIST_TREE (and anything else) sees sizes and new files: any write invalidates
+    return True
+
+
+class ToolResultCache:
+    """Process-wide LRU of read-only tool results, capped by serialized size.
+
+    Keys are (repo, base_commit, tool, normalized args), so every attempt of
+    every model on the same snapshot shares entries. Callers must only read or
+    store while their overlay has not touched the affected paths.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None) -> None:
+        self.max_bytes = max_bytes if max_bytes is not None else env_int("TOOL_CACHE_MB", 64) * 1024 * 1024
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Tuple, Tuple[str, int]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple) -> Optional[Dict]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+        return json.loads(item[0])
+
+    def put(self, key: Tuple, result: Dict) -> None:
+        blob = json.dumps(result)
+        size = len(blob)
+        if not self.max_bytes or size > self.max_bytes // 4:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old:
+                self._bytes -= old[1]
+            self._data[key] = (blob, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._data:
+                _, (_, sz) = self._data.popitem(last=False)
+                self._bytes -= sz
+                self.evictions += 1
+
+    def note_bypass(self) -> None:
+        with self._lock:
+            self.bypassed += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "evictions": self.evictions,
+            }
+
+
+TOOL_CACHE = ToolResultCache()
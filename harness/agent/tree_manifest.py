@@ -0,0 +1,132 @@
+import fnmatch
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+MANIFEST_DIR = Path(".cache/manifests")
+# Top-level definitions/assignments, counted with a line regex (no parse needed)
+_SYMBOL_RE = re.compile(rb"^(?:async\s+def|def|class)\s+\w+|^[A-Za-z_]\w*\s*(?::[^=\n]*)?=(?!=)", re.MULTILINE)
+
+_lock = threading.Lock()
+_manifests: Dict[Tuple[str, str], List[Dict]] = {}
+
+
+def _scan(root: Path) -> List[Dict]:
+    entries = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        if ".git" in dirnames:
+            dirnames.remove(".git")
+        dirnames.sort()
+        for fn in sorted(filenames):
+            fp = Path(dirpath) / fn
+            try:
+                size = fp.stat().st_size
+            except OSError:
+                size = 0
+            e = {"path": fp.relative_to(root).as_posix(), "bytes": size, "ext": fp.suffix}
+            if fp.suffix == ".py":
+                try:
+                    e["symbols"] = len(_SYMBOL_RE.findall(fp.read_bytes()))
+                except OSError:
+                    e["symbols"] = 0
+            entries.append(e)
+    entries.sort(key=lambda e: e["path"])
+    return entries
+
+
+def get_manifest(root: Path, repo: str, commit: Optional[str]) -> List[Dict]:
+    """Sorted file manifest of the base snapshot, built once per (repo, commit).
+
+    Kept in memory for the process and on disk under .cache/manifests so later
+    runs skip the walk. Pass `commit` only when `root` is known to be at it
+    (edit_controller verifies the clone's HEAD); otherwise another revision
+    would be stored under its key for good. Without a commit the manifest is
+    not shared.
+    """
+    if not commit:
+        return _scan(root)
+    key = (repo, commit)
+    with _lock:
+        cached = _manifests.get(key)
+    if cached is not None:
+        return cached
+    disk = MANIFEST_DIR / repo.replace("/", "__") / f"{commit}.json"
+    entries = None
+    if disk.exists():
+        try:
+            entries = json.loads(disk.read_text())
+        except ValueError:
+            entries = None
+    if entries is None:
+        entries = _scan(root)
+        disk.parent.mkdir(parents=True, exist_ok=True)
+        tmp = disk.with_suffix(".tmp")
+        tmp.write_text(json.dumps(entries))
+        os.replace(tmp, disk)
+    with _lock:
+        _manifests.setdefault(key, entries)
+        return _manifests[key]
+
+
+def overlay_entries(base: List[Dict], root: Path, dirty: Iterable[str]) -> List[Dict]:
+    """Manifest as seen by an attempt: base entries patched with its modified paths."""
+    dirty = set(dirty)
+    if not dirty:
+        return base
+    out = [e for e in base if e["path"] not in dirty]
+    for rel in dirty:
+        fp = root / rel
+        if fp.is_file():
+            e = {"path": rel, "bytes": fp.stat().st_size, "ext": fp.suffix}
+            if fp.suffix == ".py":
+                e["symbols"] = len(_SYMBOL_RE.findall(fp.read_bytes()))
+            out.append(e)
+    out.sort(key=lambda e: e["path"])
+    return out
+
+
+def list_tree(
+    entries: List[Dict],
+    prefix: str = "",
+    glob: Optional[str] = None,
+    depth: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = 500,
+) -> Dict:
+    """Filter and paginate a manifest.
+
+    prefix: directory to list (e.g. "sympy/core"); glob: fnmatch on the full
+    path; depth: levels below prefix to expand, deeper files are folded into
+    directory rows with file counts; cursor: opaque value from next_cursor.
+    """
+    prefix = prefix.strip("/")
+    pre = prefix + "/" if prefix else ""
+    rows: List[Dict] = []
+    dirs: Dict[str, Dict] = {}
+    for e in entries:
+        path = e["path"]
+        if pre and not path.startswith(pre):
+            continue
+        if glob and not fnmatch.fnmatch(path, glob):
+            continue
+        parts = path[len(pre):].split("/")
+        if depth is not None and len(parts) > depth:
+            d = pre + "/".join(parts[: max(depth, 0)]) + "/" if depth > 0 else pre
+            row = dirs.get(d)
+            if row is None:
+                row = dirs[d] = {"path": d, "type": "dir", "files": 0, "bytes": 0}
+                rows.append(row)
+            row["files"] += 1
+            row["bytes"] += e["bytes"]
+            continue
+        rows.append(e)
+    start = int(cursor or 0)
+    page = rows[start : start + limit]
+    out = {"ok": True, "entries": page, "total": len(rows), "truncated": start + limit < len(rows)}
+    if out["truncated"]:
+        out["next_cursor"] = str(start + limit)
+    return out
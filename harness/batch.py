@@ -0,0 +1,121 @@
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Tuple
+
+from harness.orchestrator import build_patch_messages
+from harness.deadline import stopping
+from harness.providers.batch_api import OpenAIBatchClient, custom_id
+from harness.providers.openai_compat import OpenAICompatError, parse_chat_completion
+from harness.quota import QUOTA
+from harness.tokens import budget_for
+
+
+def make_batch_client(provider: str, chat_client) -> OpenAIBatchClient:
+    """Batch client for a provider, reusing the interactive client's key and headers.
+
+    The API root is `<PROVIDER>_BATCH_URL`, else the chat URL minus `/chat/completions`.
+    """
+    if not hasattr(chat_client, "base_url"):
+        raise RuntimeError(f"batch mode needs an HTTP provider, not {provider!r}")
+    base = os.getenv(f"{provider.upper()}_BATCH_URL") or re.sub(r"/chat/completions$", "", chat_client.base_url)
+    return OpenAIBatchClient(base, chat_client.api_key, extra_headers=chat_client.extra_headers)
+
+
+def _slug(provider: str, model: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", f"{provider}__{model}")
+
+
+def run_batches(
+    batch_dir: Path,
+    tasks: Iterable[Tuple[Dict, str]],
+    records,
+    temperature: float,
+    caps: Dict[str, Dict],
+    make_client: Callable[[str, str], object],
+) -> Tuple[Dict[str, Tuple[str, Dict]], Dict]:
+    """Send every first-turn patch request through the provider batch API.
+
+    Writes one request file per (provider, model) under batch_dir, submits it,
+    polls until done and returns ({custom_id: (text, meta)}, stats). Requests
+    missing from the results (batch error, non-200, unfinished batch) are
+    simply absent, so the caller runs them interactively. Submitted batch ids
+    are kept in batch_dir/state.json and re-polled instead of re-submitted
+    when the run is restarted.
+    """
+    batch_dir.mkdir(parents=True, exist_ok=True)
+    state_path = batch_dir / "state.json"
+    try:
+        state = json.loads(state_path.read_text())
+    except (OSError, ValueError):
+        state = {}
+    started = time.time()
+
+    # Write request files for groups not already submitted
+    files: Dict[str, Tuple[Dict, Path, int]] = {}
+    handles: Dict[str, object] = {}
+    chat_clients: Dict[str, object] = {}
+    try:
+        for spec, iid in tasks:
+            provider, model = spec["provider"], spec["model"]
+            group = _slug(provider, model)
+            if group in state:
+                continue
+            if group not in handles:
+                path = batch_dir / f"requests_{group}.jsonl"
+                handles[group] = open(path, "w")
+                files[group] = (spec, path, 0)
+                chat_clients[group] = make_client(provider, model)
+            cap = caps[f"{provider}:{model}"]["cap"]
+            seed = int(spec.get("seed", 42))
+            messages, _ = build_patch_messages(records.get(iid), budget_for(spec, cap))
+            body = chat_clients[group].payload(messages, temperature, cap, seed)
+            row = {"custom_id": custom_id(provider, model, iid, seed), "method": "POST", "url": "/v1/chat/completions", "body": body}
+            handles[group].write(json.dumps(row) + "\n")
+            files[group] = (spec, files[group][1], files[group][2] + 1)
+    finally:
+        for f in handles.values():
+            f.close()
+
+    for group, (spec, path, n) in files.items():
+        if stopping():
+            # Drained, cancelled or past the deadline: submit nothing more
+            break
+        client = make_batch_client(spec["provider"], chat_clients[group])
+        batch = client.create(client.upload(str(path)))
+        QUOTA.record(spec["provider"], requests=n)
+        state[group] = {"provider": spec["provider"], "model": spec["model"], "batch_id": batch["id"], "requests": n}
+        state_path.write_text(json.dumps(state, indent=1))
+
+    results: Dict[str, Tuple[str, Dict]] = {}
+    stats: Dict = {"batches": {}, "requests": 0, "succeeded": 0, "failed": 0}
+    for group, entry in state.items():
+        client = make_batch_client(entry["provider"], make_client(entry["provider"], entry["model"]))
+        batch = client.wait(entry["batch_id"])
+        stats["batches"][entry["batch_id"]] = {"model": f"{entry['provider']}:{entry['model']}", "status": batch.get("status")}
+        stats["requests"] += entry["requests"]
+        if batch.get("status") != "completed" or not batch.get("output_file_id"):
+            continue
+        try:
+            rows = list(client.content(batch["output_file_id"]))
+        except OpenAICompatError:
+            continue
+        with open(batch_dir / f"results_{group}.jsonl", "w") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+        for row in rows:
+            response = row.get("response") or {}
+            if row.get("error") or response.get("status_code") != 200:
+                continue
+            text, meta = parse_chat_completion(response.get("body") or {})
+            meta["backend"] = f"{entry['provider']}:{entry['model']}"
+            meta["batch_id"] = entry["batch_id"]
+            results[row["custom_id"]] = (text, meta)
+    # Batches left pending by a stop are kept in state.json and re-polled on restart
+    stats["stopped"] = stopping()
+    stats["succeeded"] = len(results)
+    stats["failed"] = stats["requests"] - len(results)
+    stats["wall_s"] = round(time.time() - started, 2)
+    return results, stats
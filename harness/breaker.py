@@ -0,0 +1,199 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from harness.config import env_int
+from harness.deadline import DeadlineExceeded
+from harness.providers.openai_compat import OpenAICompatError
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+CIRCUIT_OPEN_PREFIX = "circuit open"
+
+
+class CircuitOpenError(OpenAICompatError):
+    pass
+
+
+class TaskParked(Exception):
+    """Raised by a task whose model's circuit opened mid-run; it is re-queued, not failed."""
+
+    def __init__(self, next_attempt: int, counts: Optional[Dict] = None) -> None:
+        super().__init__(f"parked before attempt {next_attempt}")
+        self.next_attempt = next_attempt
+        # Counters for attempts finished before parking, merged by the caller
+        self.counts = counts or {}
+
+
+def is_circuit_open_error(meta: Dict) -> bool:
+    return str(meta.get("error") or "").startswith(CIRCUIT_OPEN_PREFIX)
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over a rolling window of call outcomes.
+
+    A call fails if it raises or takes longer than slow_s. Once at least
+    min_calls outcomes are in the window and the failure rate reaches
+    error_rate, the circuit opens for cooldown_s. After that a single probe
+    call is let through (half-open): success closes the circuit, failure
+    re-opens it with the cooldown doubled (up to max_cooldown_s).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: Optional[int] = None,
+        min_calls: Optional[int] = None,
+        error_rate: Optional[float] = None,
+        slow_s: Optional[float] = None,
+        cooldown_s: Optional[float] = None,
+        max_cooldown_s: float = 600.0,
+        on_change: Optional[Callable[[str, str, str, str], None]] = None,
+    ) -> None:
+        self.name = name
+        self.window: deque = deque(maxlen=window or env_int("BREAKER_WINDOW", 20))
+        self.min_calls = min_calls or env_int("BREAKER_MIN_CALLS", 10)
+        self.error_rate = error_rate if error_rate is not None else env_int("BREAKER_ERROR_PCT", 50) / 100.0
+        self.slow_s = slow_s if slow_s is not None else float(env_int("BREAKER_SLOW_S", 120))
+        self.base_cooldown = cooldown_s if cooldown_s is not None else float(env_int("BREAKER_COOLDOWN_S", 30))
+        self.max_cooldown = max_cooldown_s
+        self.cooldown = self.base_cooldown
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.half_open_since = 0.0
+        self.probe_inflight = False
+        self.opened = 0
+        self.rejected = 0
+
+    def _set(self, state: str, reason: str) -> None:
+        old, self.state = self.state, state
+        if state == OPEN:
+            self.opened += 1
+            self.open_until = time.time() + self.cooldown
+        elif state == HALF_OPEN:
+            self.half_open_since = time.time()
+        if self.on_change and old != state:
+            self.on_change(self.name, old, state, reason)
+
+    def allow(self) -> bool:
+        """Whether a call may be sent now; in half-open only one probe is in flight."""
+        with self._lock:
+            if self.state == OPEN and time.time() >= self.open_until:
+                self._set(HALF_OPEN, "cooldown elapsed")
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self.probe_inflight:
+                self.probe_inflight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def admit_task(self) -> bool:
+        """Whether parked or new work for this model may start.
+
+        Closed admits everything; otherwise one task is released per cooldown
+        so its first call can act as the probe.
+        """
+        with self._lock:
+            now = time.time()
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and now >= self.open_until:
+                self._set(HALF_OPEN, "cooldown elapsed")
+                return True
+            if self.state == HALF_OPEN and not self.probe_inflight and now - self.half_open_since >= self.cooldown:
+                # The released task never probed (e.g. failed before calling); release another
+                self.half_open_since = now
+                return True
+            return False
+
+    def record(self, ok: bool, elapsed: float = 0.0) -> None:
+        failed = (not ok) or (self.slow_s > 0 and elapsed > self.slow_s)
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.probe_inflight = False
+                if failed:
+                    self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                    self._set(OPEN, "probe failed")
+                else:
+                    self.cooldown = self.base_cooldown
+                    self.window.clear()
+                    self._set(CLOSED, "probe succeeded")
+                return
+            if self.state == OPEN:
+                return
+            self.window.append(failed)
+            if len(self.window) >= self.min_calls:
+                rate = sum(self.window) / len(self.window)
+                if rate >= self.error_rate:
+                    reason = f"failure rate {rate:.0%} over last {len(self.window)} calls"
+                    self.window.clear()
+                    self._set(OPEN, reason)
+
+    def release(self) -> None:
+        """A granted call ended without a verdict (e.g. our own deadline); free the probe slot."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.probe_inflight = False
+
+    def next_probe_in(self) -> float:
+        with self._lock:
+            if self.state == OPEN:
+                return max(0.0, self.open_until - time.time())
+            if self.state == HALF_OPEN:
+                return max(0.0, self.half_open_since + self.cooldown - time.time())
+            return 0.0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"state": self.state, "opened": self.opened, "rejected_calls": self.rejected, "cooldown_s": self.cooldown}
+
+
+class BreakerChat:
+    """Client wrapper that consults and feeds a CircuitBreaker on every call."""
+
+    def __init__(self, client, breaker: CircuitBreaker) -> None:
+        self.client = client
+        self.breaker = breaker
+        self.model = getattr(client, "model", None)
+
+    def chat(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.2,
+        max_output_tokens: int = 2000,
+        seed: Optional[int] = None,
+    ) -> Tuple[str, Dict[str, float]]:
+        return self._guarded(self.client.chat, messages, temperature=temperature, max_output_tokens=max_output_tokens, seed=seed)
+
+    def samples(
+        self,
+        messages: List[Dict[str, str]],
+        n: int,
+        temperature: float = 0.2,
+        max_output_tokens: int = 2000,
+        seed: Optional[int] = None,
+    ) -> Tuple[List[str], Dict[str, float]]:
+        return self._guarded(self.client.samples, messages, n, temperature=temperature, max_output_tokens=max_output_tokens, seed=seed)
+
+    def _guarded(self, fn, *args, **kwargs):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{CIRCUIT_OPEN_PREFIX}: {self.breaker.name}")
+        start = time.time()
+        try:
+            out = fn(*args, **kwargs)
+        except DeadlineExceeded:
+            # Our own deadline, not a model failure
+            self.breaker.release()
+            raise
+        except OpenAICompatError:
+            self.breaker.record(False, time.time() - start)
+            raise
+        self.breaker.record(True, time.time() - start)
+        return out
@@ -33,6 +33,29 @@ def get_workers_default() -> int:
     return env_int("WORKERS", 12)
 
 
+def get_inflight_default(workers: int) -> int:
+    # Bounded submission window; 0/unset means twice the worker count
+    return env_int("INFLIGHT", 0) or 2 * workers
+
+
+def get_run_deadline_default() -> int:
+    # Seconds for the whole run (0 = none); instance and attempt budgets nest inside it
+    return env_int("RUN_DEADLINE_S", 0)
+
+
+def get_instance_deadline_default() -> int:
+    return env_int("INSTANCE_DEADLINE_S", 0)
+
+
+def get_attempt_deadline_default() -> int:
+    return env_int("ATTEMPT_DEADLINE_S", 0)
+
+
+def get_status_port_default() -> int:
+    # Local status endpoint for scripts/status_top.py; 0 disables it
+    return env_int("STATUS_PORT", 0)
+
+
 def get_eval_workers_default() -> int:
     return env_int("EVAL_WORKERS", 4)
 
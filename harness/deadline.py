@@ -0,0 +1,171 @@
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from harness.providers.openai_compat import OpenAICompatError, abort_inflight, connection_owner
+
+
+# attempts.jsonl status of attempts cut short by a deadline ("deadline") or by drain/cancel/interrupt ("cancelled")
+STOPPED_ATTEMPT_STATUSES = ("deadline", "cancelled")
+
+
+class DeadlineExceeded(OpenAICompatError):
+    """The task's time budget ran out or the run was cancelled."""
+
+
+class RunControl:
+    """Run-level deadline plus drain/cancel flags, shared by the orchestrator and its workers.
+
+    drain: schedule nothing new, let in-flight tasks finish. cancel: also cut
+    in-flight tasks short at their next checkpoint (aborting the provider
+    connections this run has open). Passing the deadline acts like cancel.
+    """
+
+    def __init__(self, deadline_s: Optional[float] = None) -> None:
+        self.deadline_s = deadline_s or None
+        self.deadline = time.time() + deadline_s if deadline_s else None
+        self.draining = threading.Event()
+        self.cancelled = threading.Event()
+        self.reason: Optional[str] = None
+
+    def drain(self, reason: str = "drain") -> None:
+        self.reason = self.reason or reason
+        self.draining.set()
+
+    def cancel(self, reason: str = "cancel") -> None:
+        self.reason = self.reason or reason
+        self.draining.set()
+        self.cancelled.set()
+        abort_inflight(self)
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.time() >= self.deadline
+
+    def stopping(self) -> bool:
+        """True once nothing new should be scheduled."""
+        if self.expired() and not self.draining.is_set():
+            self.reason = self.reason or "deadline"
+            self.draining.set()
+        return self.draining.is_set()
+
+
+_control: ContextVar[Optional[RunControl]] = ContextVar("run_control", default=None)
+# Innermost absolute deadline of the current task (run, instance or attempt, whichever is first)
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+def _narrow(seconds: Optional[float]) -> Optional[float]:
+    cur = _deadline.get()
+    if not seconds:
+        return cur
+    new = time.time() + seconds
+    return new if cur is None else min(cur, new)
+
+
+@contextmanager
+def bind(control: Optional[RunControl], seconds: Optional[float] = None):
+    """Run the enclosed task under `control`, with an optional per-task budget of `seconds`."""
+    t1 = _control.set(control)
+    ends = [d for d in (control.deadline if control else None, time.time() + seconds if seconds else None) if d is not None]
+    t2 = _deadline.set(min(ends) if ends else None)
+    t3 = connection_owner.set(control)
+    try:
+        yield
+    finally:
+        connection_owner.reset(t3)
+        _deadline.reset(t2)
+        _control.reset(t1)
+
+
+@contextmanager
+def within(seconds: Optional[float]):
+    """Narrow the current deadline to at most `seconds` from now (None/0: unchanged)."""
+    token = _deadline.set(_narrow(seconds))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left for the current task, or None without a deadline."""
+    d = _deadline.get()
+    return None if d is None else d - time.time()
+
+
+def stop_reason() -> Optional[str]:
+    """Why the current task must stop now ("cancel", "deadline"), else None; draining alone lets it finish."""
+    control = _control.get()
+    if control is not None and control.cancelled.is_set():
+        return control.reason or "cancel"
+    left = remaining()
+    if left is not None and left <= 0:
+        return "deadline"
+    return None
+
+
+def stopping() -> bool:
+    """True once nothing new should start: the run is draining or cancelled, or the deadline passed."""
+    control = _control.get()
+    return stop_reason() is not None or (control is not None and control.stopping())
+
+
+def check() -> None:
+    reason = stop_reason()
+    if reason:
+        raise DeadlineExceeded(f"{reason}: task stopped")
+
+
+def budget(timeout: float, floor: float = 0.5) -> float:
+    """`timeout` capped to the time left (at least `floor`); raises DeadlineExceeded when nothing is left."""
+    check()
+    left = remaining()
+    return timeout if left is None else max(floor, min(timeout, left))
+
+
+def sleep(seconds: float) -> None:
+    """time.sleep that wakes up (raising DeadlineExceeded) when the run is cancelled."""
+    control = _control.get()
+    if control is None:
+        time.sleep(seconds)
+    elif control.cancelled.wait(seconds):
+        raise DeadlineExceeded(f"{control.reason or 'cancel'}: task stopped")
+
+
+def pause(seconds: float) -> bool:
+    """Sleep up to `seconds`, less when the deadline is nearer; True once the run should stop waiting.
+
+    Unlike sleep(), a drain also ends the pause: for work that has not
+    started yet (e.g. a pending batch) there is nothing in flight to finish.
+    """
+    control = _control.get()
+    left = remaining()
+    if left is not None:
+        seconds = min(seconds, max(0.0, left))
+    if control is None:
+        time.sleep(seconds)
+    elif control.draining.wait(seconds):
+        return True
+    return stopping()
+
+
+def install_signal_handlers(control: RunControl) -> None:
+    """Ctrl-C once: drain. Twice: cancel in-flight work. Three times: KeyboardInterrupt."""
+    presses = [0]
+
+    def handler(signum, frame):
+        presses[0] += 1
+        if presses[0] == 1:
+            print("\nDraining: no new tasks; in-flight tasks finish (Ctrl-C again to cancel them)", flush=True)
+            control.drain("interrupt")
+        elif presses[0] == 2:
+            print("\nCancelling in-flight tasks (Ctrl-C again to exit immediately)", flush=True)
+            control.cancel("interrupt")
+        else:
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            raise KeyboardInterrupt
+
+    signal.signal(signal.SIGINT, handler)
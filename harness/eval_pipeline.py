@@ -0,0 +1,242 @@
+import glob
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from harness.config import get_dataset_name_default, get_eval_workers_default
+
+
+DEFAULT_EVAL_CMD = (
+    "python -m swebench.harness.run_evaluation --dataset_name {dataset} "
+    "--predictions_path {predictions} --max_workers 1 --run_id {run_id} --instance_ids {instance_id} "
+    "--report_dir {report_dir}"
+)
+CACHE_PATH = Path(".cache/eval/verdicts.jsonl")
+
+
+def normalize_patch(patch: str) -> str:
+    """Canonical form used for dedup: LF endings, no `index` lines, no trailing blanks."""
+    lines = []
+    for ln in (patch or "").replace("\r\n", "\n").split("\n"):
+        if ln.startswith("index "):
+            continue
+        lines.append(ln.rstrip())
+    while lines and not lines[-1]:
+        lines.pop()
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def patch_hash(patch: str) -> str:
+    return hashlib.sha256(normalize_patch(patch).encode("utf-8")).hexdigest()
+
+
+class VerdictCache:
+    """Append-only JSONL cache of evaluator verdicts keyed by (instance_id, patch hash)."""
+
+    def __init__(self, path: Path = CACHE_PATH) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict] = {}
+        if self.path.exists():
+            with open(self.path, "r") as f:
+                for ln in f:
+                    ln = ln.strip()
+                    if ln:
+                        row = json.loads(ln)
+                        self._data[row["key"]] = row
+
+    @staticmethod
+    def key(iid: str, phash: str) -> str:
+        return f"{iid}|{phash}"
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            return self._data.get(key)
+
+    def put(self, key: str, row: Dict) -> None:
+        row = {"key": key, **row}
+        with self._lock:
+            self._data[key] = row
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(row) + "\n")
+
+
+def follow_jsonl(path: Path, done: Callable[[], bool], poll: float = 1.0, idle_timeout: float = 0.0) -> Iterator[Dict]:
+    """Yield rows from a JSONL file as they are appended.
+
+    Only complete lines are consumed. Stops once `done()` is true and the file
+    is drained, or after `idle_timeout` seconds without new data (0 = never).
+    """
+    pos = 0
+    buf = ""
+    last_data = time.time()
+    while True:
+        chunk = ""
+        if path.exists():
+            with open(path, "r") as f:
+                f.seek(pos)
+                chunk = f.read()
+                pos = f.tell()
+        if chunk:
+            last_data = time.time()
+            buf += chunk
+            *lines, buf = buf.split("\n")
+            for ln in lines:
+                if ln.strip():
+                    yield json.loads(ln)
+            continue
+        if done():
+            return
+        if idle_timeout and time.time() - last_data > idle_timeout:
+            return
+        time.sleep(poll)
+
+
+def _read_report(report_dir: Path, run_id: str, iid: str) -> Optional[str]:
+    # Commands without {report_dir} leave the report in the cwd; pick it up and clean it away
+    names = glob.glob(str(report_dir / f"*.{run_id}.json")) or glob.glob(f"*.{run_id}.json")
+    for name in names:
+        obj = json.loads(Path(name).read_text())
+        if not Path(name).resolve().is_relative_to(report_dir.resolve()):
+            os.unlink(name)
+        for key, verdict in (
+            ("resolved_ids", "resolved"),
+            ("unresolved_ids", "unresolved"),
+            ("empty_patch_ids", "empty_patch"),
+            ("error_ids", "error"),
+        ):
+            if iid in obj.get(key, []):
+                return verdict
+    return None
+
+
+def evaluate_one(row: Dict, phash: str, eval_cmd: str, timeout: int = 1800) -> Dict:
+    """Run the evaluator command on a single prediction.
+
+    The command runs from the caller's cwd (so relative script paths work);
+    the prediction file and the report directory are a scratch directory
+    passed as {predictions} and {report_dir}.
+    """
+    iid = row["instance_id"]
+    run_id = f"pipe-{phash[:12]}"
+    t0 = time.time()
+    with tempfile.TemporaryDirectory(prefix="eval_") as td:
+        report_dir = Path(td)
+        pred = report_dir / "predictions.jsonl"
+        pred.write_text(json.dumps(row) + "\n")
+        cmd = eval_cmd.format(
+            dataset=shlex.quote(get_dataset_name_default()),
+            predictions=shlex.quote(str(pred)),
+            run_id=run_id,
+            instance_id=shlex.quote(iid),
+            report_dir=shlex.quote(td),
+        )
+        try:
+            proc = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=timeout)
+            verdict = _read_report(report_dir, run_id, iid)
+            err = None if verdict else (proc.stderr.strip()[-400:] or f"exit {proc.returncode}, no report")
+        except subprocess.TimeoutExpired:
+            verdict, err = None, "evaluator timed out"
+    out = {"verdict": verdict or "eval_error", "eval_s": round(time.time() - t0, 3)}
+    if err:
+        out["error"] = err
+    return out
+
+
+class EvalPipeline:
+    """Dedupes predictions by (instance_id, normalized patch hash) and evaluates new ones.
+
+    Cached verdicts (from earlier runs or other models) resolve immediately;
+    only unseen patches go to the evaluator, at most `workers` at a time.
+    Evaluator errors are not cached so they are retried next time.
+    """
+
+    def __init__(self, out_path: Path, eval_cmd: Optional[str] = None, workers: Optional[int] = None,
+                 cache: Optional[VerdictCache] = None) -> None:
+        self.out_path = Path(out_path)
+        self.eval_cmd = eval_cmd or os.getenv("EVAL_CMD", DEFAULT_EVAL_CMD)
+        self.workers = workers or get_eval_workers_default()
+        self.cache = cache or VerdictCache()
+        self.stats = {"rows": 0, "cache_hits": 0, "dedup_hits": 0, "evaluated": 0, "empty": 0}
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, List[Dict]] = {}
+
+    def _emit(self, row: Dict, phash: str, result: Dict, source: str) -> None:
+        out = {
+            "instance_id": row["instance_id"],
+            "model_name_or_path": row.get("model_name_or_path"),
+            "patch_hash": phash,
+            "source": source,
+            **result,
+        }
+        with self._lock:
+            self.out_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.out_path, "a") as f:
+                f.write(json.dumps(out) + "\n")
+
+    def _run(self, key: str, row: Dict, phash: str) -> None:
+        result = evaluate_one(row, phash, self.eval_cmd)
+        with self._lock:
+            if result["verdict"] != "eval_error":
+                self.cache.put(key, {"instance_id": row["instance_id"], "patch_hash": phash, **result})
+            waiters = self._inflight.pop(key, [])
+            self.stats["evaluated"] += 1
+        self._emit(row, phash, result, "evaluator")
+        for w in waiters:
+            self._emit(w, phash, result, "dedup")
+
+    def run(self, rows: Iterator[Dict]) -> Dict:
+        with ThreadPoolExecutor(max_workers=self.workers) as ex:
+            for row in rows:
+                self.stats["rows"] += 1
+                patch = row.get("model_patch") or ""
+                phash = patch_hash(patch)
+                if not patch.strip():
+                    self.stats["empty"] += 1
+                    self._emit(row, phash, {"verdict": "empty_patch"}, "skipped")
+                    continue
+                key = VerdictCache.key(row["instance_id"], phash)
+                # Lookup and registration under one lock: a verdict landing in between would be evaluated twice
+                with self._lock:
+                    hit = self.cache.get(key)
+                    if not hit and key in self._inflight:
+                        self._inflight[key].append(row)
+                        self.stats["dedup_hits"] += 1
+                        continue
+                    if not hit:
+                        self._inflight[key] = []
+                if hit:
+                    self.stats["cache_hits"] += 1
+                    self._emit(row, phash, {"verdict": hit["verdict"]}, "cache")
+                    continue
+                ex.submit(self._run, key, row, phash)
+        return dict(self.stats)
+
+
+def summarize(verdicts_path: Path) -> Dict[str, Dict]:
+    """Per-model report in the evaluator's resolved_ids/unresolved_ids shape."""
+    out: Dict[str, Dict] = {}
+    with open(verdicts_path, "r") as f:
+        for ln in f:
+            if not ln.strip():
+                continue
+            row = json.loads(ln)
+            rep = out.setdefault(row.get("model_name_or_path") or "", {"submitted_ids": [], "resolved_ids": [],
+                                                                          "unresolved_ids": [], "error_ids": [],
+                                                                          "empty_patch_ids": []})
+            rep["submitted_ids"].append(row["instance_id"])
+            key = {"resolved": "resolved_ids", "unresolved": "unresolved_ids", "empty_patch": "empty_patch_ids"}
+            rep[key.get(row["verdict"], "error_ids")].append(row["instance_id"])
+    for rep in out.values():
+        rep["resolved_instances"] = len(rep["resolved_ids"])
+        rep["submitted_instances"] = len(rep["submitted_ids"])
+    return out
@@ -0,0 +1,248 @@
+import glob
+import json
+import threading
+import time
+from collections import deque
+from contextvars import copy_context
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from harness.config import env_int
+from harness.deadline import DeadlineExceeded, budget, stop_reason
+from harness.output_budget import percentile
+from harness.providers.openai_compat import OpenAICompatError
+from harness.quota import QUOTA
+from harness.usage import record_call
+
+
+# Observations needed before percentiles replace the static timeout
+MIN_SAMPLES = 20
+WINDOW = 500
+
+# Shared by all models; primary and hedge requests both run here so the
+# calling worker can wait on either
+_POOL = ThreadPoolExecutor(max_workers=env_int("HEDGE_THREADS", 64), thread_name_prefix="chat")
+
+
+def get_timeout_bounds() -> Tuple[int, int]:
+    return env_int("TIMEOUT_MIN", 10), env_int("TIMEOUT_MAX", 300)
+
+
+def latency_history(paths: Optional[Iterable[str]] = None) -> Dict[str, List[float]]:
+    """Successful call latencies (usage.elapsed) by "provider:model" from attempts.jsonl."""
+    paths = list(paths) if paths is not None else sorted(glob.glob("runs/*/logs/attempts.jsonl"))
+    out: Dict[str, List[float]] = {}
+    for path in paths:
+        try:
+            f = open(path)
+        except OSError:
+            continue
+        with f:
+            for ln in f:
+                try:
+                    row = json.loads(ln)
+                except ValueError:
+                    continue
+                usage = row.get("usage") or {}
+                if usage.get("error") or not usage.get("elapsed"):
+                    continue
+                out.setdefault(f"{row.get('provider')}:{row.get('model')}", []).append(float(usage["elapsed"]))
+    return out
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies for one model."""
+
+    def __init__(self, seed: Optional[List[float]] = None) -> None:
+        self._lock = threading.Lock()
+        self._window: deque = deque((seed or [])[-WINDOW:], maxlen=WINDOW)
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._window.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            if len(self._window) < MIN_SAMPLES:
+                return None
+            values = list(self._window)
+        return percentile(values, pct)
+
+
+class HedgedChat:
+    """Client wrapper with latency-adaptive timeouts and optional request hedging.
+
+    The per-call timeout is 3x the model's observed p99 latency, clamped to
+    [TIMEOUT_MIN, TIMEOUT_MAX]; until enough calls are seen the client's own
+    timeout applies. With hedging on, a duplicate request (same seed) is sent
+    once the primary has been outstanding longer than the observed p95 and
+    the first successful reply wins. Every request sent, duplicates included,
+    is charged to the quota ledger.
+    """
+
+    def __init__(self, client, provider: str, hedge: bool = False, history: Optional[List[float]] = None) -> None:
+        self.client = client
+        self.provider = provider
+        self.model = getattr(client, "model", None)
+        self.hedge = hedge
+        self.tracker = LatencyTracker(history)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.timeouts = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.hedge_wasted_tokens = 0.0
+
+    def timeout(self) -> float:
+        p99 = self.tracker.percentile(99)
+        if p99 is None:
+            return float(getattr(self.client, "timeout", 45))
+        lo, hi = get_timeout_bounds()
+        return min(max(3 * p99, lo), hi)
+
+    def _call(self, messages, temperature, max_output_tokens, seed, timeout, hedge=False) -> Tuple[str, Dict]:
+        start = time.time()
+        backend = f"{self.provider}:{self.model}"
+        QUOTA.record(self.provider, hedge=hedge)
+        try:
+            text, meta = self.client.chat(
+                messages, temperature=temperature, max_output_tokens=max_output_tokens, seed=seed, timeout=timeout
+            )
+        except OpenAICompatError as e:
+            record_call(backend, {"elapsed": time.time() - start}, ok=False, hedge=hedge, error=str(e))
+            reason = stop_reason()
+            if reason and not isinstance(e, DeadlineExceeded):
+                # Cut short by the deadline or a cancel, not the backend's fault
+                raise DeadlineExceeded(f"{reason}: {e}") from e
+            if "timed out" in str(e).lower():
+                with self._lock:
+                    self.timeouts += 1
+            raise
+        self.tracker.add(time.time() - start)
+        meta["backend"] = backend
+        record_call(backend, meta, hedge=hedge)
+        return text, meta
+
+    def _charge_loser(self, fut) -> None:
+        # The losing duplicate still completes and bills tokens; account for it
+        try:
+            _, meta = fut.result()
+        except Exception:
+            return
+        with self._lock:
+            self.hedge_wasted_tokens += meta.get("total_tokens", 0)
+
+    def chat(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.2,
+        max_output_tokens: int = 2000,
+        seed: Optional[int] = None,
+    ) -> Tuple[str, Dict[str, float]]:
+        # Never wait past the task's deadline; raises DeadlineExceeded once it has passed
+        timeout = budget(self.timeout())
+        with self._lock:
+            self.calls += 1
+        delay = self.tracker.percentile(95) if self.hedge else None
+        if delay is None:
+            text, meta = self._call(messages, temperature, max_output_tokens, seed, timeout)
+            meta["timeout_s"] = round(timeout, 2)
+            return text, meta
+
+        # copy_context() carries the task's usage ledger and status into the pool threads
+        primary = _POOL.submit(copy_context().run, self._call, messages, temperature, max_output_tokens, seed, timeout)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            text, meta = primary.result()
+            meta["timeout_s"] = round(timeout, 2)
+            return text, meta
+        with self._lock:
+            self.hedged += 1
+        backup = _POOL.submit(copy_context().run, self._call, messages, temperature, max_output_tokens, seed, timeout, True)
+        pending = {primary, backup}
+        error: Optional[Exception] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                try:
+                    text, meta = fut.result()
+                except OpenAICompatError as e:
+                    error = e
+                    continue
+                for other in pending:
+                    other.add_done_callback(self._charge_loser)
+                if fut is backup:
+                    with self._lock:
+                        self.hedge_wins += 1
+                meta["hedged"] = True
+                meta["hedge_won"] = fut is backup
+                meta["timeout_s"] = round(timeout, 2)
+                return text, meta
+        raise error
+
+    def samples(
+        self,
+        messages: List[Dict[str, str]],
+        n: int,
+        temperature: float = 0.2,
+        max_output_tokens: int = 2000,
+        seed: Optional[int] = None,
+    ) -> Tuple[List[str], Dict[str, float]]:
+        """Multi-sample request (never hedged); charged to the quota as one request."""
+        # Never wait past the task's deadline; raises DeadlineExceeded once it has passed
+        timeout = budget(self.timeout())
+        with self._lock:
+            self.calls += 1
+        start = time.time()
+        backend = f"{self.provider}:{self.model}"
+        QUOTA.record(self.provider)
+        try:
+            texts, meta = self.client.samples(
+                messages, n, temperature=temperature, max_output_tokens=max_output_tokens, seed=seed, timeout=timeout
+            )
+        except OpenAICompatError as e:
+            record_call(backend, {"elapsed": time.time() - start}, ok=False, error=str(e))
+            reason = stop_reason()
+            if reason and not isinstance(e, DeadlineExceeded):
+                raise DeadlineExceeded(f"{reason}: {e}") from e
+            if "timed out" in str(e).lower():
+                with self._lock:
+                    self.timeouts += 1
+            raise
+        self.tracker.add(time.time() - start)
+        meta["backend"] = backend
+        record_call(backend, meta)
+        meta["timeout_s"] = round(timeout, 2)
+        return texts, meta
+
+    def stats(self) -> Dict:
+        with self._lock:
+            out = {
+                "calls": self.calls,
+                "timeouts": self.timeouts,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "hedge_wasted_tokens": self.hedge_wasted_tokens,
+            }
+        p50, p95, p99 = (self.tracker.percentile(p) for p in (50, 95, 99))
+        out.update(
+            {
+                "call_p50_s": round(p50, 3) if p50 is not None else None,
+                "call_p95_s": round(p95, 3) if p95 is not None else None,
+                "call_p99_s": round(p99, 3) if p99 is not None else None,
+                "timeout_s": round(self.timeout(), 2),
+            }
+        )
+        return out
+
+
+def latency_summary(latencies: List[float]) -> Dict:
+    if not latencies:
+        return {"attempts": 0}
+    return {
+        "attempts": len(latencies),
+        "p50_s": round(percentile(latencies, 50), 3),
+        "p95_s": round(percentile(latencies, 95), 3),
+        "p99_s": round(percentile(latencies, 99), 3),
+        "max_s": round(max(latencies), 3),
+    }
@@ -0,0 +1,203 @@
+import fcntl
+import json
+import os
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from harness.config import env_int
+from harness.preflight import CACHE_DIR, ensure_repo
+
+
+ENVS_DIR = Path(".cache/envs")
+WORKTREES_DIR = Path(".cache/worktrees")
+
+
+def _slug(repo: str) -> str:
+    return repo.strip().replace("/", "__")
+
+
+def env_python(repo: str, version: str) -> str:
+    """Interpreter of the cached virtualenv for (repo, version).
+
+    Environments live at .cache/envs/<owner>__<name>__<version>/ and are
+    expected to be pre-populated (this module never installs anything).
+    LOCAL_EVAL_PYTHON is the fallback for small fixture repos.
+    """
+    env_dir = ENVS_DIR / f"{_slug(repo)}__{version}"
+    for cand in (env_dir / "bin" / "python", env_dir / "Scripts" / "python.exe"):
+        if cand.exists():
+            return str(cand)
+    fallback = os.getenv("LOCAL_EVAL_PYTHON")
+    if fallback:
+        return fallback
+    raise RuntimeError(f"No cached environment for {repo}@{version} under {env_dir}")
+
+
+def _git(args: List[str], cwd: Path, timeout: int = 60) -> subprocess.CompletedProcess:
+    return subprocess.run(["git", *args], cwd=str(cwd), capture_output=True, text=True, timeout=timeout)
+
+
+def _checked(proc: subprocess.CompletedProcess, what: str) -> None:
+    if proc.returncode != 0:
+        raise RuntimeError(f"{what} failed: {proc.stderr.strip()[:400]}")
+
+
+def _repo_cache(repo: str, commit: Optional[str]) -> Path:
+    # Prefer the local clone as-is (offline); only go to the network if the commit is missing
+    dest = CACHE_DIR / repo.strip()
+    if (dest / ".git").exists() and (not commit or _git(["cat-file", "-e", f"{commit}^{{commit}}"], dest).returncode == 0):
+        return dest
+    dest = ensure_repo(repo)
+    if commit:
+        _checked(_git(["fetch", "--depth", "1", "origin", commit], dest), f"fetch of {commit}")
+    return dest
+
+
+@contextmanager
+def worktree(repo: str, commit: str, slots: int = 8) -> Iterator[Path]:
+    """Lease a pooled git worktree of `repo` checked out (clean) at `commit`.
+
+    Slots are guarded by flock so concurrent processes never share one; a
+    worktree is created once and afterwards only reset, which is far cheaper
+    than a fresh checkout. Raises RuntimeError unless the slot ends up at
+    `commit`, so tests never run against a previous lease's revision.
+    """
+    base = _repo_cache(repo, commit)
+    proc = _git(["rev-parse", "--verify", f"{commit}^{{commit}}"], base)
+    _checked(proc, f"resolving {commit}")
+    want = proc.stdout.strip()
+    pool = WORKTREES_DIR / _slug(repo)
+    pool.mkdir(parents=True, exist_ok=True)
+    deadline = time.time() + 600
+    while True:
+        for i in range(slots):
+            lock_f = open(pool / f"{i}.lock", "w")
+            try:
+                fcntl.flock(lock_f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_f.close()
+                continue
+            try:
+                wt = (pool / str(i)).resolve()
+                if not (wt / ".git").exists():
+                    # prune/add edit the shared repo's worktree list; one process at a time
+                    with open(pool / "add.lock", "w") as add_f:
+                        fcntl.flock(add_f, fcntl.LOCK_EX)
+                        _git(["worktree", "prune"], base)
+                        _checked(_git(["worktree", "add", "--detach", "--force", str(wt), want], base, timeout=300), "worktree add")
+                else:
+                    _checked(_git(["checkout", "--force", "--detach", want], wt, timeout=300), "worktree checkout")
+                    _checked(_git(["clean", "-fdxq"], wt, timeout=300), "worktree clean")
+                head = _git(["rev-parse", "HEAD"], wt).stdout.strip()
+                if head != want:
+                    raise RuntimeError(f"worktree is at {head or 'nothing'}, not {want}")
+                yield wt
+                return
+            finally:
+                fcntl.flock(lock_f, fcntl.LOCK_UN)
+                lock_f.close()
+        if time.time() > deadline:
+            raise RuntimeError(f"No free worktree slot for {repo}")
+        time.sleep(0.5)
+
+
+def _apply(wt: Path, patch: str) -> Optional[str]:
+    with tempfile.NamedTemporaryFile("w", suffix=".diff", delete=False) as tf:
+        tf.write(patch if patch.endswith("\n") else patch + "\n")
+        path = tf.name
+    try:
+        proc = _git(["apply", "--whitespace=nowarn", path], wt)
+        return None if proc.returncode == 0 else (proc.stderr.strip()[:800] or "git apply failed")
+    finally:
+        os.unlink(path)
+
+
+def _test_list(value) -> List[str]:
+    # SWE-bench stores these as JSON-encoded strings
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            value = [value] if value else []
+    return list(value or [])
+
+
+def run_test(python: str, wt: Path, test_id: str, timeout: int) -> str:
+    cmd = [python, "-m", "pytest", "-q", "-x", "-p", "no:cacheprovider", "--no-header", "-rN", test_id]
+    try:
+        proc = subprocess.run(cmd, cwd=str(wt), capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return "timeout"
+    if proc.returncode == 0:
+        return "passed"
+    # 4/5: usage error or no tests collected -> the id does not exist here
+    return "error" if proc.returncode in (4, 5) else "failed"
+
+
+def evaluate_prediction(pred: Dict, instance: Dict, test_timeout: int = 60, max_pass_to_pass: int = 0) -> Dict:
+    """Apply the prediction (plus the instance's test_patch) and run its target tests."""
+    t0 = time.time()
+    iid = pred["instance_id"]
+    out: Dict = {"instance_id": iid, "model_name_or_path": pred.get("model_name_or_path")}
+    patch = pred.get("model_patch") or ""
+    if not patch.strip():
+        return {**out, "status": "empty_patch", "resolved_locally": False, "duration_s": 0.0}
+    repo = instance.get("repo") or ""
+    try:
+        python = env_python(repo, str(instance.get("version") or "default"))
+        with worktree(repo, instance.get("base_commit") or "HEAD") as wt:
+            err = _apply(wt, patch)
+            if err:
+                return {**out, "status": "patch_failed", "error": err, "resolved_locally": False,
+                        "duration_s": round(time.time() - t0, 3)}
+            test_patch = instance.get("test_patch") or ""
+            if test_patch.strip():
+                err = _apply(wt, test_patch)
+                if err:
+                    return {**out, "status": "test_patch_failed", "error": err, "resolved_locally": False,
+                            "duration_s": round(time.time() - t0, 3)}
+            f2p = {t: run_test(python, wt, t, test_timeout) for t in _test_list(instance.get("FAIL_TO_PASS"))}
+            p2p_ids = _test_list(instance.get("PASS_TO_PASS"))
+            if max_pass_to_pass:
+                p2p_ids = p2p_ids[:max_pass_to_pass]
+            p2p = {t: run_test(python, wt, t, test_timeout) for t in p2p_ids}
+    except (RuntimeError, subprocess.TimeoutExpired) as e:
+        return {**out, "status": "setup_error", "error": str(e), "resolved_locally": False,
+                "duration_s": round(time.time() - t0, 3)}
+    resolved = bool(f2p) and all(v == "passed" for v in f2p.values()) and all(v == "passed" for v in p2p.values())
+    return {
+        **out,
+        "status": "ok",
+        "resolved_locally": resolved,
+        "fail_to_pass": f2p,
+        "pass_to_pass": p2p,
+        "duration_s": round(time.time() - t0, 3),
+    }
+
+
+def _eval_worker(args) -> Dict:
+    pred, instance, test_timeout, max_p2p = args
+    return evaluate_prediction(pred, instance, test_timeout, max_p2p)
+
+
+def evaluate_predictions(
+    preds: List[Dict],
+    records,
+    workers: Optional[int] = None,
+    test_timeout: int = 60,
+    max_pass_to_pass: int = 0,
+) -> Iterator[Dict]:
+    """Evaluate predictions in a process pool; yields results as they finish."""
+    workers = workers or env_int("LOCAL_EVAL_WORKERS", 4)
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futs = [
+            ex.submit(_eval_worker, (p, records.get(p["instance_id"]), test_timeout, max_pass_to_pass))
+            for p in preds
+        ]
+        for fut in as_completed(futs):
+            yield fut.result()
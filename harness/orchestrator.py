@@ -1,25 +1,48 @@
 import json
 import os
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import Counter, deque
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Dict, Iterable, List, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
+from harness import deadline
 from harness.config import (
     load_credentials_into_env,
+    get_attempt_deadline_default,
+    get_inflight_default,
+    get_instance_deadline_default,
+    get_run_deadline_default,
     get_workers_default,
 )
 from harness.providers.openai_compat import OpenAICompatChat, OpenAICompatError
 from harness.agent.patch_controller import (
+    build_patch_sections,
     build_patch_system_prompt,
-    build_patch_user_prompt,
     extract_diff,
     normalize_diff,
     rewrite_paths_for_repo,
     validate_diff_structure,
 )
 from harness.agent.edit_controller import run_edit_attempt
+from harness.agent.retrieval import format_snippets, retrieve_for_instance
+from harness.agent.tool_cache import TOOL_CACHE
+from harness.breaker import BreakerChat, CircuitBreaker, TaskParked, is_circuit_open_error
+from harness.latency import latency_history, latency_summary
+from harness.output_budget import AdaptiveOutputChat, learn_output_caps
 from harness.preflight import preflight_apply
+from harness.quota import QUOTA
+from harness.providers.batch_api import custom_id
+from harness.providers.mock import MockChat
+from harness.records import open_record_source
+from harness.router import build_model_client
+from harness.sampling import BaseFiles, rank_candidates, sample_completions
+from harness.status import RunStatus, StatusChat, register, set_stage
+from harness.sharding import expected_units, shard_dir_name, shard_of, units_digest
+from harness.tokens import TokenBudget, budget_for, fit_sections
+from harness.pricing import load_prices
+from harness.usage import UsageLedger, bind, record_call
 
 
 def load_instances_jsonl(path: str) -> List[str]:
@@ -36,27 +59,10 @@ def load_instances_jsonl(path: str) -> List[str]:
     return ids
 
 
-def load_dataset_records(instance_ids: Iterable[str]) -> Dict[str, Dict]:
-    # Load from HF to build prompts (title/body/repo info).
-    try:
-        from datasets import load_dataset
-    except Exception as e:
-        raise RuntimeError("Please install `datasets` package")
-    ds = load_dataset("princeton-nlp/SWE-bench_Lite", split="test")
-    by_id: Dict[str, Dict] = {}
-    wanted = set(instance_ids)
-    for rec in ds:
-        iid = rec.get("instance_id")
-        if iid in wanted:
-            by_id[iid] = rec
-    missing = wanted - set(by_id.keys())
-    if missing:
-        raise RuntimeError(f"Missing instances in dataset: {sorted(missing)}")
-    return by_id
-
-
 def make_client(provider: str, model: str) -> OpenAICompatChat:
     provider = provider.lower()
+    if provider == "mock":
+        return MockChat(model=model)
     if provider == "chutes":
         base_url = os.getenv("CHUTES_BASE_URL", "https://llm.chutes.ai/v1/chat/completions")
         api_key = os.getenv("CHUTES_API_KEY", "")
@@ -74,15 +80,10 @@ def make_client(provider: str, model: str) -> OpenAICompatChat:
         raise RuntimeError(f"Unknown provider: {provider}")
 
 
-def run_patch_attempt(
-    client: OpenAICompatChat,
-    instance: Dict,
-    temperature: float,
-    max_output_tokens: int,
-    seed: int,
-) -> Tuple[str, Dict]:
+def build_patch_messages(instance: Dict, budget: TokenBudget) -> Tuple[List[Dict[str, str]], Dict]:
+    """First-turn patch-mode messages for an instance, fitted to the budget, plus prompt meta."""
     sys_prompt = build_patch_system_prompt()
-    user = build_patch_user_prompt(instance)
+    sections = build_patch_sections(instance)
     # Add repository file hints based on keywords to reduce path errors
     repo = (instance.get("repo") or "").strip()
     if repo and os.getenv("REPO_HINTS", "1") != "0":
@@ -92,21 +93,71 @@ def run_patch_attempt(
         keys = [w.strip(".,:;()[]{}\"'!?") for w in text_fields.split()]
         try:
             from harness.preflight import repo_file_hints
-            hints = repo_file_hints(repo, tuple(keys), limit=5)
+            hints = repo_file_hints(repo, tuple(keys), limit=5, commit=instance.get("base_commit") or None)
         except Exception:
             hints = []
         if hints:
-            user += "\n\nRepository likely files (paths):\n- " + "\n- ".join(hints)
+            sections.append(
+                {"name": "repo_hints", "text": "Repository likely files (paths):\n- " + "\n- ".join(hints), "priority": 20, "trim": "tail"}
+            )
+    # Lexical retrieval of real code so context lines are not guessed
+    retrieval: Dict = {"snippets": 0}
+    if repo and os.getenv("RETRIEVAL", "1") != "0":
+        try:
+            snippets = retrieve_for_instance(instance)["snippets"]
+        except Exception as e:
+            snippets = []
+            retrieval["error"] = str(e)[:200]
+        if snippets:
+            block = format_snippets(snippets)
+            sections.append({"name": "retrieval", "text": block, "priority": 10, "trim": "tail"})
+            retrieval = {"snippets": len(snippets), "est_tokens": budget.count(block)}
+    # Trim low-priority sections so system + user fit context - max_output_tokens
+    avail = budget.prompt_tokens - budget.count_messages([{"role": "system", "content": sys_prompt}, {"role": "user", "content": ""}])
+    user, fit = fit_sections(sections, avail, budget.estimator)
     messages = [{"role": "system", "content": sys_prompt}, {"role": "user", "content": user}]
-    try:
-        text, meta = client.chat(messages, temperature=temperature, max_output_tokens=max_output_tokens, seed=seed)
-    except OpenAICompatError as e:
-        return "", {"error": str(e)}
+    prompt_meta = {
+        "retrieval": retrieval,
+        # Estimated vs provider-reported prompt tokens, for calibrating the estimator
+        "estimator": budget.estimator.name,
+        "est_prompt_tokens": budget.count_messages(messages),
+        "prompt_fit": {"budget": fit["budget"], "trimmed": fit["trimmed"]},
+    }
+    return messages, prompt_meta
+
+
+def run_patch_attempt(
+    client: OpenAICompatChat,
+    instance: Dict,
+    temperature: float,
+    max_output_tokens: int,
+    seed: int,
+    budget: Optional[TokenBudget] = None,
+    first: Optional[Tuple[str, Dict]] = None,
+) -> Tuple[str, Dict]:
+    """One patch-mode attempt; `first` is an already-obtained first reply (e.g. from a batch)."""
+    budget = budget or budget_for(None, max_output_tokens)
+    set_stage("prompt")
+    messages, prompt_meta = build_patch_messages(instance, budget)
+    if first is not None:
+        text, meta = first
+        record_call(meta.get("backend"), meta, batch=True)
+    else:
+        set_stage("model call")
+        try:
+            text, meta = client.chat(messages, temperature=temperature, max_output_tokens=max_output_tokens, seed=seed)
+        except OpenAICompatError as e:
+            return "", {"error": str(e)}
+    meta["reasks"] = 0
+    meta["completion_tokens_per_call"] = [meta.get("completion_tokens", 0)]
+    meta["backend_per_call"] = [meta.get("backend")]
+    meta.update(prompt_meta)
 
     # First parse and structurally validate
     diff = extract_diff(text)
     ok, reason = validate_diff_structure(diff)
     if not diff or not ok:
+        meta["reasks"] += 1
         messages.append({"role": "assistant", "content": text})
         messages.append(
             {
@@ -119,11 +170,13 @@ def run_patch_attempt(
                 ),
             }
         )
+        meta["est_prompt_tokens"] += budget.count_messages(messages)
+        set_stage("re-ask (format)")
         try:
             text, meta2 = client.chat(
                 messages, temperature=temperature, max_output_tokens=max_output_tokens, seed=seed
             )
-            meta.update({k: meta.get(k, 0) + meta2.get(k, 0) for k in ["prompt_tokens", "completion_tokens", "total_tokens"]})
+            _add_usage(meta, meta2)
             diff = extract_diff(text)
         except OpenAICompatError as e:
             return "", {"error": str(e), **meta}
@@ -138,8 +191,14 @@ def run_patch_attempt(
     # Preflight apply check (advisory)
     if diff and repo and os.getenv("PREFLIGHT_APPLY", "1") != "0":
         base_commit = instance.get("base_commit")
+        set_stage("preflight")
         ok_apply, err = preflight_apply(repo, diff, commit=base_commit)
-        if not ok_apply:
+        meta["preflight"] = {"first": ok_apply, "final": ok_apply}
+        if not ok_apply and err.startswith("preflight:"):
+            # Could not check (timeout, setup, deadline): nothing for the model to fix
+            meta["preflight"]["error"] = err[:200]
+        elif not ok_apply:
+            meta["reasks"] += 1
             # Provide stderr back to the model for a single corrective re-ask
             messages.append({"role": "assistant", "content": text})
             messages.append(
@@ -151,23 +210,80 @@ def run_patch_attempt(
                     ),
                 }
             )
+            meta["est_prompt_tokens"] += budget.count_messages(messages)
+            set_stage("re-ask (preflight)")
             try:
                 text, meta3 = client.chat(
                     messages, temperature=temperature, max_output_tokens=max_output_tokens, seed=seed
                 )
-                meta.update({k: meta.get(k, 0) + meta3.get(k, 0) for k in ["prompt_tokens", "completion_tokens", "total_tokens"]})
+                _add_usage(meta, meta3)
                 diff2 = extract_diff(text)
                 if diff2:
                     diff2 = normalize_diff(diff2)
                     if repo:
                         diff2 = rewrite_paths_for_repo(diff2, repo)
                     diff = diff2
+                    meta["preflight"]["final"] = preflight_apply(repo, diff, commit=base_commit)[0]
             except OpenAICompatError as e:
                 return "", {"error": str(e), **meta}
 
     return diff, meta
 
 
+def _add_usage(meta: Dict, other: Dict) -> None:
+    """Fold the usage of a later call (or attempt) into `meta`."""
+    for k in ("prompt_tokens", "completion_tokens", "total_tokens", "cached_tokens"):
+        meta[k] = meta.get(k, 0) + other.get(k, 0)
+    # A single call's meta has no per-call lists; an errored attempt has neither
+    single = "completion_tokens" in other and "completion_tokens_per_call" not in other
+    meta.setdefault("completion_tokens_per_call", []).extend([other["completion_tokens"]] if single else other.get("completion_tokens_per_call", []))
+    meta.setdefault("backend_per_call", []).extend([other.get("backend")] if single else other.get("backend_per_call", []))
+
+
+def run_sampled_attempt(
+    client: OpenAICompatChat,
+    instance: Dict,
+    temperature: float,
+    max_output_tokens: int,
+    seed: int,
+    k: int,
+    budget: Optional[TokenBudget] = None,
+) -> Tuple[str, Dict]:
+    """One patch-mode attempt from k sampled completions of the same prompt, keeping the best diff."""
+    budget = budget or budget_for(None, max_output_tokens)
+    set_stage("prompt")
+    messages, prompt_meta = build_patch_messages(instance, budget)
+    set_stage("sampling")
+    try:
+        texts, meta = sample_completions(client, messages, k, temperature, max_output_tokens, seed)
+    except OpenAICompatError as e:
+        return "", {"error": str(e)}
+    meta["reasks"] = 0
+    meta.update(prompt_meta)
+    repo = (instance.get("repo") or "").strip()
+    diffs = []
+    for text in texts:
+        diff = extract_diff(text)
+        if diff:
+            diff = normalize_diff(diff)
+            if repo:
+                diff = rewrite_paths_for_repo(diff, repo)
+        if diff and validate_diff_structure(diff)[0]:
+            diffs.append(diff)
+    commit = instance.get("base_commit")
+    set_stage("ranking")
+    check = None
+    if repo and os.getenv("PREFLIGHT_APPLY", "1") != "0":
+        check = lambda d: preflight_apply(repo, d, commit=commit)[0]
+    best, ranking = rank_candidates(diffs, BaseFiles(repo, commit) if repo else None, check)
+    meta["sampling"].update(ranking)
+    # Any candidate passing preflight (or, without preflight, any valid candidate)
+    meta["sampling"]["passed"] = any(ranking["preflight"]) if "preflight" in ranking else best is not None
+    if "preflight" in ranking and ranking["preflight"]:
+        meta["preflight"] = {"first": ranking["preflight"][0], "final": ranking["preflight"][-1]}
+    return best or "", meta
+
+
 def orchestrate_predictions(
     run_id: str,
     instances_path: str,
@@ -176,48 +292,188 @@ def orchestrate_predictions(
     temperature: float = 0.2,
     max_output_tokens: int = 2000,
     mode: str = "patch",
+    shard: Optional[Tuple[int, int]] = None,
+    adaptive_output_tokens: bool = False,
+    hedge: bool = False,
+    batch: bool = False,
+    samples: int = 1,
+    records=None,
+    model_clients: Optional[Dict] = None,
+    executor: Optional[ThreadPoolExecutor] = None,
+    control: Optional[deadline.RunControl] = None,
 ) -> str:
+    """Run all (model, instance) tasks and write predictions plus a manifest; returns the predictions path.
+
+    `records`, `model_clients` and `executor` let a caller (scripts/sweep.py)
+    share the dataset, warm per-model clients and one worker pool across runs.
+    `control` carries the run deadline and drain/cancel requests (default:
+    RUN_DEADLINE_S); once it is stopping nothing new is scheduled, in-flight
+    tasks finish or are cut short, and the manifest is still written.
+    """
+    control = control or deadline.RunControl(get_run_deadline_default())
     load_credentials_into_env()
 
     out_dir = Path("runs") / run_id
+    if shard:
+        # Each shard owns a private directory; scripts/merge_shards.py combines them
+        out_dir = out_dir / "shards" / shard_dir_name(*shard)
     out_dir.mkdir(parents=True, exist_ok=True)
+    # A manifest marks a finished run (scripts/eval_pipeline.py --follow waits for it)
+    (out_dir / "manifest.json").unlink(missing_ok=True)
     pred_path = out_dir / "predictions.jsonl"
     logs_dir = out_dir / "logs"
     logs_dir.mkdir(exist_ok=True)
 
     instance_ids = load_instances_jsonl(instances_path)
-    by_id = load_dataset_records(instance_ids)
+    if records is None:
+        records = open_record_source(instance_ids)
 
     workers = get_workers_default()
+    window = get_inflight_default(workers)
     attempts_log = out_dir / "logs" / "attempts.jsonl"
-    with ThreadPoolExecutor(max_workers=workers) as ex, open(pred_path, "w") as outf:
-        futures = []
-        for spec in model_specs:
+    clients: Dict[Tuple[str, str], AdaptiveOutputChat] = {}
+    # Per-model output caps: spec override, else learned from past attempts when adaptive
+    caps = learn_output_caps(model_specs, max_output_tokens, history=None if adaptive_output_tokens else {})
+    quality: Dict[str, int] = {}
+    latencies: List[float] = []
+    lat_history = latency_history()
+    prefetched: Dict[str, Tuple[str, Dict]] = {}
+    batch_stats: Optional[Dict] = None
+    if batch:
+        # First turns go through the provider batch API; only failures and re-asks run interactively
+        if mode != "patch" or samples > 1:
+            raise RuntimeError("batch mode supports --mode patch with one sample only")
+        from harness.batch import run_batches
+
+        # Under the run control so a drain, cancel or the deadline ends the wait for results
+        with deadline.bind(control):
+            prefetched, batch_stats = run_batches(
+                out_dir / "batch", _iter_tasks(model_specs, instance_ids, shard), records, temperature, caps, make_client
+            )
+    breaker_log = str(logs_dir / "breaker.jsonl")
+    breakers: Dict[Tuple[str, str], BreakerChat] = {}
+    # Work for a model whose circuit is open waits here as (spec, iid, next attempt)
+    parked: Dict[Tuple[str, str], deque] = {}
+    parked_total = 0
+
+    def on_breaker_change(name: str, old: str, new: str, reason: str) -> None:
+        _write_line(breaker_log, {"model": name, "from": old, "to": new, "reason": reason, "ts": int(time.time())})
+
+    # Live counters for the status endpoint (scripts/status_top.py)
+    status = RunStatus(run_id, Counter((s["provider"], s["model"]) for s, _ in _iter_tasks(model_specs, instance_ids, shard)), workers)
+    register(status)
+    tracked: Dict[Tuple[str, str], StatusChat] = {}
+    # Every provider request, priced later from config/prices.yaml
+    ledger = UsageLedger(str(logs_dir / "usage.jsonl"))
+
+    model_clients = {} if model_clients is None else model_clients
+    pool = nullcontext(executor) if executor is not None else ThreadPoolExecutor(max_workers=workers)
+    with pool as ex, open(pred_path, "w") as outf:
+        # Stream tasks through a bounded in-flight window: at most `window`
+        # futures exist at once and each worker loads its own record, so memory
+        # stays flat no matter how many (model, instance) pairs there are.
+        tasks = _iter_tasks(model_specs, instance_ids, shard)
+        pending: Dict = {}
+        exhausted = False
+
+        def submit(spec: Dict, iid: str, start: int) -> None:
             provider = spec["provider"]
             model_name = spec["model"]
-            seed = int(spec.get("seed", 42))
-            client = make_client(provider, model_name)
-            for iid in instance_ids:
-                instance = by_id[iid]
-                futures.append(
-                    ex.submit(
-                        _per_instance,
-                        outf.name,
-                        str(attempts_log),
-                        provider,
-                        model_name,
-                        client,
-                        iid,
-                        instance,
-                        attempts,
-                        temperature,
-                        max_output_tokens,
-                        seed,
-                        mode,
-                    )
-                )
-        for fut in as_completed(futures):
-            fut.result()
+            key = (provider, model_name)
+            cap = caps[f"{provider}:{model_name}"]["cap"]
+            first = prefetched.pop(custom_id(provider, model_name, iid, int(spec.get("seed", 42))), None) if prefetched and start == 0 else None
+            fut = ex.submit(
+                status.run_task,
+                key,
+                iid,
+                _run_task,
+                outf.name,
+                str(attempts_log),
+                provider,
+                model_name,
+                tracked[key],
+                iid,
+                records,
+                attempts,
+                temperature,
+                cap,
+                int(spec.get("seed", 42)),
+                mode,
+                budget_for(spec, cap),
+                start,
+                first,
+                samples,
+                ledger,
+                control,
+            )
+            pending[fut] = (spec, iid, start)
+            if start == 0:
+                status.submitted(key)
+
+        while True:
+            stopping = control.stopping()
+            if stopping:
+                # Submitted tasks no worker has picked up yet stay unscheduled
+                for fut in [f for f in pending if f.cancel()]:
+                    spec, _, start = pending.pop(fut)
+                    if start == 0:
+                        status.requeued((spec["provider"], spec["model"]))
+            # Parked work resumes once its breaker lets a probe (or everything) through
+            for key, q in parked.items():
+                while q and not stopping and len(pending) < window and breakers[key].breaker.admit_task():
+                    submit(*q.popleft())
+            while not exhausted and not stopping and len(pending) < window:
+                try:
+                    spec, iid = next(tasks)
+                except StopIteration:
+                    exhausted = True
+                    break
+                provider = spec["provider"]
+                model_name = spec["model"]
+                key = (provider, model_name)
+                if key not in clients:
+                    # HedgedChat per backend; specs listing `backends` get a router over them
+                    if key not in model_clients:
+                        model_clients[key] = build_model_client(spec, make_client, hedge, lat_history)
+                    routed = model_clients[key]
+                    clients[key] = AdaptiveOutputChat(routed, max_output_tokens, escalate=adaptive_output_tokens, spec=spec)
+                    breakers[key] = BreakerChat(clients[key], CircuitBreaker(f"{provider}:{model_name}", on_change=on_breaker_change))
+                    tracked[key] = StatusChat(breakers[key], status, f"{provider}:{model_name}")
+                if parked.get(key) or not breakers[key].breaker.admit_task():
+                    parked.setdefault(key, deque()).append((spec, iid, 0))
+                    parked_total += 1
+                    continue
+                submit(spec, iid, 0)
+            waiting = [breakers[key].breaker.next_probe_in() for key, q in parked.items() if q] if not stopping else []
+            if control.deadline is not None and not stopping:
+                # Wake up at the deadline to stop scheduling
+                waiting.append(control.deadline - time.time())
+            if not pending:
+                if not waiting or (exhausted and not any(parked.values())):
+                    break
+                time.sleep(max(0.05, min(waiting)))
+                continue
+            # Bounded so a drain request (Ctrl-C) is noticed while every worker is busy
+            done, _ = wait(list(pending), timeout=max(0.05, min(waiting + [0.25])), return_when=FIRST_COMPLETED)
+            for fut in done:
+                spec, iid, start = pending.pop(fut)
+                try:
+                    counts = fut.result()
+                    if counts is None:
+                        if start == 0:
+                            status.requeued((spec["provider"], spec["model"]))
+                        continue
+                except TaskParked as e:
+                    parked.setdefault((spec["provider"], spec["model"]), deque()).append((spec, iid, e.next_attempt))
+                    parked_total += 1
+                    status.requeued((spec["provider"], spec["model"]))
+                    counts = e.counts
+                latencies.extend(counts.pop("attempt_latencies", []))
+                for k, v in counts.items():
+                    quality[k] = quality.get(k, 0) + v
+    status.finish()
+    ledger.close()
+    unscheduled = sum(m["queued"] for m in status.models.values())
 
     # write manifest
     manifest = {
@@ -228,12 +484,100 @@ def orchestrate_predictions(
         "attempts": attempts,
         "temperature": temperature,
         "max_output_tokens": max_output_tokens,
+        "mode": mode,
+        "instance_ids": instance_ids,
+        "adaptive_output_tokens": adaptive_output_tokens,
+        "samples": samples,
+        "metrics": {
+            "tool_cache": TOOL_CACHE.stats(),
+            "patch_quality": summarize_quality(quality),
+            "output_tokens": {f"{p}:{m}": {**caps[f"{p}:{m}"], **c.stats()} for (p, m), c in clients.items()},
+            "latency": {
+                "hedging": hedge,
+                **latency_summary(latencies),
+                "models": {f"{p}:{m}": c.client.stats() for (p, m), c in clients.items()},
+            },
+            "quota": QUOTA.stats(),
+            "usage": ledger.summary(load_prices()),
+            "batch": batch_stats,
+            "run_control": {
+                "deadline_s": control.deadline_s,
+                "stopped": control.reason if control.draining.is_set() else None,
+                "cancelled_in_flight": control.cancelled.is_set(),
+                "unscheduled": unscheduled,
+            },
+            "breaker": {"parked": parked_total, "models": {f"{p}:{m}": b.breaker.stats() for (p, m), b in breakers.items()}},
+        },
         "generated": int(time.time()),
     }
+    if shard:
+        units = expected_units(model_specs, instance_ids, *shard)
+        manifest["shard"] = {
+            "index": shard[0],
+            "count": shard[1],
+            "units": len(units),
+            "units_digest": units_digest(units),
+        }
     (out_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
     return str(pred_path)
 
 
+def _iter_tasks(
+    model_specs: List[Dict], instance_ids: List[str], shard: Optional[Tuple[int, int]] = None
+) -> Iterator[Tuple[Dict, str]]:
+    for spec in model_specs:
+        for iid in instance_ids:
+            if shard and shard_of(spec["provider"], spec["model"], iid, shard[1]) != shard[0]:
+                continue
+            yield spec, iid
+
+
+def _run_task(
+    pred_path: str,
+    attempts_log_path: str,
+    provider: str,
+    model_name: str,
+    client: OpenAICompatChat,
+    iid: str,
+    records,
+    attempts: int,
+    temperature: float,
+    max_output_tokens: int,
+    seed: int,
+    mode: str,
+    budget: Optional[TokenBudget] = None,
+    start_attempt: int = 0,
+    first: Optional[Tuple[str, Dict]] = None,
+    samples: int = 1,
+    ledger: Optional[UsageLedger] = None,
+    control: Optional[deadline.RunControl] = None,
+) -> Optional[Dict[str, int]]:
+    if control is not None and control.stopping():
+        # Picked up after a drain/cancel/deadline but before the orchestrator withdrew it: leave it unscheduled
+        return None
+    # Load the record inside the worker so it is dropped once the row is written
+    instance = records.get(iid)
+    with bind(ledger), deadline.bind(control, get_instance_deadline_default()):
+        return _per_instance(
+            pred_path,
+            attempts_log_path,
+            provider,
+            model_name,
+            client,
+            iid,
+            instance,
+            attempts,
+            temperature,
+            max_output_tokens,
+            seed,
+            mode,
+            budget,
+            start_attempt,
+            first,
+            samples,
+        )
+
+
 def _write_line(path: str, row: Dict) -> None:
     # serialize atomically per line append
     line = json.dumps(row) + "\n"
@@ -254,21 +598,82 @@ def _per_instance(
     max_output_tokens: int,
     seed: int,
     mode: str,
-) -> None:
+    budget: Optional[TokenBudget] = None,
+    start_attempt: int = 0,
+    first: Optional[Tuple[str, Dict]] = None,
+    samples: int = 1,
+) -> Dict[str, int]:
+    """Run attempts for one (model, instance), write its row; return quality counters.
+
+    Raises TaskParked when the model's circuit is open, so the orchestrator
+    can re-queue the task from that attempt instead of recording a failure.
+    `first` is a batch reply that replaces the first call of the first attempt.
+    With samples > 1 (patch mode) each attempt draws that many candidates.
+    """
     last_patch = ""
     last_meta: Dict = {}
     status = "failed"
-    for k in range(attempts):
-        attempt_seed = seed + k
-        if mode == "edit":
-            patch, meta = run_edit_attempt(client, instance, temperature, max_output_tokens, attempt_seed)
-            # Fallback: if editing produced no diff, try patch-mode once
-            if not patch:
-                p2, m2 = run_patch_attempt(client, instance, temperature, max_output_tokens, attempt_seed)
-                if p2:
-                    patch, meta = p2, m2
-        else:
-            patch, meta = run_patch_attempt(client, instance, temperature, max_output_tokens, attempt_seed)
+    # Why an attempt was cut short or left unstarted, if one was
+    stopped: Optional[str] = None
+    counts = {"instances": 1, "attempts": 0, "reasks": 0, "preflight_checked": 0, "preflight_first_pass": 0, "preflight_final_pass": 0, "stopped_attempts": 0}
+    latencies: List[float] = []
+    sampled = samples > 1 and mode == "patch"
+    if sampled:
+        counts.update({"sample_requests": 0, "sample_candidates": 0, "sample_unique": 0, "sample_prompt_tokens_saved": 0, "sample_pass_at_k": 0})
+    for k in range(start_attempt, attempts):
+        cut = deadline.stop_reason()
+        if cut:
+            stopped = cut
+            break
+        # Sampled attempts use seeds seed+k*samples .. seed+(k+1)*samples-1
+        attempt_seed = seed + k * samples if sampled else seed + k
+        set_stage("attempt", attempt=k)
+        t0 = time.time()
+        with deadline.within(get_attempt_deadline_default()):
+            if sampled:
+                patch, meta = run_sampled_attempt(client, instance, temperature, max_output_tokens, attempt_seed, samples, budget)
+            elif mode == "edit":
+                patch, meta = run_edit_attempt(client, instance, temperature, max_output_tokens, attempt_seed, budget=budget)
+                # Fallback: if editing produced no diff, try patch-mode once; usage of both is kept
+                if not patch:
+                    p2, m2 = run_patch_attempt(client, instance, temperature, max_output_tokens, attempt_seed, budget)
+                    if p2:
+                        _add_usage(m2, meta)
+                        m2["edit_fallback"] = {"turns": meta.get("turns", 0), "error": meta.get("error")}
+                        patch, meta = p2, m2
+                    else:
+                        _add_usage(meta, m2)
+            else:
+                patch, meta = run_patch_attempt(
+                    client, instance, temperature, max_output_tokens, attempt_seed, budget, first if k == start_attempt else None
+                )
+            # Checked inside the attempt's own deadline
+            cut = deadline.stop_reason()
+        if not patch and is_circuit_open_error(meta):
+            raise TaskParked(k, {**counts, "instances": 0, "attempt_latencies": latencies})
+        if not patch and cut:
+            # Cut short by a deadline or cancel: logged apart and kept out of the quality and latency counters
+            meta["stopped"] = stopped = cut
+            meta["attempt_latency_s"] = round(time.time() - t0, 3)
+            counts["stopped_attempts"] += 1
+            last_meta = meta
+            status = "no_valid_patch"
+            _log_attempt(attempts_log_path, iid, provider, model_name, k, attempt_seed, "deadline" if cut == "deadline" else "cancelled", meta)
+            continue
+        counts["attempts"] += 1
+        latencies.append(time.time() - t0)
+        meta["attempt_latency_s"] = round(latencies[-1], 3)
+        counts["reasks"] += meta.get("reasks", 0)
+        if "sampling" in meta:
+            counts["sample_requests"] += meta["sampling"]["requests"]
+            counts["sample_candidates"] += meta["sampling"]["candidates"]
+            counts["sample_unique"] += meta["sampling"].get("unique", 0)
+            counts["sample_prompt_tokens_saved"] += meta["sampling"]["prompt_tokens_saved"]
+            counts["sample_pass_at_k"] = int(counts["sample_pass_at_k"] or meta["sampling"].get("passed", False))
+        if "preflight" in meta:
+            counts["preflight_checked"] += 1
+            counts["preflight_first_pass"] += int(meta["preflight"]["first"])
+            counts["preflight_final_pass"] += int(meta["preflight"]["final"])
         if patch:
             patch = normalize_diff(patch)
             # Repo-aware path rewrite to reduce 'No file to patch'
@@ -287,6 +692,13 @@ def _per_instance(
             status = "no_valid_patch"
             _log_attempt(attempts_log_path, iid, provider, model_name, k, attempt_seed, status, meta)
 
+    # Only when an attempt was cut or left unstarted: attempts that all ran to
+    # completion keep their own status even if a stop arrived since
+    reason = deadline.stop_reason() if stopped and status != "ok" else None
+    if reason:
+        # Cut short by a cancel or the run/instance deadline rather than failed on its merits
+        status = "cancelled"
+        last_meta = {**last_meta, "stopped": reason}
     row = {
         "instance_id": iid,
         "model_name_or_path": f"{provider}:{model_name}",
@@ -295,6 +707,22 @@ def _per_instance(
         "usage": last_meta,
     }
     _write_line(pred_path, row)
+    return {**counts, "attempt_latencies": latencies}
+
+
+def summarize_quality(q: Dict[str, int]) -> Dict:
+    """Preflight pass rates and re-asks per instance from summed counters."""
+    checked = q.get("preflight_checked", 0)
+    out = dict(q)
+    out["preflight_first_pass_rate"] = round(q.get("preflight_first_pass", 0) / checked, 4) if checked else None
+    out["preflight_final_pass_rate"] = round(q.get("preflight_final_pass", 0) / checked, 4) if checked else None
+    out["reasks_per_instance"] = round(q.get("reasks", 0) / q["instances"], 4) if q.get("instances") else None
+    if q.get("sample_requests"):
+        # Preflight pass of any of the K candidates, as a proxy for pass@K, per instance and per quota request
+        out["pass_at_k"] = round(q.get("sample_pass_at_k", 0) / q["instances"], 4) if q.get("instances") else None
+        out["pass_at_k_per_100_requests"] = round(100.0 * q.get("sample_pass_at_k", 0) / q["sample_requests"], 4)
+        out["duplicate_rate"] = round(1 - q.get("sample_unique", 0) / q["sample_candidates"], 4) if q.get("sample_candidates") else None
+    return out
 
 
 def _log_attempt(
@@ -0,0 +1,188 @@
+import glob
+import json
+import math
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from harness.config import env_int
+from harness.tokens import SAFETY_MARGIN, count_messages, get_estimator
+from harness.usage import retrying
+
+
+# Samples needed before a learned cap replaces the global default
+MIN_SAMPLES = 20
+# Learned caps are rounded up to a multiple of this
+ROUND_TO = 64
+
+
+def get_output_percentile_default() -> int:
+    return env_int("OUTPUT_TOKENS_PERCENTILE", 95)
+
+
+def get_output_ceiling_default() -> int:
+    return env_int("OUTPUT_TOKENS_MAX", 8192)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def completion_history(paths: Optional[Iterable[str]] = None) -> Dict[str, List[float]]:
+    """Per-call completion lengths by "provider:model" from attempts.jsonl usage.
+
+    Uses usage.completion_tokens_per_call when present; older rows only have
+    the attempt total, which over-states single calls and so errs on the
+    generous side.
+    """
+    paths = list(paths) if paths is not None else sorted(glob.glob("runs/*/logs/attempts.jsonl"))
+    out: Dict[str, List[float]] = {}
+    for path in paths:
+        try:
+            f = open(path)
+        except OSError:
+            continue
+        with f:
+            for ln in f:
+                ln = ln.strip()
+                if not ln:
+                    continue
+                try:
+                    row = json.loads(ln)
+                except ValueError:
+                    continue
+                usage = row.get("usage") or {}
+                if usage.get("error"):
+                    continue
+                calls = usage.get("completion_tokens_per_call")
+                if calls is None:
+                    calls = [usage["completion_tokens"]] if usage.get("completion_tokens") else []
+                key = f"{row.get('provider')}:{row.get('model')}"
+                out.setdefault(key, []).extend(float(c) for c in calls if c)
+    return out
+
+
+def learn_output_caps(
+    model_specs: List[Dict],
+    default: int,
+    pct: Optional[int] = None,
+    history: Optional[Dict[str, List[float]]] = None,
+) -> Dict[str, Dict]:
+    """Per-model max_output_tokens: the pct-th percentile of past completions, rounded up.
+
+    A `max_output_tokens` in the model spec always wins; models with fewer
+    than MIN_SAMPLES past calls keep the global default.
+    """
+    pct = pct or get_output_percentile_default()
+    ceiling = max(default, get_output_ceiling_default())
+    history = completion_history() if history is None else history
+    caps: Dict[str, Dict] = {}
+    for spec in model_specs:
+        key = f"{spec['provider']}:{spec['model']}"
+        samples = history.get(key, [])
+        if spec.get("max_output_tokens"):
+            caps[key] = {"cap": int(spec["max_output_tokens"]), "source": "spec", "samples": len(samples)}
+        elif len(samples) >= MIN_SAMPLES:
+            cap = int(math.ceil(percentile(samples, pct) / ROUND_TO) * ROUND_TO)
+            caps[key] = {"cap": min(max(cap, 256), ceiling), "source": f"p{pct}", "samples": len(samples)}
+        else:
+            caps[key] = {"cap": default, "source": "default", "samples": len(samples)}
+    return caps
+
+
+class AdaptiveOutputChat:
+    """Client wrapper that escalates max_output_tokens once when a completion is cut off.
+
+    On finish_reason == "length" the same request is re-sent with twice the
+    allowance (at least `baseline`), capped by OUTPUT_TOKENS_MAX and the
+    context left after the prompt.
+    Also counts truncations and reserved output tokens against `baseline`
+    (the global max_output_tokens) so savings can be reported.
+    """
+
+    def __init__(self, client, baseline: int, escalate: bool = True, spec: Optional[Dict] = None) -> None:
+        spec = spec or {}
+        self.client = client
+        self.model = getattr(client, "model", spec.get("model"))
+        self.baseline = baseline
+        self.escalate = escalate
+        self.ceiling = max(baseline, get_output_ceiling_default())
+        self.context_tokens = int(spec.get("context_tokens") or env_int("CONTEXT_TOKENS", 32768))
+        self.estimator = get_estimator(spec.get("tokenizer"))
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.truncated = 0
+        self.escalations = 0
+        self.still_truncated = 0
+        self.reserved = 0
+        self.baseline_reserved = 0
+        self.wasted_completion_tokens = 0.0
+
+    def _escalated_limit(self, messages: List[Dict[str, str]], current: int) -> int:
+        # Double (at least back to the global value), bounded by the ceiling and the context left
+        margin = max(256, int(self.context_tokens * SAFETY_MARGIN))
+        room = self.context_tokens - count_messages(self.estimator, messages) - margin
+        return min(self.ceiling, room, max(2 * current, self.baseline))
+
+    def chat(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.2,
+        max_output_tokens: int = 2000,
+        seed: Optional[int] = None,
+    ) -> Tuple[str, Dict[str, float]]:
+        text, meta = self.client.chat(messages, temperature=temperature, max_output_tokens=max_output_tokens, seed=seed)
+        reserved = max_output_tokens
+        truncated = meta.get("finish_reason") == "length"
+        escalated = still = False
+        wasted = 0.0
+        if truncated and self.escalate:
+            limit = self._escalated_limit(messages, max_output_tokens)
+            if limit > max_output_tokens:
+                wasted = meta.get("completion_tokens", 0)
+                # A provider error here propagates like any other chat failure
+                with retrying():
+                    text, meta2 = self.client.chat(messages, temperature=temperature, max_output_tokens=limit, seed=seed)
+                for k in ("prompt_tokens", "completion_tokens", "total_tokens", "cached_tokens"):
+                    meta[k] = meta.get(k, 0) + meta2.get(k, 0)
+                meta["elapsed"] = meta.get("elapsed", 0) + meta2.get("elapsed", 0)
+                meta["finish_reason"] = meta2.get("finish_reason")
+                meta["escalated_to"] = limit
+                reserved += limit
+                escalated = True
+                still = meta2.get("finish_reason") == "length"
+        with self._lock:
+            self.calls += 1
+            self.truncated += int(truncated)
+            self.escalations += int(escalated)
+            self.still_truncated += int(still)
+            self.reserved += reserved
+            self.baseline_reserved += self.baseline
+            self.wasted_completion_tokens += wasted
+        return text, meta
+
+    def samples(
+        self,
+        messages: List[Dict[str, str]],
+        n: int,
+        temperature: float = 0.2,
+        max_output_tokens: int = 2000,
+        seed: Optional[int] = None,
+    ) -> Tuple[List[str], Dict[str, float]]:
+        # Truncated samples are not escalated; the other candidates cover for them
+        return self.client.samples(messages, n, temperature=temperature, max_output_tokens=max_output_tokens, seed=seed)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "truncated": self.truncated,
+                "truncation_rate": round(self.truncated / self.calls, 4) if self.calls else 0.0,
+                "escalations": self.escalations,
+                "still_truncated": self.still_truncated,
+                "reserved_output_tokens": self.reserved,
+                "reserved_tokens_saved": self.baseline_reserved - self.reserved,
+                "wasted_completion_tokens": self.wasted_completion_tokens,
+            }
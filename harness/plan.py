@@ -0,0 +1,212 @@
+import glob
+import json
+import os
+import random
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from harness.deadline import STOPPED_ATTEMPT_STATUSES
+from harness.output_budget import percentile
+from harness.pricing import cost_usd, load_prices
+from harness.quota import QUOTA
+
+
+# Attempts a model needs in history before its own stats are used instead of the pooled ones
+MIN_ROWS = 5
+# Only used when there is no history at all for the mode
+DEFAULT_ROW = {"ok": False, "requests": 2, "prompt_tokens": 4000.0, "completion_tokens": 800.0, "latency": 30.0}
+PCTS = (10, 50, 90)
+
+
+def attempt_rows(paths: Optional[Iterable[str]] = None) -> Dict[str, List[Dict]]:
+    """Per-attempt cost samples by "provider:model" from attempts.jsonl.
+
+    Each sample has the mode, whether it produced a patch, provider requests
+    (re-asks and edit turns included), prompt/completion tokens and latency.
+    """
+    paths = list(paths) if paths is not None else sorted(glob.glob("runs/*/logs/attempts.jsonl"))
+    out: Dict[str, List[Dict]] = {}
+    for path in paths:
+        try:
+            f = open(path)
+        except OSError:
+            continue
+        with f:
+            for ln in f:
+                try:
+                    row = json.loads(ln)
+                except ValueError:
+                    continue
+                if row.get("status") in STOPPED_ATTEMPT_STATUSES:
+                    # Cut short by a deadline or cancel; says nothing about what an attempt costs
+                    continue
+                usage = row.get("usage") or {}
+                if usage.get("completion_tokens_per_call") is not None:
+                    requests = len(usage["completion_tokens_per_call"])
+                elif "turns" in usage:
+                    requests = usage["turns"]
+                else:
+                    requests = 1 + usage.get("reasks", 0)
+                out.setdefault(f"{row.get('provider')}:{row.get('model')}", []).append(
+                    {
+                        "mode": "edit" if "turns" in usage or "context" in usage or "edit_fallback" in usage else "patch",
+                        "ok": row.get("status") == "ok",
+                        "requests": max(1, requests),
+                        "prompt_tokens": float(usage.get("prompt_tokens", 0)),
+                        "completion_tokens": float(usage.get("completion_tokens", 0)),
+                        "latency": float(usage.get("attempt_latency_s") or usage.get("elapsed") or 0.0),
+                    }
+                )
+    return out
+
+
+def _ranges(values: List[float], digits: int = 2) -> Dict[str, float]:
+    return {f"p{p}": round(percentile(values, p), digits) for p in PCTS}
+
+
+def plan_run(
+    model_specs: List[Dict],
+    n_instances: int,
+    attempts: int,
+    mode: str,
+    workers: int,
+    history: Optional[Dict[str, List[Dict]]] = None,
+    prices: Optional[Dict[str, Dict[str, float]]] = None,
+    rounds: int = 200,
+    seed: int = 0,
+) -> Dict:
+    """Estimate requests, tokens, cost and wall time for a run, with p10/p50/p90 ranges.
+
+    Each bootstrap round replays every (model, instance) task by drawing past
+    attempts of that model (with replacement) until one produced a patch or
+    `attempts` ran out, as the orchestrator does. Models with fewer than
+    MIN_ROWS past attempts in this mode borrow the pooled history. Wall time
+    assumes `workers` tasks in flight across all models.
+    """
+    history = attempt_rows() if history is None else history
+    prices = load_prices() if prices is None else prices
+    pooled = [r for rows in history.values() for r in rows if r["mode"] == mode]
+    rng = random.Random(seed)
+    models: Dict[str, Dict] = {}
+    busy = [0.0] * rounds
+    totals = {k: [0.0] * rounds for k in ("requests", "prompt_tokens", "completion_tokens", "cost_usd")}
+    by_provider: Dict[str, List[float]] = {}
+    for spec in model_specs:
+        key = f"{spec['provider']}:{spec['model']}"
+        rows = [r for r in history.get(key, []) if r["mode"] == mode]
+        source = "model"
+        if len(rows) < MIN_ROWS:
+            rows, source = (pooled, "pooled") if len(pooled) >= MIN_ROWS else ([DEFAULT_ROW], "default")
+        sims = {k: [] for k in ("requests", "prompt_tokens", "completion_tokens", "cost_usd")}
+        for b in range(rounds):
+            acc = {"requests": 0.0, "prompt_tokens": 0.0, "completion_tokens": 0.0, "latency": 0.0}
+            for _ in range(n_instances):
+                for _ in range(attempts):
+                    r = rng.choice(rows)
+                    for k in acc:
+                        acc[k] += r[k]
+                    if r["ok"]:
+                        break
+            cost = cost_usd(prices, key, acc["prompt_tokens"], acc["completion_tokens"])
+            sims["requests"].append(acc["requests"])
+            sims["prompt_tokens"].append(acc["prompt_tokens"])
+            sims["completion_tokens"].append(acc["completion_tokens"])
+            sims["cost_usd"].append(cost if cost is not None else 0.0)
+            busy[b] += acc["latency"]
+            for k in ("requests", "prompt_tokens", "completion_tokens"):
+                totals[k][b] += acc[k]
+            totals["cost_usd"][b] += cost or 0.0
+        by_provider.setdefault(spec["provider"], [0.0] * rounds)
+        by_provider[spec["provider"]] = [a + c for a, c in zip(by_provider[spec["provider"]], sims["requests"])]
+        models[key] = {
+            "history": source,
+            "samples": len(rows) if source != "default" else 0,
+            "patch_rate": round(sum(r["ok"] for r in rows) / len(rows), 3),
+            "requests": _ranges(sims["requests"], 0),
+            "prompt_tokens": _ranges(sims["prompt_tokens"], 0),
+            "completion_tokens": _ranges(sims["completion_tokens"], 0),
+            "cost_usd": _ranges(sims["cost_usd"]) if key in prices else None,
+        }
+    quota = {}
+    for provider, reqs in by_provider.items():
+        quota[provider] = {"requests": _ranges(reqs, 0), "remaining_today": QUOTA.remaining(provider)}
+    priced = all(f"{s['provider']}:{s['model']}" in prices for s in model_specs)
+    return {
+        "instances": n_instances,
+        "attempts": attempts,
+        "mode": mode,
+        "workers": workers,
+        "models": models,
+        "total": {
+            "requests": _ranges(totals["requests"], 0),
+            "prompt_tokens": _ranges(totals["prompt_tokens"], 0),
+            "completion_tokens": _ranges(totals["completion_tokens"], 0),
+            # Unpriced models count as free; `cost_complete` says whether that happened
+            "cost_usd": _ranges(totals["cost_usd"]),
+            "cost_complete": priced,
+            "wall_h": _ranges([s / max(1, workers) / 3600.0 for s in busy], 3),
+        },
+        "quota": quota,
+    }
+
+
+def get_budget_defaults() -> Tuple[Optional[float], Optional[float]]:
+    def _f(name: str) -> Optional[float]:
+        try:
+            return float(os.environ[name])
+        except (KeyError, ValueError):
+            return None
+
+    return _f("PLAN_MAX_COST_USD"), _f("PLAN_MAX_HOURS")
+
+
+def check_budgets(plan: Dict, max_cost_usd: Optional[float] = None, max_hours: Optional[float] = None) -> Tuple[str, List[str]]:
+    """("ok" | "warn" | "refuse", reasons): refuse when the median estimate breaks a budget, warn when p90 does.
+
+    Budgets are today's remaining quota per provider, and optionally cost and wall time.
+    """
+    checks: List[Tuple[str, Dict[str, float], Optional[float]]] = []
+    for provider, q in plan["quota"].items():
+        if q["remaining_today"] is not None:
+            checks.append((f"{provider} requests vs remaining quota", q["requests"], q["remaining_today"]))
+    if max_cost_usd is not None:
+        checks.append(("cost_usd", plan["total"]["cost_usd"], max_cost_usd))
+    if max_hours is not None:
+        checks.append(("wall_h", plan["total"]["wall_h"], max_hours))
+    verdict, reasons = "ok", []
+    for name, est, limit in checks:
+        if est["p50"] > limit:
+            verdict = "refuse"
+            reasons.append(f"{name}: median {est['p50']} > {limit}")
+        elif est["p90"] > limit:
+            verdict = "warn" if verdict == "ok" else verdict
+            reasons.append(f"{name}: p90 {est['p90']} > {limit}")
+    unseen = [k for k, m in plan["models"].items() if m["history"] == "default"]
+    if unseen:
+        reasons.append(f"no {plan['mode']} history; assumed every attempt fails for: {', '.join(unseen)}")
+    if plan["total"]["cost_usd"] and not plan["total"]["cost_complete"]:
+        reasons.append("cost excludes models missing from the price table")
+    return verdict, reasons
+
+
+def format_plan(plan: Dict) -> str:
+    lines = [
+        f"{plan['instances']} instances x {len(plan['models'])} models, attempts={plan['attempts']}, mode={plan['mode']}, workers={plan['workers']}",
+        f"{'model':<52} {'hist':>7} {'requests p10/p50/p90':>24} {'tokens p50':>12} {'cost p50':>9}",
+    ]
+    for key, m in plan["models"].items():
+        r = m["requests"]
+        reqs = f"{r['p10']:.0f}/{r['p50']:.0f}/{r['p90']:.0f}"
+        tok = m["prompt_tokens"]["p50"] + m["completion_tokens"]["p50"]
+        cost = f"{m['cost_usd']['p50']:.2f}" if m["cost_usd"] else "?"
+        lines.append(f"{key[:52]:<52} {m['history']:>7} {reqs:>24} {tok:>12.0f} {cost:>9}")
+    t = plan["total"]
+    lines.append(
+        f"total requests {t['requests']['p10']:.0f}/{t['requests']['p50']:.0f}/{t['requests']['p90']:.0f}, "
+        f"cost ${t['cost_usd']['p10']:.2f}/{t['cost_usd']['p50']:.2f}/{t['cost_usd']['p90']:.2f}"
+        f"{'' if t['cost_complete'] else ' (unpriced models excluded)'}, "
+        f"wall {t['wall_h']['p10']:.2f}/{t['wall_h']['p50']:.2f}/{t['wall_h']['p90']:.2f} h"
+    )
+    for provider, q in plan["quota"].items():
+        left = "unlimited" if q["remaining_today"] is None else q["remaining_today"]
+        lines.append(f"quota {provider}: needs {q['requests']['p50']:.0f} (p90 {q['requests']['p90']:.0f}), remaining today {left}")
+    return "\n".join(lines)
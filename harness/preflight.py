@@ -2,21 +2,62 @@ import os
 import shutil
 import subprocess
 import tempfile
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Tuple, Optional
+from typing import Dict, List, Tuple, Optional
+
+from harness.deadline import DeadlineExceeded, budget, remaining
 
 
 CACHE_DIR = Path(".cache/repos")
+# Repos already refreshed by this process and their tracked files; a sweep
+# runs many cells over the same repos, so each is fetched and listed once.
+# The per-repo lock also guards the clone's working tree (see repo_lock)
+_ready: Dict[str, threading.RLock] = {}
+_ready_lock = threading.Lock()
+_refreshed = set()
+# Tracked paths per (repo, commit); commit None means the checked-out tree
+_ls_files: Dict[Tuple[str, Optional[str]], List[str]] = {}
 
 
 def ensure_repo(repo: str, timeout: int = 30) -> Path:
     """Clone or refresh a shallow copy of the repo under .cache/repos/<owner>/<name>.
 
     We use default branch head; this is advisory (path existence), not exact commit.
+    Each repo is refreshed at most once per process.
     """
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
     owner_name = repo.strip()
     dest = CACHE_DIR / owner_name
+    with _ready_lock:
+        lock = _ready.setdefault(owner_name, threading.RLock())
+    with lock:
+        if owner_name in _refreshed and (dest / ".git").exists():
+            return dest
+        _refresh_repo(owner_name, dest, timeout)
+        _refreshed.add(owner_name)
+    return dest
+
+
+@contextmanager
+def repo_lock(repo: str):
+    """Hold the clone of `repo` so no other thread checks out another commit meanwhile.
+
+    Waits no longer than the task's deadline allows.
+    """
+    with _ready_lock:
+        lock = _ready.setdefault(repo.strip(), threading.RLock())
+    left = remaining()
+    if not lock.acquire(timeout=max(0.0, left) if left is not None else -1):
+        raise DeadlineExceeded(f"deadline: waiting for the clone of {repo}")
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+def _refresh_repo(owner_name: str, dest: Path, timeout: int) -> None:
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
     url = f"https://github.com/{owner_name}.git"
     if dest.exists() and (dest / ".git").exists():
         # refresh
@@ -33,19 +74,34 @@ def ensure_repo(repo: str, timeout: int = 30) -> Path:
         dest.parent.mkdir(parents=True, exist_ok=True)
         subprocess.run(["git", "clone", "--depth", "1", url, str(dest)], check=False, timeout=timeout,
                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    return dest
 
 
 def preflight_apply(repo: str, patch_text: str, commit: Optional[str] = None, timeout: int = 15) -> Tuple[bool, str]:
     """Run `git apply --check` on the patch against a shallow repo clone.
 
     Returns (ok, stderr_text). This is advisory to catch path/format issues.
+    Infrastructure problems (setup failure, timeouts, no time left before the
+    task deadline) come back as errors starting with "preflight:" so callers
+    can tell them from a patch that does not apply.
     """
+    try:
+        timeout = budget(timeout)
+    except DeadlineExceeded as e:
+        return False, f"preflight: {e}"
     try:
         repo_dir = ensure_repo(repo)
     except Exception as e:
         return False, f"preflight: repo setup failed: {e}"
 
+    # The clone is shared; hold it from reset to check so no other task moves it
+    try:
+        with repo_lock(repo):
+            return _reset_and_check(repo_dir, patch_text, commit, timeout)
+    except DeadlineExceeded as e:
+        return False, f"preflight: {e}"
+
+
+def _reset_and_check(repo_dir: Path, patch_text: str, commit: Optional[str], timeout: float) -> Tuple[bool, str]:
     # Clean workspace and reset
     try:
         subprocess.run(["git", "-C", str(repo_dir), "clean", "-fdx"], check=False, timeout=timeout,
@@ -60,7 +116,8 @@ def preflight_apply(repo: str, patch_text: str, commit: Optional[str] = None, ti
             subprocess.run(["git", "-C", str(repo_dir), "checkout", commit], check=False, timeout=timeout,
                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     except subprocess.TimeoutExpired:
-        pass
+        # Checking against a half-reset tree would give a misleading verdict
+        return False, f"preflight: repo reset timed out after {timeout:.0f}s"
 
     # Write patch to temp file
     with tempfile.NamedTemporaryFile("w", delete=False) as tf:
@@ -88,18 +145,24 @@ def preflight_apply(repo: str, patch_text: str, commit: Optional[str] = None, ti
             pass
 
 
-def repo_file_hints(repo: str, keywords: Tuple[str, ...], limit: int = 5, timeout: int = 10):
+def repo_file_hints(repo: str, keywords: Tuple[str, ...], limit: int = 5, timeout: int = 10, commit: Optional[str] = None):
     """Return up to `limit` repo paths that contain the given keywords in their path.
 
     Keywords are matched case-insensitively on path segments; only Python and text-like
-    files are considered.
+    files are considered. Paths come from `commit`'s tree when given (no hints if the
+    clone lacks it), else from whatever the clone has checked out.
     """
     repo_dir = ensure_repo(repo, timeout=timeout)
-    try:
-        proc = subprocess.run(["git", "-C", str(repo_dir), "ls-files"], capture_output=True, text=True, timeout=timeout)
-        files = [ln.strip() for ln in proc.stdout.splitlines() if ln.strip()]
-    except subprocess.TimeoutExpired:
-        files = []
+    files = _ls_files.get((repo, commit))
+    if files is None:
+        cmd = ["ls-tree", "-r", "--name-only", commit] if commit else ["ls-files"]
+        try:
+            proc = subprocess.run(["git", "-C", str(repo_dir), *cmd], capture_output=True, text=True, timeout=timeout)
+            files = [ln.strip() for ln in proc.stdout.splitlines() if ln.strip()] if proc.returncode == 0 else []
+        except subprocess.TimeoutExpired:
+            files = []
+        if files:
+            _ls_files[(repo, commit)] = files
     if not files:
         return []
     keys = [k.lower() for k in keywords if len(k) >= 3]
@@ -0,0 +1,43 @@
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+import yaml
+
+
+PRICES_PATH = Path("config/prices.yaml")
+
+
+def load_prices(path: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+    """USD per million tokens by "provider:model" from the price table (`PRICES` overrides the path).
+
+    Entries are `{input: <usd/M>, output: <usd/M>}` with an optional
+    `cached_input` rate for prompt tokens served from the provider's cache;
+    a missing file gives an empty table.
+    """
+    p = Path(path or os.getenv("PRICES", str(PRICES_PATH)))
+    try:
+        data = yaml.safe_load(p.read_text()) or {}
+    except OSError:
+        return {}
+    out: Dict[str, Dict[str, float]] = {}
+    for key, entry in (data.get("prices") or {}).items():
+        if isinstance(entry, dict) and entry.get("input") is not None and entry.get("output") is not None:
+            out[key] = {"input": float(entry["input"]), "output": float(entry["output"])}
+            if entry.get("cached_input") is not None:
+                out[key]["cached_input"] = float(entry["cached_input"])
+    return out
+
+
+def cost_usd(
+    prices: Dict[str, Dict[str, float]], key: str, prompt_tokens: float, completion_tokens: float, cached_tokens: float = 0.0
+) -> Optional[float]:
+    """Dollar cost of the tokens for "provider:model", or None when it has no price.
+
+    `cached_tokens` are the part of `prompt_tokens` billed at `cached_input` (when the table has it).
+    """
+    price = prices.get(key)
+    if price is None:
+        return None
+    cached = min(cached_tokens, prompt_tokens) if "cached_input" in price else 0.0
+    return ((prompt_tokens - cached) * price["input"] + cached * price.get("cached_input", 0.0) + completion_tokens * price["output"]) / 1e6
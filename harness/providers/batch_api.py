@@ -0,0 +1,91 @@
+import json
+import time
+import urllib.request
+import uuid
+from typing import Dict, Iterator, Optional
+
+from harness import deadline
+from harness.config import env_int
+from harness.providers.openai_compat import OpenAICompatError
+
+
+# Batch states after which polling stops
+TERMINAL = {"completed", "failed", "expired", "cancelled"}
+
+
+def custom_id(provider: str, model: str, iid: str, seed: int) -> str:
+    """Id of one (model, instance, seed) request row in a batch input file."""
+    return f"{provider}:{model}::{iid}::{seed}"
+
+
+class OpenAIBatchClient:
+    """Minimal client for an OpenAI-style Files + Batches API (`/v1/files`, `/v1/batches`)."""
+
+    def __init__(self, base_url: str, api_key: str, extra_headers: Optional[Dict[str, str]] = None, timeout: int = 120) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.extra_headers = extra_headers or {}
+        self.timeout = timeout
+
+    def _request(self, method: str, path: str, body: Optional[bytes] = None, content_type: str = "application/json") -> bytes:
+        headers = {"Authorization": f"Bearer {self.api_key}", **self.extra_headers}
+        if body is not None:
+            headers["Content-Type"] = content_type
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as r:
+                return r.read()
+        except Exception as e:
+            raise OpenAICompatError(f"{method} {path}: {e}")
+
+    def _json(self, method: str, path: str, payload: Optional[Dict] = None) -> Dict:
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        raw = self._request(method, path, body)
+        try:
+            return json.loads(raw)
+        except ValueError as e:
+            raise OpenAICompatError(f"Invalid JSON from {path}: {e}; raw={raw[:200]!r}")
+
+    def upload(self, path: str) -> str:
+        """Upload a JSONL request file with purpose=batch; returns the file id."""
+        boundary = uuid.uuid4().hex
+        with open(path, "rb") as f:
+            data = f.read()
+        body = (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"purpose\"\r\n\r\nbatch\r\n"
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"requests.jsonl\"\r\n"
+            "Content-Type: application/jsonl\r\n\r\n"
+        ).encode("utf-8") + data + f"\r\n--{boundary}--\r\n".encode("utf-8")
+        raw = self._request("POST", "/files", body, content_type=f"multipart/form-data; boundary={boundary}")
+        return json.loads(raw)["id"]
+
+    def create(self, input_file_id: str, endpoint: str = "/v1/chat/completions") -> Dict:
+        return self._json("POST", "/batches", {"input_file_id": input_file_id, "endpoint": endpoint, "completion_window": "24h"})
+
+    def retrieve(self, batch_id: str) -> Dict:
+        return self._json("GET", f"/batches/{batch_id}")
+
+    def wait(self, batch_id: str, max_wait_s: Optional[float] = None) -> Dict:
+        """Poll until the batch is terminal, backing off from BATCH_POLL_S up to BATCH_POLL_MAX_S.
+
+        Returns the last batch object; its status is not terminal if max_wait_s
+        ran out or the run was drained, cancelled or hit its deadline meanwhile.
+        """
+        delay = float(env_int("BATCH_POLL_S", 5))
+        cap = float(env_int("BATCH_POLL_MAX_S", 60))
+        until = time.time() + (max_wait_s if max_wait_s is not None else env_int("BATCH_MAX_WAIT_S", 86400))
+        while True:
+            batch = self.retrieve(batch_id)
+            if batch.get("status") in TERMINAL or time.time() + delay > until:
+                return batch
+            if deadline.pause(delay):
+                return batch
+            delay = min(delay * 1.5, cap)
+
+    def content(self, file_id: str) -> Iterator[Dict]:
+        """Rows of a result (or error) file."""
+        raw = self._request("GET", f"/files/{file_id}/content").decode("utf-8")
+        for ln in raw.splitlines():
+            ln = ln.strip()
+            if ln:
+                yield json.loads(ln)
@@ -0,0 +1,99 @@
+import os
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from harness import deadline
+from harness.providers.openai_compat import OpenAICompatError
+
+
+MOCK_DIFF = (
+    "BEGIN_PATCH\n"
+    "diff --git a/README.md b/README.md\n"
+    "--- a/README.md\n"
+    "+++ b/README.md\n"
+    "@@ -1 +1 @@\n"
+    "-old\n"
+    "+new\n"
+    "END_PATCH\n"
+)
+
+
+class MockChat:
+    """Offline stand-in for OpenAICompatChat used by benchmarks and local runs.
+
+    Behaviour is driven by env vars so it can be selected from a models YAML
+    (`provider: mock`): MOCK_LATENCY (seconds), MOCK_ERROR_RATE (0..1) and
+    MOCK_RESPONSE (reply text, defaults to a tiny valid diff). Replies longer
+    than max_output_tokens (4 chars/token) are cut with finish_reason "length".
+    MOCK_STRAGGLER_RATE (0..1) of calls take MOCK_STRAGGLER_LATENCY seconds
+    instead, to simulate a heavy latency tail. MOCK_OUTAGE_S makes every call
+    fail with HTTP 500 for that many seconds after the client is created.
+    `samples` honours the `n` parameter unless MOCK_SUPPORTS_N=0.
+    """
+
+    def __init__(self, model: str, timeout: int = 45) -> None:
+        self.model = model
+        self.timeout = timeout
+        self.latency = float(os.getenv("MOCK_LATENCY", "0"))
+        self.error_rate = float(os.getenv("MOCK_ERROR_RATE", "0"))
+        self.response = os.getenv("MOCK_RESPONSE", MOCK_DIFF)
+        self.straggler_rate = float(os.getenv("MOCK_STRAGGLER_RATE", "0"))
+        self.straggler_latency = float(os.getenv("MOCK_STRAGGLER_LATENCY", "0"))
+        self.outage_until = time.time() + float(os.getenv("MOCK_OUTAGE_S", "0"))
+        self.supports_n = os.getenv("MOCK_SUPPORTS_N", "1") != "0"
+
+    def chat(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.2,
+        max_output_tokens: int = 2000,
+        seed: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> Tuple[str, Dict[str, float]]:
+        start = time.time()
+        latency = self.latency
+        if self.straggler_rate and random.random() < self.straggler_rate:
+            latency = self.straggler_latency
+        timeout = timeout or self.timeout
+        if latency > timeout:
+            deadline.sleep(timeout)
+            raise OpenAICompatError("mock: timed out")
+        if latency:
+            # Wakes up early when the run is cancelled, like an aborted connection
+            deadline.sleep(latency)
+        if time.time() < self.outage_until or (self.error_rate and random.random() < self.error_rate):
+            raise OpenAICompatError("HTTP Error 500: mock error")
+        prompt_chars = sum(len(m.get("content") or "") for m in messages)
+        prompt_tokens = float(prompt_chars // 4)
+        text = self.response
+        finish_reason = "stop"
+        if len(text) > max_output_tokens * 4:
+            text = text[: max_output_tokens * 4]
+            finish_reason = "length"
+        completion_tokens = float(len(text) // 4)
+        meta = {
+            "elapsed": time.time() - start,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "finish_reason": finish_reason,
+        }
+        return text, meta
+
+    def samples(
+        self,
+        messages: List[Dict[str, str]],
+        n: int,
+        temperature: float = 0.2,
+        max_output_tokens: int = 2000,
+        seed: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> Tuple[List[str], Dict[str, float]]:
+        text, meta = self.chat(messages, temperature, max_output_tokens, seed, timeout)
+        if not self.supports_n or n <= 1:
+            return [text], meta
+        # One prompt, n completions
+        meta["completion_tokens"] *= n
+        meta["total_tokens"] = meta["prompt_tokens"] + meta["completion_tokens"]
+        return [text] * n, meta
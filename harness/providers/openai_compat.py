@@ -1,7 +1,13 @@
+import base64
+import http.client
 import json
 import os
+import socket
+import threading
 import time
+import urllib.parse
 import urllib.request
+from contextvars import ContextVar
 from typing import Dict, List, Optional, Tuple
 
 
@@ -9,6 +15,127 @@ class OpenAICompatError(RuntimeError):
     pass
 
 
+# Idle keep-alive connections per (scheme, host, port, proxy), shared by every
+# client in the process so runs and sweep cells reuse warm TLS sessions
+MAX_IDLE_PER_HOST = 64
+_idle: Dict[Tuple, List[http.client.HTTPConnection]] = {}
+_idle_lock = threading.Lock()
+# Connections with a request in flight and the run that opened them, so a
+# cancelled run can unblock its own readers without touching other runs'
+_active: Dict[int, Tuple[http.client.HTTPConnection, Optional[object]]] = {}
+# The run (its RunControl) that requests made in this context belong to; set by deadline.bind
+connection_owner: ContextVar[Optional[object]] = ContextVar("connection_owner", default=None)
+_aborted = set()
+
+
+def _proxy_for(scheme: str, host: str) -> Optional[urllib.parse.SplitResult]:
+    """The proxy urllib would use for this host (HTTP(S)_PROXY, honouring NO_PROXY), or None."""
+    proxy = urllib.request.getproxies().get(scheme)
+    if not proxy or urllib.request.proxy_bypass(host):
+        return None
+    return urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+
+
+def _proxy_auth(proxy: urllib.parse.SplitResult) -> Dict[str, str]:
+    if not proxy.username:
+        return {}
+    cred = f"{urllib.parse.unquote(proxy.username)}:{urllib.parse.unquote(proxy.password or '')}"
+    return {"Proxy-Authorization": "Basic " + base64.b64encode(cred.encode("utf-8")).decode("ascii")}
+
+
+def _acquire(scheme: str, host: str, port: Optional[int], proxy, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+    with _idle_lock:
+        idle = _idle.get((scheme, host, port, proxy))
+        conn = idle.pop() if idle else None
+    if conn is None:
+        if proxy is None:
+            cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            return cls(host, port, timeout=timeout), False
+        if scheme == "https":
+            # CONNECT tunnel through the proxy, TLS end to end with the provider
+            conn = http.client.HTTPSConnection(proxy.hostname, proxy.port or 8080, timeout=timeout)
+            conn.set_tunnel(host, port or 443, headers=_proxy_auth(proxy))
+            return conn, False
+        # Plain HTTP goes to the proxy with the absolute URL as the request target
+        return http.client.HTTPConnection(proxy.hostname, proxy.port or 8080, timeout=timeout), False
+    conn.timeout = timeout
+    if conn.sock is not None:
+        conn.sock.settimeout(timeout)
+    return conn, True
+
+
+def abort_inflight(owner: Optional[object] = None) -> int:
+    """Shut down connections waiting on a response (only `owner`'s, if given); their calls fail at once."""
+    with _idle_lock:
+        conns = [c for c, o in _active.values() if owner is None or o is owner]
+        _aborted.update(id(c) for c in conns)
+    for conn in conns:
+        try:
+            if conn.sock is not None:
+                conn.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    return len(conns)
+
+
+def _release(scheme: str, host: str, port: Optional[int], proxy, conn: http.client.HTTPConnection) -> None:
+    with _idle_lock:
+        idle = _idle.setdefault((scheme, host, port, proxy), [])
+        if len(idle) < MAX_IDLE_PER_HOST:
+            idle.append(conn)
+            return
+    conn.close()
+
+
+def parse_chat_completion(obj: Dict, elapsed: float = 0.0) -> Tuple[str, Dict[str, float]]:
+    """Reply text and usage meta from a chat.completion response body."""
+    # OpenAI format: choices[0].message.content
+    # Try common content locations
+    content = None
+    finish_reason = None
+    try:
+        first = obj.get("choices", [{}])[0]
+        if isinstance(first, dict):
+            finish_reason = first.get("finish_reason")
+            if isinstance(first.get("message"), dict):
+                content = first["message"].get("content")
+            if content in (None, "") and "text" in first:
+                content = first.get("text")
+    except Exception:
+        content = None
+    if content is None:
+        # Fallback to stringifying the whole object to avoid crashes upstream
+        content = ""
+    usage = obj.get("usage", {})
+    meta = {
+        "elapsed": elapsed,
+        "prompt_tokens": float(usage.get("prompt_tokens", 0)),
+        "completion_tokens": float(usage.get("completion_tokens", 0)),
+        "total_tokens": float(usage.get("total_tokens", 0)),
+        # Prompt tokens served from the provider's prompt cache (OpenAI-style usage.prompt_tokens_details)
+        "cached_tokens": float((usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0),
+        # "length" means the completion hit max_tokens and was cut off
+        "finish_reason": finish_reason,
+    }
+    # Ensure text type
+    if not isinstance(content, str):
+        try:
+            content = str(content)
+        except Exception:
+            content = ""
+    return content, meta
+
+
+def _forget(conn: http.client.HTTPConnection) -> bool:
+    """Drop conn from the in-flight set; True if abort_inflight() shut it down."""
+    with _idle_lock:
+        _active.pop(id(conn), None)
+        if id(conn) in _aborted:
+            _aborted.discard(id(conn))
+            return True
+    return False
+
+
 class OpenAICompatChat:
     def __init__(
         self,
@@ -23,6 +150,8 @@ class OpenAICompatChat:
         self.model = model
         self.timeout = timeout
         self.extra_headers = extra_headers or {}
+        # Cleared the first time the provider ignores the `n` parameter
+        self.supports_n = True
 
     def _headers(self) -> Dict[str, str]:
         # Most providers accept Authorization: Bearer; some accept x-api-key
@@ -35,13 +164,13 @@ class OpenAICompatChat:
         headers.update(self.extra_headers)
         return headers
 
-    def chat(
+    def payload(
         self,
         messages: List[Dict[str, str]],
         temperature: float = 0.2,
         max_output_tokens: int = 2000,
         seed: Optional[int] = None,
-    ) -> Tuple[str, Dict[str, float]]:
+    ) -> Dict:
         payload = {
             "model": self.model,
             "messages": messages,
@@ -50,45 +179,94 @@ class OpenAICompatChat:
         }
         if seed is not None:
             payload["seed"] = seed
+        return payload
+
+    def chat(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.2,
+        max_output_tokens: int = 2000,
+        seed: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> Tuple[str, Dict[str, float]]:
+        obj, meta = self._post(self.payload(messages, temperature, max_output_tokens, seed), timeout)
+        content, usage = parse_chat_completion(obj, meta.pop("elapsed"))
+        meta.update(usage)
+        return content, meta
+
+    def samples(
+        self,
+        messages: List[Dict[str, str]],
+        n: int,
+        temperature: float = 0.2,
+        max_output_tokens: int = 2000,
+        seed: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> Tuple[List[str], Dict[str, float]]:
+        """Up to n completions from one request via the `n` parameter; usage covers all of them.
+
+        Providers that ignore `n` return a single choice; after that only one is asked for.
+        """
+        payload = self.payload(messages, temperature, max_output_tokens, seed)
+        if n > 1 and self.supports_n:
+            payload["n"] = n
+        obj, meta = self._post(payload, timeout)
+        _, usage = parse_chat_completion(obj, meta.pop("elapsed"))
+        meta.update(usage)
+        texts = [parse_chat_completion({"choices": [c]})[0] for c in obj.get("choices") or []]
+        if n > 1 and len(texts) < n:
+            self.supports_n = False
+        return texts, meta
+
+    def _post(self, payload: Dict, timeout: Optional[float] = None) -> Tuple[Dict, Dict]:
         data = json.dumps(payload).encode("utf-8")
-        req = urllib.request.Request(self.base_url, data=data, headers=self._headers())
+        url = urllib.parse.urlsplit(self.base_url)
+        path = (url.path or "/") + (f"?{url.query}" if url.query else "")
+        headers = self._headers()
+        proxy = _proxy_for(url.scheme, url.hostname)
+        if proxy is not None and url.scheme == "http":
+            path = self.base_url
+            headers.update(_proxy_auth(proxy))
         start = time.time()
-        try:
-            with urllib.request.urlopen(req, timeout=self.timeout) as r:
+        while True:
+            conn, reused = _acquire(url.scheme, url.hostname, url.port, proxy, timeout or self.timeout)
+            with _idle_lock:
+                _active[id(conn)] = (conn, connection_owner.get())
+            try:
+                conn.request("POST", path, body=data, headers=headers)
+                r = conn.getresponse()
                 raw = r.read().decode("utf-8")
-        except Exception as e:
-            raise OpenAICompatError(str(e))
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                conn.close()
+                if reused and not _forget(conn):
+                    # The server dropped an idle keep-alive connection; retry on a fresh one
+                    continue
+                raise OpenAICompatError(str(e))
+            except Exception as e:
+                conn.close()
+                _forget(conn)
+                raise OpenAICompatError(str(e))
+            _forget(conn)
+            break
+        ratelimit = r.headers.get("x-ratelimit-remaining-requests") or r.headers.get("x-ratelimit-remaining")
+        if r.will_close:
+            conn.close()
+        else:
+            _release(url.scheme, url.hostname, url.port, proxy, conn)
+        if r.status >= 400:
+            # Same wording as urllib's HTTPError, which callers match on (e.g. "429"), plus the provider's explanation
+            detail = " ".join(raw.split())[:300]
+            raise OpenAICompatError(f"HTTP Error {r.status}: {r.reason}" + (f": {detail}" if detail else ""))
         elapsed = time.time() - start
         try:
             obj = json.loads(raw)
         except Exception as e:
             raise OpenAICompatError(f"Invalid JSON from provider: {e}; raw={raw[:200]}...")
-        # OpenAI format: choices[0].message.content
-        # Try common content locations
-        content = None
-        try:
-            first = obj.get("choices", [{}])[0]
-            if isinstance(first, dict):
-                if isinstance(first.get("message"), dict):
-                    content = first["message"].get("content")
-                if content in (None, "") and "text" in first:
-                    content = first.get("text")
-        except Exception:
-            content = None
-        if content is None:
-            # Fallback to stringifying the whole object to avoid crashes upstream
-            content = ""
-        usage = obj.get("usage", {})
-        meta = {
-            "elapsed": elapsed,
-            "prompt_tokens": float(usage.get("prompt_tokens", 0)),
-            "completion_tokens": float(usage.get("completion_tokens", 0)),
-            "total_tokens": float(usage.get("total_tokens", 0)),
-        }
-        # Ensure text type
-        if not isinstance(content, str):
+        meta: Dict = {"elapsed": elapsed}
+        # Requests left in the provider's current rate-limit window, when it says
+        if ratelimit is not None:
             try:
-                content = str(content)
-            except Exception:
-                content = ""
-        return content, meta
+                meta["ratelimit_remaining"] = int(float(ratelimit))
+            except ValueError:
+                pass
+        return obj, meta
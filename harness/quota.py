@@ -0,0 +1,103 @@
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+
+QUOTA_PATH = Path(".cache/quota/ledger.json")
+# Daily request allowances; override with QUOTA_<PROVIDER>=<n> (0 = unlimited)
+DEFAULT_DAILY_LIMITS = {"chutes": 2000}
+
+
+def today() -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime())
+
+
+def daily_limit(provider: str) -> int:
+    v = os.getenv(f"QUOTA_{provider.upper()}")
+    if v is not None:
+        try:
+            return int(v)
+        except ValueError:
+            pass
+    return DEFAULT_DAILY_LIMITS.get(provider.lower(), 0)
+
+
+class QuotaLedger:
+    """Requests spent per provider per UTC day, shared by every process on the box.
+
+    The ledger is a small JSON file merged under flock, so shards and
+    concurrent runs draw from the same daily allowance. Counts are buffered in
+    memory and flushed every FLUSH_S seconds (and on read or exit) to keep the
+    file off the request path. Each entry counts `requests` (all calls sent,
+    including duplicates) and `hedges` (the duplicates alone).
+    """
+
+    FLUSH_S = 2.0
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = Path(path or os.getenv("QUOTA_LEDGER", str(QUOTA_PATH)))
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._last_flush = time.time()
+        atexit.register(self.flush)
+
+    def _load(self) -> Dict:
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.time()
+        if not pending:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix(".lock"), "w") as lock_f:
+            fcntl.flock(lock_f, fcntl.LOCK_EX)
+            data = self._load()
+            for (day, provider), counts in pending.items():
+                entry = data.setdefault(day, {}).setdefault(provider, {"requests": 0, "hedges": 0})
+                for k, v in counts.items():
+                    entry[k] = entry.get(k, 0) + v
+            tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(data, indent=1, sort_keys=True))
+            os.replace(tmp, self.path)
+
+    def record(self, provider: str, requests: int = 1, hedge: bool = False) -> None:
+        with self._lock:
+            entry = self._pending.setdefault((today(), provider), {"requests": 0, "hedges": 0})
+            entry["requests"] += requests
+            if hedge:
+                entry["hedges"] += requests
+            due = time.time() - self._last_flush >= self.FLUSH_S
+        if due:
+            self.flush()
+
+    def used(self, provider: str, day: Optional[str] = None) -> Dict[str, int]:
+        self.flush()
+        return self._load().get(day or today(), {}).get(provider, {"requests": 0, "hedges": 0})
+
+    def remaining(self, provider: str) -> Optional[int]:
+        """Requests left today, or None when the provider has no daily limit."""
+        limit = daily_limit(provider)
+        if not limit:
+            return None
+        return max(0, limit - self.used(provider)["requests"])
+
+    def stats(self, day: Optional[str] = None) -> Dict[str, Dict]:
+        self.flush()
+        out = {}
+        for provider, entry in self._load().get(day or today(), {}).items():
+            limit = daily_limit(provider)
+            out[provider] = {**entry, "limit": limit or None, "remaining": max(0, limit - entry["requests"]) if limit else None}
+        return out
+
+
+QUOTA = QuotaLedger()
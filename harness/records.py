@@ -0,0 +1,82 @@
+import json
+import os
+from typing import Dict, Iterable, Optional
+
+from harness.config import get_dataset_name_default
+
+
+class JsonlRecordSource:
+    """Dataset records from a local JSONL file, loaded lazily per instance.
+
+    Only a byte-offset index is kept in memory; each `get` seeks and parses a
+    single line so the full dataset never has to be resident.
+    """
+
+    def __init__(self, path: str, instance_ids: Optional[Iterable[str]] = None) -> None:
+        self.path = path
+        wanted = set(instance_ids) if instance_ids is not None else None
+        self._offsets: Dict[str, int] = {}
+        with open(path, "rb") as f:
+            while True:
+                off = f.tell()
+                ln = f.readline()
+                if not ln:
+                    break
+                if not ln.strip():
+                    continue
+                iid = json.loads(ln).get("instance_id")
+                if iid and (wanted is None or iid in wanted):
+                    self._offsets[iid] = off
+        _check_missing(wanted, self._offsets)
+
+    def get(self, iid: str) -> Dict:
+        with open(self.path, "rb") as f:
+            f.seek(self._offsets[iid])
+            return json.loads(f.readline())
+
+    def __contains__(self, iid: str) -> bool:
+        return iid in self._offsets
+
+
+class HFRecordSource:
+    """Dataset records from a HF dataset, fetched row-by-row on demand.
+
+    HF datasets are memory-mapped Arrow tables, so indexing one row only
+    materializes that row; we keep just an instance_id -> row index map.
+    """
+
+    def __init__(self, dataset_name: str, instance_ids: Optional[Iterable[str]] = None, split: str = "test") -> None:
+        try:
+            from datasets import load_dataset
+        except Exception:
+            raise RuntimeError("Please install `datasets` package")
+        self._ds = load_dataset(dataset_name, split=split)
+        wanted = set(instance_ids) if instance_ids is not None else None
+        self._rows: Dict[str, int] = {}
+        for i, iid in enumerate(self._ds["instance_id"]):
+            if iid and (wanted is None or iid in wanted):
+                self._rows[iid] = i
+        _check_missing(wanted, self._rows)
+
+    def get(self, iid: str) -> Dict:
+        return self._ds[self._rows[iid]]
+
+    def __contains__(self, iid: str) -> bool:
+        return iid in self._rows
+
+
+def _check_missing(wanted, found: Dict) -> None:
+    if wanted is None:
+        return
+    missing = wanted - set(found.keys())
+    if missing:
+        raise RuntimeError(f"Missing instances in dataset: {sorted(missing)}")
+
+
+def open_record_source(instance_ids: Optional[Iterable[str]] = None, dataset_name: Optional[str] = None):
+    """Pick a record source for `DATASET_NAME`: a local .jsonl path or a HF dataset name."""
+    name = dataset_name or get_dataset_name_default()
+    if name.endswith(".jsonl") and os.path.exists(name):
+        return JsonlRecordSource(name, instance_ids)
+    return HFRecordSource(name, instance_ids)
+
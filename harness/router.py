@@ -0,0 +1,192 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from harness.config import env_int
+from harness.deadline import DeadlineExceeded
+from harness.latency import HedgedChat
+from harness.providers.openai_compat import OpenAICompatError
+from harness.quota import QUOTA, daily_limit
+from harness.usage import retrying
+
+
+# Outcomes per backend used for the error rate; older ones are forgotten so a
+# benched backend gets another chance
+WINDOW = 20
+WINDOW_S = 120.0
+# Quota lookups read the shared ledger; refresh at most this often
+QUOTA_TTL_S = 5.0
+# Below this many requests left in a rate-limit window, a backend is scored down
+RATELIMIT_LOW = 5
+
+
+def backend_specs(spec: Dict) -> List[Dict]:
+    """Backends serving a model spec: its `backends` list, or the spec itself.
+
+    Each backend has `provider` and `model` (defaulting to the spec's), a
+    `preference` (default 1.0, higher is preferred) and a `cost` weight
+    (default 1.0, relative price per request).
+    """
+    out = []
+    for b in spec.get("backends") or [{}]:
+        out.append(
+            {
+                "provider": b.get("provider", spec["provider"]),
+                "model": b.get("model", spec["model"]),
+                "preference": float(b.get("preference", 1.0)),
+                "cost": float(b.get("cost", 1.0)),
+            }
+        )
+    return out
+
+
+class Backend:
+    """One (provider, model) endpoint of a routed model with its live health."""
+
+    def __init__(self, spec: Dict, client: HedgedChat) -> None:
+        self.provider = spec["provider"]
+        self.model = spec["model"]
+        self.name = f"{self.provider}:{self.model}"
+        self.preference = spec["preference"]
+        self.cost = spec["cost"]
+        self.client = client
+        self.outcomes: deque = deque(maxlen=WINDOW)
+        self.ratelimit_remaining: Optional[int] = None
+        self.throttled_until = 0.0
+        self.served = 0
+        self.errors = 0
+        self._quota: Tuple[float, Optional[int]] = (0.0, None)
+
+    def error_rate(self) -> float:
+        cutoff = time.time() - WINDOW_S
+        recent = [failed for t, failed in self.outcomes if t >= cutoff]
+        return sum(recent) / len(recent) if recent else 0.0
+
+    def quota_left(self) -> Optional[int]:
+        at, left = self._quota
+        if time.time() - at >= QUOTA_TTL_S:
+            left = QUOTA.remaining(self.provider)
+            self._quota = (time.time(), left)
+        return left
+
+    def available(self, left: Optional[int]) -> bool:
+        return time.time() >= self.throttled_until and left != 0 and self.ratelimit_remaining != 0
+
+    def score(self, fastest: Optional[float], error_rate: float, p50: Optional[float], left: Optional[int]) -> float:
+        """preference / cost, scaled by health, relative speed and headroom; higher wins.
+
+        Takes the error rate, p50 latency and quota left as read by the caller.
+        """
+        s = self.preference / max(self.cost, 1e-6)
+        s *= (1.0 - error_rate) ** 2
+        if p50 and fastest:
+            s *= fastest / p50
+        limit = daily_limit(self.provider)
+        if left is not None and limit:
+            # Spend the last 10% of a daily allowance only when nothing else is left
+            s *= min(1.0, left / (0.1 * limit))
+        if self.ratelimit_remaining is not None and self.ratelimit_remaining < RATELIMIT_LOW:
+            s *= (self.ratelimit_remaining + 1) / (RATELIMIT_LOW + 1)
+        return s
+
+
+class RoutedChat:
+    """Client for a model served by several backends.
+
+    Each request goes to the best-scoring available backend (see
+    Backend.score) and fails over down the ranking on errors; a 429 benches
+    the backend for ROUTER_THROTTLE_S seconds. The serving backend and the
+    number of failovers are returned in the call meta.
+    """
+
+    def __init__(self, model: str, backends: List[Backend]) -> None:
+        self.model = model
+        self.backends = backends
+        self.throttle_s = env_int("ROUTER_THROTTLE_S", 20)
+        self._lock = threading.Lock()
+        self.failovers = 0
+
+    def ranked(self) -> List[Backend]:
+        # Latency and quota lookups (the latter may read the shared ledger file)
+        # happen outside the lock; only the outcome windows and the pick need it
+        p50s = [b.client.tracker.percentile(50) for b in self.backends]
+        lefts = [b.quota_left() for b in self.backends]
+        known = [p for p in p50s if p]
+        fastest = min(known) if known else None
+        with self._lock:
+            scores = [b.score(fastest, b.error_rate(), p50, left) for b, p50, left in zip(self.backends, p50s, lefts)]
+            order = sorted(range(len(self.backends)), key=lambda i: -scores[i])
+            up = [self.backends[i].available(lefts[i]) for i in order]
+        scored = [self.backends[i] for i in order]
+        # Unavailable backends stay as a last resort rather than failing the call
+        return [b for b, ok in zip(scored, up) if ok] + [b for b, ok in zip(scored, up) if not ok]
+
+    def chat(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.2,
+        max_output_tokens: int = 2000,
+        seed: Optional[int] = None,
+    ) -> Tuple[str, Dict[str, float]]:
+        return self._route(lambda c: c.chat(messages, temperature=temperature, max_output_tokens=max_output_tokens, seed=seed))
+
+    def samples(
+        self,
+        messages: List[Dict[str, str]],
+        n: int,
+        temperature: float = 0.2,
+        max_output_tokens: int = 2000,
+        seed: Optional[int] = None,
+    ) -> Tuple[List[str], Dict[str, float]]:
+        return self._route(lambda c: c.samples(messages, n, temperature=temperature, max_output_tokens=max_output_tokens, seed=seed))
+
+    def _route(self, call):
+        error: Optional[OpenAICompatError] = None
+        for tried, b in enumerate(self.ranked()):
+            try:
+                if tried:
+                    with retrying():
+                        out, meta = call(b.client)
+                else:
+                    out, meta = call(b.client)
+            except DeadlineExceeded:
+                raise
+            except OpenAICompatError as e:
+                error = e
+                with self._lock:
+                    b.outcomes.append((time.time(), True))
+                    b.errors += 1
+                    if "429" in str(e):
+                        b.throttled_until = time.time() + self.throttle_s
+                continue
+            with self._lock:
+                b.outcomes.append((time.time(), False))
+                b.served += 1
+                self.failovers += tried
+                if "ratelimit_remaining" in meta:
+                    b.ratelimit_remaining = int(meta["ratelimit_remaining"])
+            meta["failovers"] = tried
+            return out, meta
+        raise error or OpenAICompatError("no backends configured")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            out = {"failovers": self.failovers, "backends": {}}
+            backends = [(b, b.served, b.errors, round(b.error_rate(), 4)) for b in self.backends]
+        for b, served, errors, rate in backends:
+            out["backends"][b.name] = {"served": served, "errors": errors, "error_rate": rate, **b.client.stats()}
+        return out
+
+
+def build_model_client(
+    spec: Dict, make_client: Callable[[str, str], object], hedge: bool, history: Dict[str, List[float]]
+):
+    """HedgedChat for a single-backend spec, RoutedChat when it lists `backends`."""
+    backends = [
+        Backend(b, HedgedChat(make_client(b["provider"], b["model"]), b["provider"], hedge=hedge, history=history.get(f"{b['provider']}:{b['model']}")))
+        for b in backend_specs(spec)
+    ]
+    if not spec.get("backends"):
+        return backends[0].client
+    return RoutedChat(spec["model"], backends)
@@ -0,0 +1,161 @@
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Callable, Dict, List, Optional, Tuple
+
+from harness.config import env_int
+from harness.deadline import budget
+from harness.eval_pipeline import patch_hash
+from harness.preflight import CACHE_DIR
+from harness.providers.openai_compat import OpenAICompatError
+
+
+# Fallback calls for providers without `n`; separate from the hedging pool so
+# nested waits cannot starve each other
+_POOL = ThreadPoolExecutor(max_workers=env_int("SAMPLE_THREADS", 32), thread_name_prefix="sample")
+
+
+def sample_completions(
+    client, messages: List[Dict[str, str]], n: int, temperature: float, max_output_tokens: int, seed: int
+) -> Tuple[List[str], Dict]:
+    """n candidate replies for one prompt.
+
+    Asks for all n in one request (OpenAI `n`); whatever the provider did not
+    return is topped up with concurrent single calls on seeds seed+1, seed+2, ...
+    Usage is summed; `sampling` in the meta says how many requests it took and
+    how many prompt tokens one multi-sample request saved over n separate ones.
+    """
+    texts, meta = client.samples(messages, n, temperature=temperature, max_output_tokens=max_output_tokens, seed=seed)
+    native = len(texts)
+    requests = 1
+    saved = meta.get("prompt_tokens", 0) * (native - 1) if native > 1 else 0
+    if native < n:
+        futs = [
+            _POOL.submit(copy_context().run, client.chat, messages, temperature=temperature, max_output_tokens=max_output_tokens, seed=seed + i)
+            for i in range(native, n)
+        ]
+        for fut in futs:
+            requests += 1
+            try:
+                text, m = fut.result()
+            except OpenAICompatError:
+                continue
+            texts.append(text)
+            for k in ("prompt_tokens", "completion_tokens", "total_tokens", "cached_tokens"):
+                meta[k] = meta.get(k, 0) + m.get(k, 0)
+    meta["sampling"] = {"k": n, "native": native, "requests": requests, "candidates": len(texts), "prompt_tokens_saved": saved}
+    return texts, meta
+
+
+def _norm(line: str) -> str:
+    return " ".join(line.split())
+
+
+def _hunks(diff: str) -> List[Tuple[Optional[str], List[str]]]:
+    """(old path, old-side lines) per hunk; the path is None for new files."""
+    out: List[Tuple[Optional[str], List[str]]] = []
+    path: Optional[str] = None
+    cur: Optional[List[str]] = None
+    for ln in diff.splitlines():
+        if ln.startswith("--- "):
+            src = ln[4:].strip()
+            path = None if src == "/dev/null" else (src[2:] if src.startswith("a/") else src)
+            cur = None
+        elif ln.startswith("+++ "):
+            cur = None
+        elif ln.startswith("@@"):
+            cur = []
+            out.append((path, cur))
+        elif cur is not None and ln[:1] in (" ", "-"):
+            cur.append(_norm(ln[1:]))
+        elif cur is not None and ln == "":
+            cur.append("")
+    return out
+
+
+class BaseFiles:
+    """File contents at a repo's base commit, read from the local clone with `git show` and memoized."""
+
+    def __init__(self, repo: str, commit: Optional[str]) -> None:
+        self.repo_dir = CACHE_DIR / repo
+        self.rev = commit or "HEAD"
+        self._lock = threading.Lock()
+        self._files: Dict[str, Optional[List[str]]] = {}
+
+    def available(self) -> bool:
+        return (self.repo_dir / ".git").exists()
+
+    def lines(self, path: str) -> Optional[List[str]]:
+        with self._lock:
+            if path in self._files:
+                return self._files[path]
+        try:
+            proc = subprocess.run(
+                ["git", "-C", str(self.repo_dir), "show", f"{self.rev}:{path}"],
+                capture_output=True, text=True, errors="replace", timeout=budget(30),
+            )
+        except subprocess.TimeoutExpired:
+            # Not memoized: a slow disk is no reason to score later candidates against nothing
+            return None
+        lines = [_norm(ln) for ln in proc.stdout.splitlines()] if proc.returncode == 0 else None
+        with self._lock:
+            self._files[path] = lines
+        return lines
+
+
+def applicability(diff: str, files: BaseFiles) -> Optional[float]:
+    """Fraction of hunks whose old side occurs verbatim (modulo whitespace) in the base file.
+
+    Computed in-process, without touching a checkout; None when the repo is not cloned locally.
+    """
+    if not files.available():
+        return None
+    hunks = _hunks(diff)
+    if not hunks:
+        return 0.0
+    ok = 0
+    for path, old in hunks:
+        if path is None:
+            ok += 1
+            continue
+        lines = files.lines(path)
+        if lines is None:
+            continue
+        if not old or ("\n" + "\n".join(old) + "\n") in ("\n" + "\n".join(lines) + "\n"):
+            ok += 1
+    return ok / len(hunks)
+
+
+def rank_candidates(
+    diffs: List[str], files: Optional[BaseFiles], preflight: Optional[Callable[[str], bool]] = None
+) -> Tuple[Optional[str], Dict]:
+    """Deduplicate candidate diffs and pick the best one.
+
+    Candidates are ordered by in-process applicability (ties keep sample
+    order), then preflighted in that order until one passes. The best is the
+    first to pass, else the most applicable.
+    """
+    unique: List[str] = []
+    seen = set()
+    for d in diffs:
+        h = patch_hash(d)
+        if h not in seen:
+            seen.add(h)
+            unique.append(d)
+    scores = [applicability(d, files) if files is not None else None for d in unique]
+    order = sorted(range(len(unique)), key=lambda i: -(scores[i] or 0.0))
+    info: Dict = {"valid": len(diffs), "unique": len(unique), "applicability": [scores[i] for i in order]}
+    if not unique:
+        return None, info
+    best = unique[order[0]]
+    if preflight is not None:
+        info["preflight"] = []
+        for i in order:
+            passed = preflight(unique[i])
+            info["preflight"].append(passed)
+            if passed:
+                best = unique[i]
+                break
+    return best, info
+
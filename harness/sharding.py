@@ -0,0 +1,225 @@
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def parse_shard(text: str) -> Tuple[int, int]:
+    """Parse an `i/N` shard spec (0-based index) into (i, N)."""
+    try:
+        a, b = text.split("/", 1)
+        i, n = int(a), int(b)
+    except ValueError:
+        raise ValueError(f"invalid shard spec {text!r}; expected i/N")
+    if n < 1 or not 0 <= i < n:
+        raise ValueError(f"invalid shard spec {text!r}; need 0 <= i < N")
+    return i, n
+
+
+def unit_key(provider: str, model: str, iid: str) -> str:
+    return f"{provider}:{model}|{iid}"
+
+
+def shard_of(provider: str, model: str, iid: str, count: int) -> int:
+    # Stable across machines/processes (unlike hash()), so every box agrees
+    digest = hashlib.sha1(unit_key(provider, model, iid).encode("utf-8")).hexdigest()
+    return int(digest[:16], 16) % count
+
+
+def shard_dir_name(index: int, count: int) -> str:
+    return f"{index}-of-{count}"
+
+
+def expected_units(model_specs: List[Dict], instance_ids: Iterable[str], index: int, count: int) -> List[str]:
+    ids = list(instance_ids)
+    out = []
+    for spec in model_specs:
+        for iid in ids:
+            if shard_of(spec["provider"], spec["model"], iid, count) == index:
+                out.append(unit_key(spec["provider"], spec["model"], iid))
+    return out
+
+
+def units_digest(units: Iterable[str]) -> str:
+    h = hashlib.sha1()
+    for u in sorted(units):
+        h.update(u.encode("utf-8") + b"\n")
+    return h.hexdigest()
+
+
+def _read_jsonl(path: Path) -> List[Dict]:
+    if not path.exists():
+        return []
+    rows = []
+    with open(path, "r") as f:
+        for ln in f:
+            ln = ln.strip()
+            if ln:
+                rows.append(json.loads(ln))
+    return rows
+
+
+def _pick_prediction(old: Dict, new: Dict) -> Dict:
+    # Prefer a row that carries a patch, then one that was not cut short; otherwise keep the first seen
+    if not old.get("model_patch") and new.get("model_patch"):
+        return new
+    if old.get("status") == "cancelled" and new.get("status") != "cancelled":
+        return new
+    return old
+
+
+# Derived from the counters by summarize_quality, so recomputed rather than summed
+_DERIVED_QUALITY = {
+    "preflight_first_pass_rate",
+    "preflight_final_pass_rate",
+    "reasks_per_instance",
+    "pass_at_k",
+    "pass_at_k_per_100_requests",
+    "duplicate_rate",
+}
+
+
+def _merge_metrics(metrics: List[Dict], attempt_rows: List[Dict], usage: Optional[Dict]) -> Dict:
+    """Run-level metrics of the merged run; per-shard metrics are kept under `shards`.
+
+    Quality counters and breaker counts are summed, latency percentiles are
+    recomputed from the merged attempt rows and usage from the merged ledger.
+    """
+    from harness.deadline import STOPPED_ATTEMPT_STATUSES
+    from harness.latency import latency_summary
+    from harness.orchestrator import summarize_quality
+
+    out: Dict = {"shards": metrics}
+    counters = [m["patch_quality"] for m in metrics if m.get("patch_quality")]
+    if counters:
+        totals: Dict[str, int] = {}
+        for c in counters:
+            for k, v in c.items():
+                if k not in _DERIVED_QUALITY and isinstance(v, (int, float)):
+                    totals[k] = totals.get(k, 0) + v
+        out["patch_quality"] = summarize_quality(totals)
+    # Attempts cut by a deadline or cancel are left out, as in a single run
+    latencies = [
+        r["usage"]["attempt_latency_s"]
+        for r in attempt_rows
+        if r.get("status") not in STOPPED_ATTEMPT_STATUSES and (r.get("usage") or {}).get("attempt_latency_s") is not None
+    ]
+    out["latency"] = latency_summary(latencies)
+    if usage is not None:
+        out["usage"] = usage
+    breakers = [m["breaker"] for m in metrics if m.get("breaker")]
+    if breakers:
+        models: Dict[str, Dict[str, int]] = {}
+        for b in breakers:
+            for name, st in b.get("models", {}).items():
+                agg = models.setdefault(name, {"opened": 0, "rejected_calls": 0})
+                agg["opened"] += st.get("opened", 0)
+                agg["rejected_calls"] += st.get("rejected_calls", 0)
+        out["breaker"] = {"parked": sum(b.get("parked", 0) for b in breakers), "models": models}
+    return out
+
+
+def merge_shards(run_id: str, shard_dirs: Optional[List[str]] = None) -> Dict:
+    """Combine runs/<run_id>/shards/* into one deduplicated run directory.
+
+    Verifies that all N shards are present, agree on the run config and unit
+    digest, and that each shard finished exactly its partition of (model,
+    instance) units; rows cut short by a deadline or drain ("cancelled") count
+    as gaps. Raises RuntimeError on any gap so an incomplete merge is never
+    written. Predictions, attempt logs and usage ledgers are merged.
+    """
+    out_dir = Path("runs") / run_id
+    if shard_dirs:
+        dirs = [Path(d) for d in shard_dirs]
+    else:
+        dirs = sorted(p for p in (out_dir / "shards").glob("*-of-*") if p.is_dir())
+    if not dirs:
+        raise RuntimeError(f"No shard directories found for run {run_id}")
+
+    manifests = []
+    for d in dirs:
+        mp = d / "manifest.json"
+        if not mp.exists():
+            raise RuntimeError(f"Shard {d} has no manifest.json (not finished?)")
+        manifests.append((d, json.loads(mp.read_text())))
+
+    counts = {m["shard"]["count"] for _, m in manifests}
+    if len(counts) != 1:
+        raise RuntimeError(f"Shards disagree on shard count: {sorted(counts)}")
+    count = counts.pop()
+    seen = sorted(m["shard"]["index"] for _, m in manifests)
+    if seen != list(range(count)):
+        missing = sorted(set(range(count)) - set(seen))
+        raise RuntimeError(f"Incomplete shard set: have {seen}, missing {missing} of {count}")
+    ref = manifests[0][1]
+    for d, m in manifests[1:]:
+        for k in ("models", "instance_ids", "attempts", "temperature", "max_output_tokens", "mode", "samples"):
+            if m.get(k) != ref.get(k):
+                raise RuntimeError(f"Shard {d} differs from shard {manifests[0][0]} on {k!r}")
+
+    preds: Dict[Tuple[str, str], Dict] = {}
+    attempts: Dict[Tuple, Dict] = {}
+    usage_rows: List[Dict] = []
+    problems: List[str] = []
+    for d, m in manifests:
+        index = m["shard"]["index"]
+        want = set(expected_units(ref["models"], ref["instance_ids"], index, count))
+        if m["shard"].get("units_digest") != units_digest(want):
+            # Built from a different instance list, model set or shard count
+            problems.append(f"shard {index}: units digest does not match the merged run's partition")
+            continue
+        got = set()
+        cancelled = set()
+        for row in _read_jsonl(d / "predictions.jsonl"):
+            key = (row["instance_id"], row["model_name_or_path"])
+            unit = f"{row['model_name_or_path']}|{row['instance_id']}"
+            (cancelled if row.get("status") == "cancelled" else got).add(unit)
+            preds[key] = _pick_prediction(preds[key], row) if key in preds else row
+        for row in _read_jsonl(d / "logs" / "attempts.jsonl"):
+            akey = (row["instance_id"], row["provider"], row["model"], row["attempt_index"], row["seed"])
+            attempts.setdefault(akey, row)
+        usage_rows.extend(_read_jsonl(d / "logs" / "usage.jsonl"))
+        if cancelled - got:
+            problems.append(f"shard {index}: {len(cancelled - got)} units cancelled (drained or past deadline); re-run it")
+        if want - got - cancelled:
+            problems.append(f"shard {index}: {len(want - got - cancelled)} missing units")
+        if got - want:
+            problems.append(f"shard {index}: {len(got - want)} units outside its partition")
+    if problems:
+        raise RuntimeError("Shard verification failed: " + "; ".join(problems))
+
+    (out_dir / "logs").mkdir(parents=True, exist_ok=True)
+    pred_path = out_dir / "predictions.jsonl"
+    with open(pred_path, "w") as f:
+        for key in sorted(preds):
+            f.write(json.dumps(preds[key]) + "\n")
+    attempt_rows = [attempts[key] for key in sorted(attempts, key=lambda k: (k[0], k[1], k[2], k[3], k[4]))]
+    with open(out_dir / "logs" / "attempts.jsonl", "w") as f:
+        for row in attempt_rows:
+            f.write(json.dumps(row) + "\n")
+    usage = None
+    if usage_rows:
+        from harness.pricing import load_prices
+        from harness.usage import UsageLedger
+
+        ledger = UsageLedger(str(out_dir / "logs" / "usage.jsonl"))
+        for row in sorted(usage_rows, key=lambda r: r.get("ts", 0)):
+            ledger.record(row)
+        ledger.close()
+        usage = ledger.summary(load_prices())
+
+    manifest = {k: v for k, v in ref.items() if k not in ("shard", "predictions_path", "generated", "metrics")}
+    manifest["metrics"] = _merge_metrics([m.get("metrics") or {} for _, m in manifests], attempt_rows, usage)
+    manifest.update(
+        {
+            "run_id": run_id,
+            "predictions_path": str(pred_path.resolve()),
+            "shards": [{"dir": str(d), **m["shard"]} for d, m in manifests],
+            "predictions": len(preds),
+            "attempt_rows": len(attempts),
+            "generated": int(time.time()),
+        }
+    )
+    (out_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    return manifest
@@ -0,0 +1,228 @@
+import json
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+from harness.quota import QUOTA
+
+
+# Throughput and ETA are measured over this trailing window
+RATE_WINDOW_S = 60.0
+SLOWEST = 10
+
+# The in-flight entry of the task running in this context (see RunStatus.run_task)
+_task: ContextVar[Optional[Dict]] = ContextVar("status_task", default=None)
+_runs: Dict[str, "RunStatus"] = {}
+_runs_lock = threading.Lock()
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def set_stage(stage: str, attempt: Optional[int] = None) -> None:
+    """Label what the current worker's task is doing; a no-op outside a tracked task."""
+    task = _task.get()
+    if task is not None:
+        task["stage"] = stage
+        task["stage_since"] = time.time()
+        if attempt is not None:
+            task["attempt"] = attempt
+
+
+def current_task() -> Optional[Dict]:
+    """Model, instance, attempt and stage of the tracked task running in this context, if any."""
+    return _task.get()
+
+
+class RunStatus:
+    """Live counters for one run, read by the status endpoint.
+
+    The orchestrator and workers only do O(1) updates under one lock (a dict
+    entry per in-flight task, a few counters per model); rates, ETA and the
+    slowest tasks are derived when a snapshot is requested.
+    """
+
+    def __init__(self, run_id: str, totals: Dict[Tuple[str, str], int], workers: int) -> None:
+        self.run_id = run_id
+        self.workers = workers
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._inflight: Dict[int, Dict] = {}
+        self._done: deque = deque()
+        self.models: Dict[str, Dict[str, int]] = {}
+        for (provider, model), n in totals.items():
+            self.models[f"{provider}:{model}"] = {
+                "total": n,
+                "queued": n,
+                "running": 0,
+                "done": 0,
+                "attempts": 0,
+                "reasks": 0,
+                "calls": 0,
+                "calls_inflight": 0,
+                "call_errors": 0,
+            }
+
+    def submitted(self, key: Tuple[str, str]) -> None:
+        with self._lock:
+            self.models[f"{key[0]}:{key[1]}"]["queued"] -= 1
+
+    def requeued(self, key: Tuple[str, str]) -> None:
+        with self._lock:
+            self.models[f"{key[0]}:{key[1]}"]["queued"] += 1
+
+    def run_task(self, key: Tuple[str, str], iid: str, fn, *args):
+        """Run fn(*args) on this worker as a tracked task of `key` for instance `iid`."""
+        name = f"{key[0]}:{key[1]}"
+        now = time.time()
+        entry = {"model": name, "instance_id": iid, "stage": "queued", "attempt": None, "started": now, "stage_since": now}
+        with self._lock:
+            self._seq += 1
+            tid = self._seq
+            self._inflight[tid] = entry
+            self.models[name]["running"] += 1
+        token = _task.set(entry)
+        counts = None
+        try:
+            counts = fn(*args)
+            return counts
+        finally:
+            _task.reset(token)
+            now = time.time()
+            with self._lock:
+                del self._inflight[tid]
+                m = self.models[name]
+                m["running"] -= 1
+                if isinstance(counts, dict):
+                    m["done"] += 1
+                    m["attempts"] += counts.get("attempts", 0)
+                    m["reasks"] += counts.get("reasks", 0)
+                    self._done.append(now)
+                    while self._done and now - self._done[0] > RATE_WINDOW_S:
+                        self._done.popleft()
+
+    def call_started(self, name: str) -> None:
+        with self._lock:
+            m = self.models[name]
+            m["calls"] += 1
+            m["calls_inflight"] += 1
+
+    def call_finished(self, name: str, ok: bool) -> None:
+        with self._lock:
+            m = self.models[name]
+            m["calls_inflight"] -= 1
+            m["call_errors"] += int(not ok)
+
+    def finish(self) -> None:
+        self.finished = time.time()
+
+    def snapshot(self) -> Dict:
+        now = self.finished or time.time()
+        with self._lock:
+            models = {k: dict(v) for k, v in self.models.items()}
+            inflight = [dict(t) for t in self._inflight.values()]
+            recent = [t for t in self._done if now - t <= RATE_WINDOW_S]
+        elapsed = max(1e-6, now - self.started)
+        span = min(RATE_WINDOW_S, elapsed)
+        rate = len(recent) / span if recent else 0.0
+        total = sum(m["total"] for m in models.values())
+        done = sum(m["done"] for m in models.values())
+        providers = {}
+        for name, m in models.items():
+            m["error_rate"] = round(m["call_errors"] / m["calls"], 4) if m["calls"] else None
+            # Attempts past the first plus re-asks, per finished task
+            m["retries_per_task"] = round((m["attempts"] - m["done"] + m["reasks"]) / m["done"], 3) if m["done"] else None
+            provider = name.split(":", 1)[0]
+            if provider not in providers:
+                providers[provider] = QUOTA.remaining(provider)
+        inflight.sort(key=lambda t: t["started"])
+        return {
+            "run_id": self.run_id,
+            "state": "done" if self.finished else "running",
+            "workers": self.workers,
+            "elapsed_s": round(elapsed, 1),
+            "tasks": {"total": total, "done": done, "running": len(inflight)},
+            "tasks_per_min": round(rate * 60.0, 2),
+            "eta_s": round((total - done) / rate, 0) if rate > 0 and not self.finished else None,
+            "models": models,
+            "quota_remaining": providers,
+            "slowest": [
+                {
+                    "model": t["model"],
+                    "instance_id": t["instance_id"],
+                    "attempt": t["attempt"],
+                    "stage": t["stage"],
+                    "age_s": round(now - t["started"], 1),
+                    "stage_s": round(now - t["stage_since"], 1),
+                }
+                for t in inflight[:SLOWEST]
+            ],
+        }
+
+
+class StatusChat:
+    """Client wrapper counting in-flight and failed provider calls for a RunStatus."""
+
+    def __init__(self, client, status: RunStatus, name: str) -> None:
+        self.client = client
+        self.status = status
+        self.name = name
+        self.model = getattr(client, "model", None)
+
+    def chat(self, messages, temperature: float = 0.2, max_output_tokens: int = 2000, seed: Optional[int] = None):
+        return self._tracked(self.client.chat, messages, temperature=temperature, max_output_tokens=max_output_tokens, seed=seed)
+
+    def samples(self, messages, n: int, temperature: float = 0.2, max_output_tokens: int = 2000, seed: Optional[int] = None):
+        return self._tracked(self.client.samples, messages, n, temperature=temperature, max_output_tokens=max_output_tokens, seed=seed)
+
+    def _tracked(self, fn, *args, **kwargs):
+        self.status.call_started(self.name)
+        ok = False
+        try:
+            out = fn(*args, **kwargs)
+            ok = True
+            return out
+        finally:
+            self.status.call_finished(self.name, ok)
+
+
+def register(status: RunStatus) -> None:
+    with _runs_lock:
+        _runs[status.run_id] = status
+
+
+def snapshot_all() -> Dict:
+    with _runs_lock:
+        runs = list(_runs.values())
+    return {"ts": int(time.time()), "runs": [r.snapshot() for r in runs]}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/status"):
+            self.send_error(404)
+            return
+        body = json.dumps(snapshot_all()).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_status(port: int, host: str = "127.0.0.1") -> str:
+    """Start (once per process) the JSON status endpoint on a daemon thread; returns its URL."""
+    global _server
+    with _runs_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _Handler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="status", daemon=True).start()
+        h, p = _server.server_address[:2]
+    return f"http://{h}:{p}/status"
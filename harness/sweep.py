@@ -0,0 +1,112 @@
+import itertools
+import json
+import re
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from harness.config import get_workers_default, load_credentials_into_env
+from harness.orchestrator import load_instances_jsonl, orchestrate_predictions
+from harness.records import open_record_source
+
+
+def tracked_model_specs() -> List[Dict]:
+    """Model specs for temp_models.TRACKED_MODELS (openai/* via OpenRouter, the rest via Chutes)."""
+    from temp_models import TRACKED_MODELS
+
+    return [{"provider": "openrouter" if m.startswith("openai/") else "chutes", "model": m, "seed": 42} for m in TRACKED_MODELS]
+
+
+def expand_matrix(
+    model_specs: List[Dict], temperatures: List[float], attempts: List[int], modes: List[str]
+) -> List[Dict]:
+    """Cross product of the sweep axes; one cell per (model, temperature, attempts, mode)."""
+    cells = []
+    for spec, temp, k, mode in itertools.product(model_specs, temperatures, attempts, modes):
+        cells.append({"spec": spec, "temperature": temp, "attempts": k, "mode": mode})
+    return cells
+
+
+def cell_run_id(sweep_id: str, cell: Dict) -> str:
+    model = re.sub(r"[^A-Za-z0-9._-]+", "-", f"{cell['spec']['provider']}-{cell['spec']['model']}")
+    return f"{sweep_id}__{model}__t{cell['temperature']}__a{cell['attempts']}__{cell['mode']}"
+
+
+def run_sweep(
+    sweep_id: str,
+    instances_path: str,
+    cells: List[Dict],
+    max_output_tokens: int = 2000,
+    sequential: bool = False,
+    **run_kwargs,
+) -> Dict:
+    """Run every cell as its own `runs/<cell run_id>`, sharing state across cells.
+
+    All cells run concurrently and submit to one worker pool of WORKERS
+    threads (the global scheduler), reuse one dataset record source and one
+    warm client stack per (provider, model) (latency, hedging, routing and
+    keep-alive connections), and share the process-wide repo, retrieval,
+    symbol and tool caches. With sequential=True cells run one after another
+    with nothing shared but those process-wide caches, for comparison.
+    Writes runs/<sweep_id>/sweep.json and returns it.
+    """
+    load_credentials_into_env()
+    started = time.time()
+    instance_ids = load_instances_jsonl(instances_path)
+    shared: Dict = {}
+    executor: Optional[ThreadPoolExecutor] = None
+    if not sequential:
+        shared = {"records": open_record_source(instance_ids), "model_clients": {}}
+        executor = ThreadPoolExecutor(max_workers=get_workers_default(), thread_name_prefix="sweep")
+
+    def run_cell(cell: Dict) -> Dict:
+        run_id = cell_run_id(sweep_id, cell)
+        t0 = time.time()
+        out = {"run_id": run_id, "model": f"{cell['spec']['provider']}:{cell['spec']['model']}", **{k: cell[k] for k in ("temperature", "attempts", "mode")}}
+        try:
+            orchestrate_predictions(
+                run_id=run_id,
+                instances_path=instances_path,
+                model_specs=[cell["spec"]],
+                attempts=cell["attempts"],
+                temperature=cell["temperature"],
+                max_output_tokens=max_output_tokens,
+                mode=cell["mode"],
+                executor=executor,
+                **shared,
+                **run_kwargs,
+            )
+            out["status"] = "ok"
+        except Exception as e:
+            out["status"] = "error"
+            out["error"] = f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+        out["wall_s"] = round(time.time() - t0, 2)
+        return out
+
+    try:
+        if sequential:
+            results = [run_cell(c) for c in cells]
+        else:
+            # One light driver thread per cell; the work itself runs on `executor`
+            with ThreadPoolExecutor(max_workers=max(1, len(cells)), thread_name_prefix="cell") as drivers:
+                results = list(drivers.map(run_cell, cells))
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    summary = {
+        "sweep_id": sweep_id,
+        "instances_path": str(Path(instances_path).resolve()),
+        "sequential": sequential,
+        "cells": results,
+        "wall_s": round(time.time() - started, 2),
+        "cell_wall_s_sum": round(sum(r["wall_s"] for r in results), 2),
+        "generated": int(time.time()),
+    }
+    out_dir = Path("runs") / sweep_id
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / "sweep.json").write_text(json.dumps(summary, indent=2))
+    return summary
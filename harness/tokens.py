@@ -0,0 +1,177 @@
+import math
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from harness.config import env_int
+
+
+# Chat formats add a few tokens of framing per message
+PER_MESSAGE_OVERHEAD = 4
+# Headroom for estimator error, as a fraction of the context window
+SAFETY_MARGIN = 0.05
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 chars/token for code and English; good enough for budgeting
+    return len(text) // 4 + 1
+
+
+class CharEstimator:
+    """Calibrated chars-per-token approximation; no dependencies."""
+
+    def __init__(self, chars_per_token: float = 4.0) -> None:
+        self.chars_per_token = chars_per_token
+        self.name = f"chars:{chars_per_token:g}"
+
+    def count(self, text: str) -> int:
+        return math.ceil(len(text) / self.chars_per_token) if text else 0
+
+
+class TiktokenEstimator:
+    def __init__(self, encoding: str = "cl100k_base") -> None:
+        try:
+            import tiktoken
+        except Exception:
+            raise RuntimeError("Please install `tiktoken` to use tokenizer tiktoken:<encoding>")
+        self._enc = tiktoken.get_encoding(encoding)
+        self.name = f"tiktoken:{encoding}"
+
+    def count(self, text: str) -> int:
+        return len(self._enc.encode(text, disallowed_special=()))
+
+
+class HFTokenizerEstimator:
+    """Local `tokenizer.json` loaded with the `tokenizers` package (no network)."""
+
+    def __init__(self, path: str) -> None:
+        try:
+            from tokenizers import Tokenizer
+        except Exception:
+            raise RuntimeError("Please install `tokenizers` to use tokenizer hf:<path/to/tokenizer.json>")
+        self._tok = Tokenizer.from_file(path)
+        self.name = f"hf:{path}"
+
+    def count(self, text: str) -> int:
+        return len(self._tok.encode(text, add_special_tokens=False).ids)
+
+
+_estimators: Dict[str, object] = {}
+_lock = threading.Lock()
+
+
+def get_estimator(spec: Optional[str] = None):
+    """Estimator for a tokenizer spec: chars:<cpt>, tiktoken:<encoding> or hf:<tokenizer.json>.
+
+    Defaults to $TOKEN_ESTIMATOR or chars:4. A local tokenizer that cannot be
+    loaded falls back to the char approximation rather than failing the run.
+    """
+    spec = spec or os.getenv("TOKEN_ESTIMATOR", "chars:4")
+    with _lock:
+        est = _estimators.get(spec)
+    if est is not None:
+        return est
+    kind, _, arg = spec.partition(":")
+    try:
+        if kind == "tiktoken":
+            est = TiktokenEstimator(arg or "cl100k_base")
+        elif kind == "hf":
+            est = HFTokenizerEstimator(arg)
+        elif kind == "chars":
+            est = CharEstimator(float(arg or 4))
+        else:
+            raise RuntimeError(f"Unknown tokenizer spec: {spec}")
+    except (RuntimeError, ValueError, OSError):
+        est = CharEstimator()
+    with _lock:
+        _estimators.setdefault(spec, est)
+        return _estimators[spec]
+
+
+def count_messages(estimator, messages: List[Dict[str, str]]) -> int:
+    return sum(estimator.count(m.get("content") or "") + PER_MESSAGE_OVERHEAD for m in messages) + 2
+
+
+class TokenBudget:
+    """Prompt budget for one model: context window minus output reservation and margin."""
+
+    def __init__(self, context_tokens: int, max_output_tokens: int, estimator=None) -> None:
+        self.context_tokens = context_tokens
+        self.max_output_tokens = max_output_tokens
+        self.estimator = estimator or get_estimator()
+        margin = max(256, int(context_tokens * SAFETY_MARGIN))
+        self.prompt_tokens = max(0, context_tokens - max_output_tokens - margin)
+
+    def count(self, text: str) -> int:
+        return self.estimator.count(text)
+
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        return count_messages(self.estimator, messages)
+
+
+def budget_for(spec: Optional[Dict], max_output_tokens: int) -> TokenBudget:
+    """TokenBudget from a model spec (`context_tokens`, `tokenizer` keys in the models YAML)."""
+    spec = spec or {}
+    context = int(spec.get("context_tokens") or env_int("CONTEXT_TOKENS", 32768))
+    return TokenBudget(context, max_output_tokens, get_estimator(spec.get("tokenizer")))
+
+
+def truncate_text(text: str, keep_tokens: int, estimator, keep: str) -> str:
+    """Cut text to about keep_tokens, at line boundaries where possible."""
+    if keep_tokens <= 0:
+        return ""
+    total = estimator.count(text)
+    if total <= keep_tokens:
+        return text
+    chars = int(len(text) * keep_tokens / total)
+    # Iterate a couple of times; token density varies across the text
+    for _ in range(4):
+        if keep == "both":
+            head = text[: chars * 2 // 3]
+            tail = text[len(text) - chars // 3 :]
+            head = head[: head.rfind("\n") + 1] or head
+            tail = tail[tail.find("\n") + 1 :] if "\n" in tail else tail
+            out = f"{head}[... {len(text) - len(head) - len(tail)} chars truncated ...]\n{tail}"
+        else:
+            head = text[:chars]
+            head = head[: head.rfind("\n") + 1] or head
+            out = f"{head}[... {len(text) - len(head)} chars truncated]"
+        over = estimator.count(out) - keep_tokens
+        if over <= 0:
+            return out
+        chars = max(0, chars - int(over * len(text) / total) - 16)
+    return out if estimator.count(out) <= keep_tokens else ""
+
+
+def fit_sections(sections: List[Dict], budget_tokens: int, estimator, sep: str = "\n\n") -> Tuple[str, Dict]:
+    """Join prompt sections, trimming the lowest-priority ones until the result fits.
+
+    Each section is {"name", "text", "priority", "trim"} where a lower priority
+    is trimmed first and trim is "tail" (keep the head), "both" (keep head and
+    tail, e.g. issue text with a trailing traceback), or "none" (never cut).
+    Sections cut to nothing are dropped. Returns (text, report).
+    """
+    texts = [s["text"] for s in sections]
+    sep_cost = estimator.count(sep) * max(0, len(sections) - 1)
+    costs = [estimator.count(t) for t in texts]
+    trimmed: Dict[str, int] = {}
+    order = sorted(range(len(sections)), key=lambda i: sections[i].get("priority", 0))
+    for i in order:
+        over = sum(costs) + sep_cost - budget_tokens
+        if over <= 0:
+            break
+        if sections[i].get("trim", "tail") == "none" or not texts[i]:
+            continue
+        keep = max(0, costs[i] - over)
+        new = truncate_text(texts[i], keep, estimator, sections[i].get("trim", "tail"))
+        trimmed[sections[i].get("name", str(i))] = costs[i] - estimator.count(new)
+        texts[i] = new
+        costs[i] = estimator.count(new)
+    out = sep.join(t for t in texts if t)
+    report = {
+        "est_tokens": estimator.count(out),
+        "budget": budget_tokens,
+        "trimmed": trimmed,
+        "fits": estimator.count(out) <= budget_tokens,
+    }
+    return out, report
@@ -0,0 +1,121 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from harness.pricing import cost_usd
+from harness.status import current_task
+
+
+# Set per task by the orchestrator; hedge and sampling threads inherit it via contextvars.copy_context()
+_ledger: ContextVar[Optional["UsageLedger"]] = ContextVar("usage_ledger", default=None)
+# True while a layer re-sends a request that failed or was cut off (router failover, output escalation)
+_retry: ContextVar[bool] = ContextVar("usage_retry", default=False)
+
+TOKEN_KEYS = ("prompt_tokens", "completion_tokens", "cached_tokens")
+
+
+class UsageLedger:
+    """Every provider request of a run, one JSON line each in logs/usage.jsonl.
+
+    Rows carry the instance, attempt and stage of the task that sent the
+    request (from the status context), the backend that served it, prompt,
+    completion and cached tokens, and whether it was a hedge duplicate, a
+    retry or a batch reply. Per-backend totals are kept in memory for the
+    manifest.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        # Rewritten per run, like predictions.jsonl
+        self._f = open(path, "w")
+        self.totals: Dict[str, Dict[str, float]] = {}
+
+    def record(self, row: Dict) -> None:
+        line = json.dumps(row) + "\n"
+        with self._lock:
+            if self._f.closed:
+                # A hedge loser finishing after the run ended
+                return
+            self._f.write(line)
+            t = self.totals.setdefault(
+                row["backend"], {"requests": 0, "failed": 0, "hedges": 0, "retries": 0, **{k: 0.0 for k in TOKEN_KEYS}}
+            )
+            t["requests"] += 1
+            t["failed"] += int(not row["ok"])
+            t["hedges"] += int(row["hedge"])
+            t["retries"] += int(row["retry"])
+            for k in TOKEN_KEYS:
+                t[k] += row[k]
+
+    def close(self) -> None:
+        with self._lock:
+            self._f.close()
+
+    def summary(self, prices: Dict[str, Dict[str, float]]) -> Dict:
+        """Per-backend totals with USD cost (None when the backend has no price)."""
+        with self._lock:
+            totals = {k: dict(v) for k, v in self.totals.items()}
+        cost = 0.0
+        for backend, t in totals.items():
+            t["cost_usd"] = cost_usd(prices, backend, t["prompt_tokens"], t["completion_tokens"], t["cached_tokens"])
+            cost += t["cost_usd"] or 0.0
+        return {
+            "backends": totals,
+            "cost_usd": round(cost, 6),
+            "unpriced": sorted(b for b, t in totals.items() if t["cost_usd"] is None),
+        }
+
+
+@contextmanager
+def bind(ledger: Optional[UsageLedger]):
+    token = _ledger.set(ledger)
+    try:
+        yield
+    finally:
+        _ledger.reset(token)
+
+
+@contextmanager
+def retrying():
+    token = _retry.set(True)
+    try:
+        yield
+    finally:
+        _retry.reset(token)
+
+
+def record_call(
+    backend: Optional[str],
+    meta: Optional[Dict],
+    ok: bool = True,
+    hedge: bool = False,
+    batch: bool = False,
+    error: Optional[str] = None,
+) -> None:
+    """Log one provider request to the current task's ledger; a no-op outside a run."""
+    ledger = _ledger.get()
+    if ledger is None:
+        return
+    meta = meta or {}
+    task = current_task() or {}
+    row = {
+        "ts": round(time.time(), 3),
+        "instance_id": task.get("instance_id"),
+        "model": task.get("model"),
+        "backend": backend or task.get("model"),
+        "attempt": task.get("attempt"),
+        "stage": task.get("stage"),
+        "ok": ok,
+        "hedge": hedge,
+        "retry": _retry.get(),
+        "batch": batch,
+        "elapsed": round(float(meta.get("elapsed") or 0.0), 3),
+        **{k: float(meta.get(k) or 0.0) for k in TOKEN_KEYS},
+    }
+    if error:
+        row["error"] = error[:200]
+    ledger.record(row)
@@ -0,0 +1,394 @@
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from math import comb
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from harness.pricing import cost_usd
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    ingested INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS predictions (
+    source TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    model TEXT NOT NULL,
+    instance_id TEXT NOT NULL,
+    status TEXT,
+    has_patch INTEGER,
+    prompt_tokens REAL,
+    completion_tokens REAL,
+    total_tokens REAL,
+    elapsed REAL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS attempts (
+    source TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    model TEXT NOT NULL,
+    instance_id TEXT NOT NULL,
+    attempt_index INTEGER,
+    seed INTEGER,
+    status TEXT,
+    prompt_tokens REAL,
+    completion_tokens REAL,
+    total_tokens REAL,
+    elapsed REAL,
+    error TEXT,
+    ts INTEGER
+);
+CREATE TABLE IF NOT EXISTS eval_results (
+    source TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    model TEXT NOT NULL,
+    instance_id TEXT NOT NULL,
+    verdict TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS calls (
+    source TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    model TEXT NOT NULL,
+    backend TEXT,
+    instance_id TEXT,
+    attempt INTEGER,
+    stage TEXT,
+    ok INTEGER,
+    hedge INTEGER,
+    retry INTEGER,
+    batch INTEGER,
+    prompt_tokens REAL,
+    completion_tokens REAL,
+    cached_tokens REAL,
+    elapsed REAL,
+    ts REAL
+);
+CREATE INDEX IF NOT EXISTS ix_pred_model ON predictions(model, run_id);
+CREATE INDEX IF NOT EXISTS ix_pred_source ON predictions(source);
+CREATE INDEX IF NOT EXISTS ix_att_model ON attempts(model, run_id);
+CREATE INDEX IF NOT EXISTS ix_att_source ON attempts(source);
+CREATE INDEX IF NOT EXISTS ix_eval_model ON eval_results(model, instance_id);
+CREATE INDEX IF NOT EXISTS ix_eval_source ON eval_results(source);
+CREATE INDEX IF NOT EXISTS ix_calls_model ON calls(model, run_id);
+CREATE INDEX IF NOT EXISTS ix_calls_source ON calls(source);
+"""
+
+TABLES = ("predictions", "attempts", "eval_results", "calls")
+
+
+def default_db_path() -> str:
+    return os.getenv("WAREHOUSE_DB", ".cache/warehouse.sqlite")
+
+
+def connect(db_path: Optional[str] = None) -> sqlite3.Connection:
+    path = db_path or default_db_path()
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _jsonl(path: Path):
+    with open(path, "r") as f:
+        for ln in f:
+            ln = ln.strip()
+            if ln:
+                yield json.loads(ln)
+
+
+def _usage_cols(usage: Dict) -> tuple:
+    usage = usage or {}
+    return (
+        usage.get("prompt_tokens"),
+        usage.get("completion_tokens"),
+        usage.get("total_tokens"),
+        usage.get("elapsed"),
+        usage.get("error"),
+    )
+
+
+def _ingest_predictions(conn, source: str, path: Path) -> int:
+    run_id = path.parent.name
+    rows = [
+        (source, run_id, r.get("model_name_or_path", ""), r.get("instance_id", ""), r.get("status"),
+         1 if r.get("model_patch") else 0, *_usage_cols(r.get("usage")))
+        for r in _jsonl(path)
+    ]
+    conn.executemany("INSERT INTO predictions VALUES (?,?,?,?,?,?,?,?,?,?,?)", rows)
+    return len(rows)
+
+
+def _ingest_attempts(conn, source: str, path: Path) -> int:
+    run_id = path.parent.parent.name
+    rows = [
+        (source, run_id, f"{r.get('provider')}:{r.get('model')}", r.get("instance_id", ""),
+         r.get("attempt_index"), r.get("seed"), r.get("status"), *_usage_cols(r.get("usage")), r.get("ts"))
+        for r in _jsonl(path)
+    ]
+    conn.executemany("INSERT INTO attempts VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)", rows)
+    return len(rows)
+
+
+def _ingest_usage(conn, source: str, path: Path) -> int:
+    run_id = path.parent.parent.name
+    rows = [
+        (source, run_id, r.get("model") or "", r.get("backend"), r.get("instance_id"), r.get("attempt"), r.get("stage"),
+         int(bool(r.get("ok"))), int(bool(r.get("hedge"))), int(bool(r.get("retry"))), int(bool(r.get("batch"))),
+         r.get("prompt_tokens"), r.get("completion_tokens"), r.get("cached_tokens"), r.get("elapsed"), r.get("ts"))
+        for r in _jsonl(path)
+    ]
+    conn.executemany("INSERT INTO calls VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)", rows)
+    return len(rows)
+
+
+def _ingest_verdicts(conn, source: str, path: Path) -> int:
+    # runs/<run_id>/eval/verdicts.jsonl from scripts/eval_pipeline.py
+    run_id = path.parent.parent.name
+    names = {"resolved": "resolved", "unresolved": "unresolved", "empty_patch": "empty_patch"}
+    rows = [
+        (source, run_id, r.get("model_name_or_path") or "", r["instance_id"], names.get(r.get("verdict"), "error"))
+        for r in _jsonl(path)
+    ]
+    conn.executemany("INSERT INTO eval_results VALUES (?,?,?,?,?)", rows)
+    return len(rows)
+
+
+def parse_report_name(path: Path) -> tuple:
+    """Split an evaluator report name `<model>.<run_id>.json` into (model, run_id).
+
+    Model names contain dots (GLM-4.5) while run ids do not, so split on the
+    last dot; `__` in the model part maps back to `/`.
+    """
+    stem = path.name[: -len(".json")]
+    model, _, run_id = stem.rpartition(".")
+    return model.replace("__", "/"), run_id
+
+
+def _ingest_report(conn, source: str, path: Path) -> int:
+    obj = json.loads(path.read_text())
+    model, run_id = parse_report_name(path)
+    # Submitted-but-never-run ids carry no verdict and are left out
+    verdicts: Dict[str, str] = {}
+    for key, verdict in (
+        ("unresolved_ids", "unresolved"),
+        ("error_ids", "error"),
+        ("empty_patch_ids", "empty_patch"),
+        ("resolved_ids", "resolved"),
+    ):
+        for iid in obj.get(key, []):
+            verdicts[iid] = verdict
+    rows = [(source, run_id, model, iid, v) for iid, v in verdicts.items()]
+    conn.executemany("INSERT INTO eval_results VALUES (?,?,?,?,?)", rows)
+    return len(rows)
+
+
+def _looks_like_report(path: Path) -> bool:
+    try:
+        obj = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return False
+    return isinstance(obj, dict) and "resolved_ids" in obj and "submitted_ids" in obj
+
+
+def discover(root: str = ".") -> List[tuple]:
+    """Find ingestible files under `root` as (kind, path) pairs."""
+    base = Path(root)
+    found = []
+    for p in sorted(base.glob("runs/*/predictions.jsonl")):
+        found.append(("predictions", p))
+    for p in sorted(base.glob("runs/*/logs/attempts.jsonl")):
+        found.append(("attempts", p))
+    for p in sorted(base.glob("runs/*/logs/usage.jsonl")):
+        found.append(("usage", p))
+    for p in sorted(base.glob("runs/*/eval/verdicts.jsonl")):
+        found.append(("verdicts", p))
+    for name in sorted(glob.glob(str(base / "*.json"))):
+        p = Path(name)
+        if _looks_like_report(p):
+            found.append(("report", p))
+    return found
+
+
+INGESTERS = {
+    "predictions": _ingest_predictions,
+    "attempts": _ingest_attempts,
+    "report": _ingest_report,
+    "usage": _ingest_usage,
+    "verdicts": _ingest_verdicts,
+}
+
+
+def ingest(conn: sqlite3.Connection, root: str = ".") -> Dict[str, int]:
+    """Incrementally load runs and evaluator reports; unchanged files are skipped.
+
+    Each file is keyed by its content hash: a changed file has its old rows
+    replaced, an unchanged one costs only a hash. Rows of files under `root`
+    that no longer exist (deleted runs, removed reports) are purged.
+    """
+    stats = {"scanned": 0, "ingested": 0, "skipped": 0, "rows": 0, "purged": 0}
+    seen = set()
+    for kind, path in discover(root):
+        stats["scanned"] += 1
+        source = str(path.resolve())
+        seen.add(source)
+        sha = _sha256(path)
+        row = conn.execute("SELECT sha256 FROM files WHERE path = ?", (source,)).fetchone()
+        if row and row["sha256"] == sha:
+            stats["skipped"] += 1
+            continue
+        with conn:
+            for table in TABLES:
+                conn.execute(f"DELETE FROM {table} WHERE source = ?", (source,))
+            n = INGESTERS[kind](conn, source, path)
+            conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?,?,?,?,?)",
+                (source, sha, kind, n, int(time.time())),
+            )
+        stats["ingested"] += 1
+        stats["rows"] += n
+    prefix = str(Path(root).resolve()).rstrip(os.sep) + os.sep
+    for (source,) in conn.execute("SELECT path FROM files").fetchall():
+        if source.startswith(prefix) and source not in seen:
+            with conn:
+                for table in TABLES:
+                    conn.execute(f"DELETE FROM {table} WHERE source = ?", (source,))
+                conn.execute("DELETE FROM files WHERE path = ?", (source,))
+            stats["purged"] += 1
+    return stats
+
+
+def model_summary(conn: sqlite3.Connection, run_like: str = "%") -> List[Dict]:
+    """Per-model resolve rate, latency and token usage across all runs."""
+    q = """
+    WITH att AS (
+        SELECT model, COUNT(*) AS attempts, COUNT(DISTINCT run_id) AS runs,
+               AVG(CASE WHEN status = 'ok' THEN 1.0 ELSE 0.0 END) AS ok_rate,
+               AVG(CASE WHEN error IS NOT NULL THEN 1.0 ELSE 0.0 END) AS error_rate,
+               AVG(elapsed) AS avg_latency_s, AVG(prompt_tokens) AS avg_prompt_tokens,
+               AVG(completion_tokens) AS avg_completion_tokens, SUM(total_tokens) AS total_tokens
+        FROM attempts WHERE run_id LIKE ? GROUP BY model
+    ), ev AS (
+        SELECT model, COUNT(*) AS evaluated,
+               SUM(CASE WHEN verdict = 'resolved' THEN 1 ELSE 0 END) AS resolved
+        FROM eval_results WHERE run_id LIKE ? GROUP BY model
+    ), models AS (SELECT model FROM att UNION SELECT model FROM ev)
+    SELECT m.model, att.runs, att.attempts, att.ok_rate, att.error_rate, att.avg_latency_s,
+           att.avg_prompt_tokens, att.avg_completion_tokens, att.total_tokens,
+           ev.evaluated, ev.resolved,
+           CASE WHEN ev.evaluated > 0 THEN 1.0 * ev.resolved / ev.evaluated END AS resolve_rate
+    FROM models m LEFT JOIN att ON att.model = m.model LEFT JOIN ev ON ev.model = m.model
+    ORDER BY resolve_rate DESC, m.model
+    """
+    return [dict(r) for r in conn.execute(q, (run_like, run_like))]
+
+
+def _pass_at_k(n: int, c: int, k: int) -> float:
+    # Unbiased estimator (Chen et al.): 1 - C(n-c, k) / C(n, k)
+    if n - c < k:
+        return 1.0
+    return 1.0 - comb(n - c, k) / comb(n, k)
+
+
+def leaderboard(conn: sqlite3.Connection, k: int = 2, run_like: str = "%") -> List[Dict]:
+    """pass@1 / pass@k per model from evaluator verdicts.
+
+    Each evaluated (run, instance) counts as one sample, so pass@k is taken over
+    repeated runs of the same instance; instances with fewer than k samples use
+    all the samples they have.
+    """
+    q = """
+    SELECT model, instance_id, COUNT(*) AS n,
+           SUM(CASE WHEN verdict = 'resolved' THEN 1 ELSE 0 END) AS c
+    FROM eval_results WHERE run_id LIKE ?
+    GROUP BY model, instance_id
+    """
+    by_model: Dict[str, List[tuple]] = {}
+    for r in conn.execute(q, (run_like,)):
+        by_model.setdefault(r["model"], []).append((r["n"], r["c"]))
+    out = []
+    for model, cells in by_model.items():
+        p1 = sum(c / n for n, c in cells) / len(cells)
+        pk = sum(_pass_at_k(n, c, min(k, n)) for n, c in cells) / len(cells)
+        out.append(
+            {
+                "model": model,
+                "instances": len(cells),
+                "samples": sum(n for n, _ in cells),
+                "pass@1": p1,
+                f"pass@{k}": pk,
+            }
+        )
+    out.sort(key=lambda r: (-r[f"pass@{k}"], -r["pass@1"], r["model"]))
+    return out
+
+
+def _per(value: Optional[float], n: int) -> Optional[float]:
+    return value / n if value is not None and n else None
+
+
+def cost_report(conn: sqlite3.Connection, prices: Dict[str, Dict[str, float]], run_like: str = "%") -> List[Dict]:
+    """Tokens and USD per attempt, per instance and per resolved instance, by (run, model).
+
+    Built from the per-request usage ledger (retries, hedges and failed calls
+    included), priced per serving backend, joined with evaluator verdicts.
+    Cost is None when a backend that used tokens has no price.
+    """
+    q = """
+    SELECT run_id, model, backend, COUNT(*) AS requests, SUM(1 - ok) AS failed, SUM(hedge) AS hedges,
+           SUM(retry) AS retries, SUM(prompt_tokens) AS prompt_tokens, SUM(completion_tokens) AS completion_tokens,
+           SUM(cached_tokens) AS cached_tokens
+    FROM calls WHERE run_id LIKE ? GROUP BY run_id, model, backend
+    """
+    out: Dict[tuple, Dict] = {}
+    for r in conn.execute(q, (run_like,)):
+        row = out.setdefault(
+            (r["run_id"], r["model"]),
+            {"run_id": r["run_id"], "model": r["model"], "requests": 0, "failed": 0, "hedges": 0, "retries": 0,
+             "prompt_tokens": 0.0, "completion_tokens": 0.0, "cached_tokens": 0.0, "cost_usd": 0.0},
+        )
+        for k in ("requests", "failed", "hedges", "retries", "prompt_tokens", "completion_tokens", "cached_tokens"):
+            row[k] += r[k] or 0
+        cost = cost_usd(prices, r["backend"], r["prompt_tokens"] or 0, r["completion_tokens"] or 0, r["cached_tokens"] or 0)
+        if cost is None and (r["prompt_tokens"] or r["completion_tokens"]):
+            row["cost_usd"] = None
+        elif row["cost_usd"] is not None:
+            row["cost_usd"] += cost or 0.0
+    counts = """
+    SELECT run_id, model, COUNT(DISTINCT instance_id) AS instances,
+           COUNT(DISTINCT instance_id || '#' || attempt) AS attempts
+    FROM calls WHERE run_id LIKE ? GROUP BY run_id, model
+    """
+    for r in conn.execute(counts, (run_like,)):
+        out[(r["run_id"], r["model"])].update({"instances": r["instances"], "attempts": r["attempts"]})
+    resolved = """
+    SELECT run_id, model, COUNT(DISTINCT instance_id) AS resolved
+    FROM eval_results WHERE run_id LIKE ? AND verdict = 'resolved' GROUP BY run_id, model
+    """
+    res = {(r["run_id"], r["model"]): r["resolved"] for r in conn.execute(resolved, (run_like,))}
+    rows = []
+    for key, row in sorted(out.items()):
+        row["resolved"] = res.get(key, 0)
+        tokens = row["prompt_tokens"] + row["completion_tokens"]
+        for unit, n in (("attempt", row["attempts"]), ("instance", row["instances"]), ("resolved", row["resolved"])):
+            row[f"tokens_per_{unit}"] = _per(tokens, n)
+            row[f"usd_per_{unit}"] = _per(row["cost_usd"], n)
+        rows.append(row)
+    return rows
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Local stand-in for an OpenAI-style batch API, for testing `--batch` offline.
+
+Serves POST /v1/files, POST /v1/batches, GET /v1/batches/<id>,
+GET /v1/files/<id>/content and POST /v1/chat/completions (for interactive
+re-asks and fallbacks). Replies come from the mock provider, so MOCK_RESPONSE
+etc. apply. A batch completes --delay seconds after creation; --fail_rate of
+its requests come back as errors.
+
+Point a provider at it, e.g.:
+  CHUTES_BASE_URL=http://127.0.0.1:8765/v1/chat/completions CHUTES_API_KEY=x \\
+    python3 scripts/run_predictions.py --batch ...
+"""
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from harness.providers.mock import MockChat
+
+
+FILES = {}
+BATCHES = {}
+_ids = itertools.count(1)
+_lock = threading.Lock()
+
+
+def _completion(body):
+    text, meta = MockChat(model=body.get("model", "mock")).chat(
+        body.get("messages") or [], max_output_tokens=body.get("max_tokens", 2000), seed=body.get("seed")
+    )
+    return {
+        "id": f"chatcmpl-{next(_ids)}",
+        "object": "chat.completion",
+        "model": body.get("model"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": meta["finish_reason"]}],
+        "usage": {
+            "prompt_tokens": int(meta["prompt_tokens"]),
+            "completion_tokens": int(meta["completion_tokens"]),
+            "total_tokens": int(meta["total_tokens"]),
+        },
+    }
+
+
+def _run_batch(batch_id, fail_rate):
+    batch = BATCHES[batch_id]
+    out = []
+    for ln in FILES[batch["input_file_id"]].decode("utf-8").splitlines():
+        if not ln.strip():
+            continue
+        req = json.loads(ln)
+        if random.random() < fail_rate:
+            out.append({"custom_id": req["custom_id"], "response": {"status_code": 500, "body": {"error": "mock batch error"}}, "error": None})
+        else:
+            out.append({"custom_id": req["custom_id"], "response": {"status_code": 200, "body": _completion(req["body"])}, "error": None})
+    with _lock:
+        file_id = f"file-{next(_ids)}"
+        FILES[file_id] = "".join(json.dumps(r) + "\n" for r in out).encode("utf-8")
+        batch.update({"status": "completed", "output_file_id": file_id, "completed_at": int(time.time())})
+        batch["request_counts"] = {
+            "total": len(out),
+            "completed": sum(1 for r in out if r["response"]["status_code"] == 200),
+            "failed": sum(1 for r in out if r["response"]["status_code"] != 200),
+        }
+
+
+class Handler(BaseHTTPRequestHandler):
+    # Keep-alive, like real providers
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    delay = 2.0
+    fail_rate = 0.0
+
+    def _send(self, code, obj=None, raw=None):
+        data = raw if raw is not None else json.dumps(obj).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if self.path == "/v1/files":
+            msg = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body)
+            parts = {p.get_param("name", header="content-disposition"): p.get_payload(decode=True) for p in msg.iter_parts()}
+            with _lock:
+                file_id = f"file-{next(_ids)}"
+                FILES[file_id] = parts["file"]
+            self._send(200, {"id": file_id, "object": "file", "purpose": "batch", "bytes": len(FILES[file_id])})
+        elif self.path == "/v1/batches":
+            req = json.loads(body)
+            if req.get("input_file_id") not in FILES:
+                self._send(404, {"error": {"message": "unknown input_file_id"}})
+                return
+            with _lock:
+                batch_id = f"batch_{next(_ids)}"
+                BATCHES[batch_id] = {
+                    "id": batch_id,
+                    "object": "batch",
+                    "endpoint": req.get("endpoint"),
+                    "input_file_id": req["input_file_id"],
+                    "status": "in_progress",
+                    "created_at": int(time.time()),
+                }
+            threading.Timer(self.delay, _run_batch, args=(batch_id, self.fail_rate)).start()
+            self._send(200, BATCHES[batch_id])
+        elif self.path == "/v1/chat/completions":
+            self._send(200, _completion(json.loads(body)))
+        else:
+            self._send(404, {"error": {"message": f"no route {self.path}"}})
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        if len(parts) == 3 and parts[1] == "batches" and parts[2] in BATCHES:
+            self._send(200, BATCHES[parts[2]])
+        elif len(parts) == 4 and parts[1] == "files" and parts[3] == "content" and parts[2] in FILES:
+            self._send(200, raw=FILES[parts[2]])
+        else:
+            self._send(404, {"error": {"message": f"no route {self.path}"}})
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--delay", type=float, default=2.0, help="seconds before a batch completes")
+    ap.add_argument("--fail_rate", type=float, default=0.0, help="fraction of batch requests returned as errors")
+    args = ap.parse_args()
+    Handler.delay = args.delay
+    Handler.fail_rate = args.fail_rate
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"batch stand-in on http://{args.host}:{args.port}/v1", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
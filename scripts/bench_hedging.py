@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Tail-latency benchmark for hedged provider calls.
+
+Runs `orchestrate_predictions` against the offline mock provider, with a
+fraction of calls turned into stragglers (MOCK_STRAGGLER_RATE /
+MOCK_STRAGGLER_LATENCY), once with hedging off and once on, each in a fresh
+subprocess and scratch directory. Prints per-attempt latency percentiles and
+the duplicate requests hedging cost.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _child(args) -> None:
+    from harness.orchestrator import orchestrate_predictions
+
+    orchestrate_predictions(
+        run_id="bench",
+        instances_path=args.instances,
+        model_specs=[{"provider": "mock", "model": "mock/bench", "seed": 42}],
+        attempts=1,
+        hedge=args.hedge,
+    )
+    metrics = json.loads(Path("runs/bench/manifest.json").read_text())["metrics"]
+    print(json.dumps({"latency": metrics["latency"], "quota": metrics["quota"]}))
+
+
+def _make_dataset(root: Path, n: int) -> Path:
+    ds = root / "dataset.jsonl"
+    inst = root / "instances.jsonl"
+    with open(ds, "w") as fd, open(inst, "w") as fi:
+        for i in range(n):
+            iid = f"bench__bench-{i}"
+            fd.write(json.dumps({"instance_id": iid, "repo": "", "problem_statement": "lorem ipsum"}) + "\n")
+            fi.write(json.dumps({"instance_id": iid}) + "\n")
+    return inst
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tasks", type=int, default=400)
+    ap.add_argument("--workers", type=int, default=16)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--straggler_rate", type=float, default=0.05)
+    ap.add_argument("--straggler_latency", type=float, default=2.0)
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--hedge", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--instances", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        _child(args)
+        return
+
+    print(f"{'hedging':>8} {'p50_s':>7} {'p95_s':>7} {'p99_s':>7} {'max_s':>7} {'hedged':>7} {'wins':>5} {'requests':>9}")
+    for hedge in (False, True):
+        with tempfile.TemporaryDirectory(prefix="bench_hedge_") as td:
+            root = Path(td)
+            inst = _make_dataset(root, args.tasks)
+            env = dict(os.environ)
+            env.update({
+                "PYTHONPATH": str(REPO_ROOT),
+                "DATASET_NAME": str(root / "dataset.jsonl"),
+                "WORKERS": str(args.workers),
+                "MOCK_LATENCY": str(args.latency),
+                "MOCK_STRAGGLER_RATE": str(args.straggler_rate),
+                "MOCK_STRAGGLER_LATENCY": str(args.straggler_latency),
+                "REPO_HINTS": "0",
+                "PREFLIGHT_APPLY": "0",
+            })
+            cmd = [sys.executable, str(Path(__file__).resolve()), "--child", "--instances", str(inst)]
+            if hedge:
+                cmd.append("--hedge")
+            proc = subprocess.run(cmd, cwd=td, env=env, capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(proc.stderr, file=sys.stderr)
+                sys.exit(proc.returncode)
+            out = json.loads(proc.stdout.strip().splitlines()[-1])
+            lat = out["latency"]
+            model = next(iter(lat["models"].values()))
+            requests = out["quota"].get("mock", {}).get("requests", 0)
+            print(
+                f"{'on' if hedge else 'off':>8} {lat['p50_s']:>7.3f} {lat['p95_s']:>7.3f} {lat['p99_s']:>7.3f} "
+                f"{lat['max_s']:>7.3f} {model['hedged']:>7} {model['hedge_wins']:>5} {requests:>9}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Peak-RSS benchmark for streaming task submission.
+
+Generates a synthetic local dataset (DATASET_NAME=<file>.jsonl) and runs
+`orchestrate_predictions` against the offline mock provider for increasing
+task counts, each in a fresh subprocess. With bounded submission the peak RSS
+should stay roughly flat; `--eager` preloads every record up front (the old
+behaviour) for comparison.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _child(args) -> None:
+    from harness.orchestrator import orchestrate_predictions
+    from harness.records import open_record_source
+
+    if args.eager:
+        ids = [json.loads(ln)["instance_id"] for ln in open(args.instances) if ln.strip()]
+        src = open_record_source(ids)
+        held = {iid: src.get(iid) for iid in ids}  # noqa: F841 - keep resident
+    orchestrate_predictions(
+        run_id="bench",
+        instances_path=args.instances,
+        model_specs=[{"provider": "mock", "model": "mock/bench", "seed": 42}],
+        attempts=1,
+    )
+    print(json.dumps({"max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+
+
+def _make_dataset(root: Path, n: int, body_bytes: int) -> Path:
+    ds = root / "dataset.jsonl"
+    inst = root / "instances.jsonl"
+    body = ("lorem ipsum dolor sit amet " * (body_bytes // 27 + 1))[:body_bytes]
+    with open(ds, "w") as fd, open(inst, "w") as fi:
+        for i in range(n):
+            iid = f"bench__bench-{i}"
+            fd.write(json.dumps({"instance_id": iid, "repo": "", "problem_statement": body}) + "\n")
+            fi.write(json.dumps({"instance_id": iid}) + "\n")
+    return inst
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--counts", default="200,2000,10000")
+    ap.add_argument("--body_bytes", type=int, default=20000)
+    ap.add_argument("--eager", action="store_true")
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--instances", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        _child(args)
+        return
+
+    print(f"{'tasks':>8} {'peak_rss_mb':>12}")
+    for n in [int(x) for x in args.counts.split(",") if x]:
+        with tempfile.TemporaryDirectory(prefix="bench_mem_") as td:
+            root = Path(td)
+            inst = _make_dataset(root, n, args.body_bytes)
+            env = dict(os.environ)
+            env.update({
+                "PYTHONPATH": str(REPO_ROOT),
+                "DATASET_NAME": str(root / "dataset.jsonl"),
+                "REPO_HINTS": "0",
+                "PREFLIGHT_APPLY": "0",
+            })
+            cmd = [sys.executable, str(Path(__file__).resolve()), "--child", "--instances", str(inst)]
+            if args.eager:
+                cmd.append("--eager")
+            proc = subprocess.run(cmd, cwd=td, env=env, capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(proc.stderr, file=sys.stderr)
+                sys.exit(proc.returncode)
+            rss = json.loads(proc.stdout.strip().splitlines()[-1])["max_rss_kb"]
+            print(f"{n:>8} {rss / 1024:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
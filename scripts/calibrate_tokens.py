@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+import argparse
+import glob
+import json
+from typing import Dict
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare estimated vs provider-reported prompt tokens per model")
+    ap.add_argument("paths", nargs="*", default=None, help="attempts.jsonl files (default: runs/*/logs/attempts.jsonl)")
+    args = ap.parse_args()
+
+    paths = args.paths or sorted(glob.glob("runs/*/logs/attempts.jsonl"))
+    by_model: Dict[str, Dict] = {}
+    for path in paths:
+        with open(path) as f:
+            for ln in f:
+                ln = ln.strip()
+                if not ln:
+                    continue
+                row = json.loads(ln)
+                u = row.get("usage") or {}
+                est, rep = u.get("est_prompt_tokens"), u.get("prompt_tokens")
+                if not est or not rep:
+                    continue
+                m = by_model.setdefault(
+                    f"{row.get('provider')}:{row.get('model')}", {"rows": 0, "est": 0.0, "reported": 0.0, "estimator": u.get("estimator")}
+                )
+                m["rows"] += 1
+                m["est"] += est
+                m["reported"] += rep
+
+    if not by_model:
+        print("No attempts with both estimated and reported prompt tokens")
+        return
+    print(f"{'model':60} {'rows':>6} {'est/rep':>8}  suggestion")
+    for model, m in sorted(by_model.items()):
+        ratio = m["est"] / m["reported"]
+        hint = ""
+        est_name = m["estimator"] or ""
+        if est_name.startswith("chars:"):
+            # Scaling chars-per-token by est/reported makes the estimate match on average
+            cpt = float(est_name.split(":", 1)[1]) * ratio
+            hint = f"tokenizer: chars:{cpt:.2f}"
+        print(f"{model:60} {m['rows']:>6} {ratio:>8.3f}  {hint}")
+
+
+if __name__ == "__main__":
+    main()
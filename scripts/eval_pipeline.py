@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import time
+from pathlib import Path
+
+from harness.eval_pipeline import EvalPipeline, follow_jsonl, summarize
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Evaluate predictions as they are written, with a patch-hash verdict cache")
+    ap.add_argument("predictions", help="Path to predictions.jsonl (may still be growing)")
+    ap.add_argument("--follow", action="store_true", help="Keep tailing until the run's manifest.json is written (exits at once on a finished run)")
+    ap.add_argument("--eval_cmd", default=None, help="Evaluator command template (default: $EVAL_CMD or SWE-bench run_evaluation)")
+    ap.add_argument("--idle_timeout", type=float, default=0.0, help="Stop following after this many idle seconds (0 = never)")
+    args = ap.parse_args()
+
+    pred = Path(args.predictions)
+    run_dir = pred.parent
+    manifest = run_dir / "manifest.json"
+    started = time.time()
+
+    def run_finished() -> bool:
+        # The orchestrator removes manifest.json when a run starts and writes it
+        # after the last prediction, so a manifest at least as new as the
+        # predictions means that run is over (even if it ended before we started)
+        if not args.follow:
+            return True
+        try:
+            return manifest.stat().st_mtime >= pred.stat().st_mtime
+        except FileNotFoundError:
+            return False
+
+    out_path = run_dir / "eval" / "verdicts.jsonl"
+    if out_path.exists():
+        out_path.unlink()
+    pipe = EvalPipeline(out_path, eval_cmd=args.eval_cmd)
+    stats = pipe.run(follow_jsonl(pred, run_finished, idle_timeout=args.idle_timeout))
+    report = summarize(out_path) if out_path.exists() else {}
+    (run_dir / "eval" / "report.json").write_text(json.dumps(report, indent=2))
+    print(json.dumps({"elapsed_s": round(time.time() - started, 2), **stats}))
+    for model, rep in sorted(report.items()):
+        print(f"{model}: resolved {rep['resolved_instances']}/{rep['submitted_instances']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import time
+from pathlib import Path
+
+from harness.local_eval import evaluate_predictions
+from harness.records import open_record_source
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Quick local FAIL_TO_PASS/PASS_TO_PASS check in cached envs (no Docker)")
+    ap.add_argument("predictions", help="Path to predictions.jsonl")
+    ap.add_argument("-o", "--output", default=None, help="Results JSONL (default: <run>/eval/local_results.jsonl)")
+    ap.add_argument("--workers", type=int, default=None, help="Process pool size (default: $LOCAL_EVAL_WORKERS or 4)")
+    ap.add_argument("--test_timeout", type=int, default=60, help="Per-test timeout in seconds")
+    ap.add_argument("--max_pass_to_pass", type=int, default=0, help="Cap PASS_TO_PASS tests per instance (0 = all)")
+    args = ap.parse_args()
+
+    preds = [json.loads(ln) for ln in open(args.predictions) if ln.strip()]
+    records = open_record_source({p["instance_id"] for p in preds})
+    out = Path(args.output or Path(args.predictions).parent / "eval" / "local_results.jsonl")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    t0 = time.time()
+    resolved = 0
+    with open(out, "w") as f:
+        for res in evaluate_predictions(preds, records, args.workers, args.test_timeout, args.max_pass_to_pass):
+            resolved += 1 if res.get("resolved_locally") else 0
+            f.write(json.dumps(res) + "\n")
+            print(f"{res['instance_id']} [{res.get('model_name_or_path')}]: {res['status']}"
+                  f" resolved_locally={res['resolved_locally']} ({res['duration_s']}s)")
+    print(f"Locally resolved {resolved}/{len(preds)} in {time.time() - t0:.1f}s -> {out}")
+
+
+if __name__ == "__main__":
+    main()
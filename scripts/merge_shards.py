@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+import argparse
+import sys
+
+from harness.sharding import merge_shards
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Merge and verify runs/<run_id>/shards/* into one run")
+    ap.add_argument("--run_id", required=True)
+    ap.add_argument("shard_dirs", nargs="*", help="Explicit shard directories (default: runs/<run_id>/shards/*-of-*)")
+    args = ap.parse_args()
+
+    try:
+        manifest = merge_shards(args.run_id, args.shard_dirs or None)
+    except RuntimeError as e:
+        print(f"Merge failed: {e}")
+        sys.exit(1)
+    print(
+        f"Merged {len(manifest['shards'])} shards: {manifest['predictions']} predictions, "
+        f"{manifest['attempt_rows']} attempt rows -> {manifest['predictions_path']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import sys
+from pathlib import Path
+import yaml
+
+from harness.config import get_workers_default
+from harness.orchestrator import load_instances_jsonl
+from harness.plan import check_budgets, format_plan, get_budget_defaults, plan_run
+
+
+def main():
+    default_cost, default_hours = get_budget_defaults()
+    ap = argparse.ArgumentParser(description="Estimate requests, tokens, cost and wall time of a run from past attempts.jsonl")
+    ap.add_argument("--instances", default="instances/i1_instances_lite.jsonl")
+    ap.add_argument("--models_config", default="config/models_i1.yaml")
+    ap.add_argument("--attempts", type=int, default=2)
+    ap.add_argument("--mode", choices=["patch","edit"], default="patch")
+    ap.add_argument("--workers", type=int, default=None, help="concurrent tasks (default: WORKERS)")
+    ap.add_argument("--max_cost_usd", type=float, default=default_cost, help="budget (default: PLAN_MAX_COST_USD)")
+    ap.add_argument("--max_hours", type=float, default=default_hours, help="wall-clock budget (default: PLAN_MAX_HOURS)")
+    ap.add_argument("--bootstrap", type=int, default=200, help="resampling rounds behind the p10/p50/p90 ranges")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    cfg = yaml.safe_load(Path(args.models_config).read_text())
+    plan = plan_run(
+        cfg.get("models", []),
+        len(load_instances_jsonl(args.instances)),
+        args.attempts,
+        args.mode,
+        args.workers or get_workers_default(),
+        rounds=args.bootstrap,
+    )
+    verdict, reasons = check_budgets(plan, args.max_cost_usd, args.max_hours)
+    if args.json:
+        print(json.dumps({**plan, "verdict": verdict, "reasons": reasons}, indent=2))
+    else:
+        print(format_plan(plan))
+        print(f"verdict: {verdict}")
+        for r in reasons:
+            print(f"  {r}")
+    sys.exit(2 if verdict == "refuse" else 0)
+
+
+if __name__ == "__main__":
+    main()
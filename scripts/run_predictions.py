@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
 import argparse
 import json
+import sys
 from pathlib import Path
 import yaml
 
-from harness.config import load_credentials_into_env
-from harness.orchestrator import orchestrate_predictions
+from harness.config import get_run_deadline_default, get_status_port_default, get_workers_default, load_credentials_into_env
+from harness.deadline import RunControl, install_signal_handlers
+from harness.orchestrator import load_instances_jsonl, orchestrate_predictions
+from harness.sharding import parse_shard
+from harness.status import serve_status
 
 
 def main():
@@ -17,11 +21,63 @@ def main():
     ap.add_argument("--temperature", type=float, default=0.2)
     ap.add_argument("--max_output_tokens", type=int, default=2000)
     ap.add_argument("--mode", choices=["patch","edit"], default="patch")
+    ap.add_argument(
+        "--adaptive_output_tokens",
+        action="store_true",
+        help="per-model max_output_tokens from past completions (OUTPUT_TOKENS_PERCENTILE) with one escalation on truncation",
+    )
+    ap.add_argument("--hedge", action="store_true", help="send a duplicate request once a call outlives the model's p95 latency")
+    ap.add_argument(
+        "--batch",
+        action="store_true",
+        help="patch mode: send first-turn requests through the provider's /v1/batches API; re-asks and retries run interactively",
+    )
+    ap.add_argument(
+        "--samples",
+        type=int,
+        default=1,
+        help="patch mode: candidates per attempt, from one request with `n` where supported; the best-ranked diff is kept",
+    )
+    ap.add_argument("--shard", default=None, help="i/N: run only partition i (0-based) of N; merge with scripts/merge_shards.py")
+    ap.add_argument(
+        "--plan",
+        action="store_true",
+        help="estimate the run first (see scripts/plan.py) and abort if the median breaks quota, PLAN_MAX_COST_USD or PLAN_MAX_HOURS",
+    )
+    ap.add_argument(
+        "--status_port",
+        type=int,
+        default=get_status_port_default(),
+        help="serve live run status as JSON on 127.0.0.1:<port>/status for scripts/status_top.py (default: STATUS_PORT; 0 = off)",
+    )
+    ap.add_argument(
+        "--deadline_s",
+        type=float,
+        default=get_run_deadline_default(),
+        help="stop the run after this many seconds, keeping finished work (default: RUN_DEADLINE_S; 0 = none). Ctrl-C drains, twice cancels",
+    )
     args = ap.parse_args()
 
     load_credentials_into_env()
     cfg = yaml.safe_load(Path(args.models_config).read_text())
     model_specs = cfg.get("models", [])
+    if args.plan:
+        from harness.plan import check_budgets, format_plan, get_budget_defaults, plan_run
+
+        n = len(load_instances_jsonl(args.instances))
+        if args.shard:
+            n = -(-n // parse_shard(args.shard)[1])
+        plan = plan_run(model_specs, n, args.attempts, args.mode, get_workers_default())
+        verdict, reasons = check_budgets(plan, *get_budget_defaults())
+        print(format_plan(plan))
+        for r in reasons:
+            print(f"plan {verdict}: {r}")
+        if verdict == "refuse":
+            sys.exit(2)
+    if args.status_port:
+        print(f"Status: {serve_status(args.status_port)}", flush=True)
+    control = RunControl(args.deadline_s)
+    install_signal_handlers(control)
     pred_path = orchestrate_predictions(
         run_id=args.run_id,
         instances_path=args.instances,
@@ -30,6 +86,12 @@ def main():
         temperature=args.temperature,
         max_output_tokens=args.max_output_tokens,
         mode=args.mode,
+        shard=parse_shard(args.shard) if args.shard else None,
+        adaptive_output_tokens=args.adaptive_output_tokens,
+        hedge=args.hedge,
+        batch=args.batch,
+        samples=args.samples,
+        control=control,
     )
     print(f"Predictions written: {pred_path}")
 
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import sys
+import time
+import urllib.request
+from typing import Dict, List
+
+
+def _fmt_s(s) -> str:
+    if s is None:
+        return "-"
+    s = int(s)
+    return f"{s // 3600}h{s % 3600 // 60:02d}m" if s >= 3600 else f"{s // 60}m{s % 60:02d}s"
+
+
+def _pct(x) -> str:
+    return "-" if x is None else f"{100 * x:.0f}%"
+
+
+def render(status: Dict) -> str:
+    lines: List[str] = [time.strftime("%H:%M:%S", time.localtime(status["ts"]))]
+    if not status["runs"]:
+        lines.append("no runs yet")
+    for run in status["runs"]:
+        t = run["tasks"]
+        lines.append("")
+        lines.append(
+            f"{run['run_id']} [{run['state']}]  {t['done']}/{t['total']} done, {t['running']} running on {run['workers']} workers  "
+            f"{run['tasks_per_min']:.1f} tasks/min  elapsed {_fmt_s(run['elapsed_s'])}  ETA {_fmt_s(run['eta_s'])}"
+        )
+        quota = ", ".join(f"{p} {'unlimited' if r is None else r}" for p, r in run["quota_remaining"].items())
+        lines.append(f"quota remaining: {quota}")
+        lines.append(f"{'model':<44} {'queued':>7} {'running':>7} {'done':>6} {'calls':>6} {'in-flight':>9} {'errors':>7} {'retries/task':>12}")
+        for name, m in run["models"].items():
+            retries = "-" if m["retries_per_task"] is None else f"{m['retries_per_task']:.2f}"
+            lines.append(
+                f"{name[:44]:<44} {m['queued']:>7} {m['running']:>7} {m['done']:>6} {m['calls']:>6} {m['calls_inflight']:>9} {_pct(m['error_rate']):>7} {retries:>12}"
+            )
+        if run["slowest"]:
+            lines.append("slowest in flight:")
+            for s in run["slowest"]:
+                attempt = "-" if s["attempt"] is None else s["attempt"] + 1
+                lines.append(f"  {_fmt_s(s['age_s']):>7}  {s['model'][:36]:<36} {s['instance_id'][:40]:<40} attempt {attempt}  {s['stage']} ({_fmt_s(s['stage_s'])})")
+    return "\n".join(lines)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="top-like view of a running orchestrator's status endpoint")
+    ap.add_argument("--url", default="http://127.0.0.1:8766/status")
+    ap.add_argument("--interval", type=float, default=2.0)
+    ap.add_argument("--once", action="store_true", help="print one snapshot and exit")
+    ap.add_argument("--json", action="store_true", help="raw JSON instead of the table (implies --once)")
+    args = ap.parse_args()
+    while True:
+        try:
+            with urllib.request.urlopen(args.url, timeout=5) as resp:
+                status = json.loads(resp.read())
+        except OSError as e:
+            if args.once or args.json:
+                print(f"status endpoint unreachable: {e}", file=sys.stderr)
+                sys.exit(1)
+            status = None
+        if args.json:
+            print(json.dumps(status, indent=2))
+            return
+        text = render(status) if status else f"waiting for {args.url} ..."
+        if args.once:
+            print(text)
+            return
+        sys.stdout.write("\033[H\033[2J" + text + "\n")
+        sys.stdout.flush()
+        try:
+            time.sleep(args.interval)
+        except KeyboardInterrupt:
+            return
+
+
+if __name__ == "__main__":
+    main()
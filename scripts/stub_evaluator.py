@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""Local stand-in for the SWE-bench evaluator (for pipeline testing, no Docker).
+
+Accepts the same flags the pipeline passes, sleeps STUB_EVAL_SECONDS, and
+writes `<model>.<run_id>.json` in --report_dir (default: cwd); a patch is "resolved" when it
+contains the STUB_RESOLVE_MARKER string (default: any added line).
+Example: EVAL_CMD="python scripts/stub_evaluator.py --predictions_path {predictions} --run_id {run_id} --report_dir {report_dir}"
+"""
+import argparse
+import json
+import os
+import time
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--predictions_path", required=True)
+    ap.add_argument("--run_id", required=True)
+    ap.add_argument("--dataset_name", default="")
+    ap.add_argument("--max_workers", default="1")
+    ap.add_argument("--instance_ids", nargs="*", default=None)
+    ap.add_argument("--report_dir", default=".")
+    args = ap.parse_args()
+
+    time.sleep(float(os.getenv("STUB_EVAL_SECONDS", "0.5")))
+    marker = os.getenv("STUB_RESOLVE_MARKER", "\n+")
+    reports = {}
+    with open(args.predictions_path) as f:
+        for ln in f:
+            if not ln.strip():
+                continue
+            row = json.loads(ln)
+            model = row.get("model_name_or_path", "model")
+            rep = reports.setdefault(model, {"submitted_ids": [], "resolved_ids": [], "unresolved_ids": [],
+                                             "error_ids": [], "empty_patch_ids": []})
+            iid = row["instance_id"]
+            rep["submitted_ids"].append(iid)
+            patch = row.get("model_patch") or ""
+            if not patch:
+                rep["empty_patch_ids"].append(iid)
+            elif marker in patch:
+                rep["resolved_ids"].append(iid)
+            else:
+                rep["unresolved_ids"].append(iid)
+    for model, rep in reports.items():
+        with open(os.path.join(args.report_dir, f"{model.replace('/', '__')}.{args.run_id}.json"), "w") as f:
+            json.dump(rep, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
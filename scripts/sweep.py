@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Run a models × temperatures × attempts × modes matrix as one job.
+
+Models come from --models_config (a models YAML) or, by default,
+temp_models.TRACKED_MODELS. Each cell writes its own runs/<sweep_id>__<cell>/;
+the sweep summary goes to runs/<sweep_id>/sweep.json.
+"""
+import argparse
+import json
+from pathlib import Path
+
+import yaml
+
+from harness.config import get_run_deadline_default, get_status_port_default
+from harness.deadline import RunControl, install_signal_handlers
+from harness.status import serve_status
+from harness.sweep import expand_matrix, run_sweep, tracked_model_specs
+
+
+def _floats(text):
+    return [float(x) for x in text.split(",") if x.strip()]
+
+
+def _ints(text):
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sweep_id", required=True)
+    ap.add_argument("--instances", default="instances/i1_instances_lite.jsonl")
+    ap.add_argument("--models_config", default=None, help="models YAML; default: temp_models.TRACKED_MODELS")
+    ap.add_argument("--temperatures", default="0.2", help="comma-separated, e.g. 0.2,0.7")
+    ap.add_argument("--attempts", default="2", help="comma-separated, e.g. 1,2")
+    ap.add_argument("--modes", default="patch", help="comma-separated subset of patch,edit")
+    ap.add_argument("--max_output_tokens", type=int, default=2000)
+    ap.add_argument("--hedge", action="store_true")
+    ap.add_argument("--sequential", action="store_true", help="run cells one by one without sharing (baseline for comparison)")
+    ap.add_argument("--dry_run", action="store_true", help="print the cells and exit")
+    ap.add_argument("--status_port", type=int, default=get_status_port_default(), help="live status endpoint for all cells (0 = off)")
+    ap.add_argument("--deadline_s", type=float, default=get_run_deadline_default(), help="deadline for the whole sweep (default: RUN_DEADLINE_S; 0 = none)")
+    args = ap.parse_args()
+
+    if args.models_config:
+        model_specs = yaml.safe_load(Path(args.models_config).read_text()).get("models", [])
+    else:
+        model_specs = tracked_model_specs()
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    for m in modes:
+        if m not in ("patch", "edit"):
+            ap.error(f"unknown mode: {m}")
+    cells = expand_matrix(model_specs, _floats(args.temperatures), _ints(args.attempts), modes)
+    if args.dry_run:
+        for c in cells:
+            print(f"{c['spec']['provider']}:{c['spec']['model']} t={c['temperature']} attempts={c['attempts']} mode={c['mode']}")
+        print(f"{len(cells)} cells")
+        return
+
+    if args.status_port:
+        print(f"Status: {serve_status(args.status_port)}", flush=True)
+    control = RunControl(args.deadline_s)
+    install_signal_handlers(control)
+    summary = run_sweep(
+        args.sweep_id,
+        args.instances,
+        cells,
+        max_output_tokens=args.max_output_tokens,
+        sequential=args.sequential,
+        hedge=args.hedge,
+        control=control,
+    )
+    failed = [c for c in summary["cells"] if c["status"] != "ok"]
+    print(json.dumps({"cells": len(cells), "failed": len(failed), "wall_s": summary["wall_s"], "cell_wall_s_sum": summary["cell_wall_s_sum"]}))
+    print(f"Sweep summary: runs/{args.sweep_id}/sweep.json")
+
+
+if __name__ == "__main__":
+    main()
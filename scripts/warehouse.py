@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+import argparse
+import time
+
+from harness.pricing import load_prices
+from harness.warehouse import connect, cost_report, ingest, leaderboard, model_summary
+
+
+def _fmt(v) -> str:
+    if v is None:
+        return "-"
+    if isinstance(v, float):
+        if 0 < abs(v) < 0.001:
+            return f"{v:.2g}"
+        return f"{v:.3f}" if v < 100 else f"{v:.0f}"
+    return str(v)
+
+
+def print_table(rows, columns=None) -> None:
+    if not rows:
+        print("(no rows)")
+        return
+    cols = columns or list(rows[0].keys())
+    cells = [[_fmt(r.get(c)) for c in cols] for r in rows]
+    widths = [max(len(c), *(len(row[i]) for row in cells)) for i, c in enumerate(cols)]
+    print("  ".join(c.ljust(w) for c, w in zip(cols, widths)))
+    for row in cells:
+        print("  ".join(v.ljust(w) for v, w in zip(row, widths)))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Local SQLite store of predictions, attempts and evaluator reports")
+    ap.add_argument("--db", default=None, help="SQLite path (default: $WAREHOUSE_DB or .cache/warehouse.sqlite)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_ing = sub.add_parser("ingest", help="Load new/changed files (keyed by content hash)")
+    p_ing.add_argument("--root", default=".")
+    p_sum = sub.add_parser("models", help="Resolve rate, latency and tokens per model across runs")
+    p_sum.add_argument("--runs", default="%", help="SQL LIKE filter on run_id")
+    p_lb = sub.add_parser("leaderboard", help="pass@1 / pass@K per model from evaluator verdicts")
+    p_lb.add_argument("--k", type=int, default=2)
+    p_lb.add_argument("--runs", default="%", help="SQL LIKE filter on run_id")
+    p_cost = sub.add_parser("costs", help="Tokens and USD per attempt, instance and resolved instance by run and model")
+    p_cost.add_argument("--runs", default="%", help="SQL LIKE filter on run_id")
+    p_cost.add_argument("--prices", default=None, help="price table (default: $PRICES or config/prices.yaml)")
+    args = ap.parse_args()
+
+    conn = connect(args.db)
+    t0 = time.time()
+    if args.cmd == "ingest":
+        stats = ingest(conn, args.root)
+        print(f"scanned={stats['scanned']} ingested={stats['ingested']} skipped={stats['skipped']} purged={stats['purged']} rows={stats['rows']}")
+    elif args.cmd == "models":
+        print_table(model_summary(conn, args.runs))
+    elif args.cmd == "costs":
+        cols = ["run_id", "model", "requests", "failed", "hedges", "retries", "attempts", "instances", "resolved",
+                "cost_usd", "tokens_per_attempt", "usd_per_attempt", "usd_per_instance", "tokens_per_resolved", "usd_per_resolved"]
+        print_table(cost_report(conn, load_prices(args.prices), args.runs), cols)
+    else:
+        print_table(leaderboard(conn, args.k, args.runs))
+    print(f"({(time.time() - t0) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
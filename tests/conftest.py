@@ -0,0 +1,48 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO))
+
+
+@pytest.fixture
+def mock_run(tmp_path, monkeypatch):
+    """A scratch run directory with a local dataset of `n` instances and a mock models config.
+
+    Returns a helper `setup(n, models=("mock/a",))` giving (instances_path,
+    models_config_path, env) for in-process or subprocess runs.
+    """
+    monkeypatch.chdir(tmp_path)
+    env_vars = {
+        "PYTHONPATH": str(REPO),
+        "DATASET_NAME": str(tmp_path / "dataset.jsonl"),
+        "RETRIEVAL": "0",
+        "REPO_HINTS": "0",
+        "PREFLIGHT_APPLY": "0",
+        "QUOTA_LEDGER": str(tmp_path / "quota.json"),
+        "PRICES": str(tmp_path / "prices.yaml"),
+        "STATUS_PORT": "0",
+    }
+    for k, v in env_vars.items():
+        monkeypatch.setenv(k, v)
+    for k in ("MOCK_LATENCY", "MOCK_ERROR_RATE", "MOCK_STRAGGLER_RATE", "MOCK_STRAGGLER_LATENCY", "MOCK_OUTAGE_S", "RUN_DEADLINE_S"):
+        monkeypatch.delenv(k, raising=False)
+
+    def setup(n: int, models=("mock/a",)):
+        with open(tmp_path / "dataset.jsonl", "w") as d, open(tmp_path / "instances.jsonl", "w") as i:
+            for k in range(n):
+                iid = f"x__y-{k}"
+                d.write(json.dumps({"instance_id": iid, "repo": "", "problem_statement": "p"}) + "\n")
+                i.write(json.dumps({"instance_id": iid}) + "\n")
+        (tmp_path / "models.yaml").write_text(
+            "models:\n" + "".join(f"  - {{provider: mock, model: {m}, seed: 42}}\n" for m in models)
+        )
+        (tmp_path / "prices.yaml").write_text("prices: {}\n")
+        return str(tmp_path / "instances.jsonl"), str(tmp_path / "models.yaml"), dict(os.environ)
+
+    return setup
+
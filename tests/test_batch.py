@@ -0,0 +1,89 @@
+import json
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from conftest import REPO
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def batch_server(tmp_path):
+    """The local batch API stand-in (scripts/batch_server.py); yields a starter taking the fail rate."""
+    procs = []
+
+    def start(fail_rate, delay=0.2):
+        port = _free_port()
+        proc = subprocess.Popen(
+            [sys.executable, str(REPO / "scripts" / "batch_server.py"), "--port", str(port), "--delay", str(delay), "--fail_rate", str(fail_rate)],
+            env={"PYTHONPATH": str(REPO), "PATH": "/usr/bin:/bin"},
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        procs.append(proc)
+        proc.stdout.readline()  # "batch stand-in on ..." once listening
+        return f"http://127.0.0.1:{port}/v1"
+
+    yield start
+    for p in procs:
+        p.terminate()
+        p.wait(10)
+
+
+def _run(mock_run, tmp_path, url, n=5, extra=()):
+    instances, _, env = mock_run(n)
+    (tmp_path / "chutes.yaml").write_text("models:\n  - {provider: chutes, model: mock/batch, seed: 42}\n")
+    env.update({"CHUTES_BASE_URL": f"{url}/chat/completions", "CHUTES_API_KEY": "x", "BATCH_POLL_S": "1", "QUOTA_CHUTES": "0"})
+    env["NO_PROXY"] = env["no_proxy"] = "127.0.0.1"
+    proc = subprocess.run(
+        [sys.executable, str(REPO / "scripts" / "run_predictions.py"), "--run_id", "b", "--instances", instances,
+         "--models_config", str(tmp_path / "chutes.yaml"), "--attempts", "1", "--batch", *extra],
+        env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert proc.returncode == 0, proc.stderr
+    run = tmp_path / "runs" / "b"
+    preds = [json.loads(ln) for ln in open(run / "predictions.jsonl")]
+    usage = [json.loads(ln) for ln in open(run / "logs" / "usage.jsonl")]
+    return json.loads((run / "manifest.json").read_text()), preds, usage
+
+
+def test_batch_submit_poll_collect(mock_run, tmp_path, batch_server):
+    manifest, preds, usage = _run(mock_run, tmp_path, batch_server(0.0))
+
+    stats = manifest["metrics"]["batch"]
+    assert (stats["requests"], stats["succeeded"], stats["failed"]) == (5, 5, 0)
+    assert [b["status"] for b in stats["batches"].values()] == ["completed"]
+    assert all(p["status"] == "ok" and p["model_patch"] for p in preds)
+    # Every first turn came from the batch; nothing went out interactively
+    assert len(usage) == 5 and all(u["batch"] for u in usage)
+    assert (tmp_path / "runs" / "b" / "batch" / "state.json").exists()
+
+
+def test_failed_batch_requests_fall_back_to_interactive(mock_run, tmp_path, batch_server):
+    manifest, preds, usage = _run(mock_run, tmp_path, batch_server(1.0))
+
+    stats = manifest["metrics"]["batch"]
+    assert (stats["requests"], stats["succeeded"], stats["failed"]) == (5, 0, 5)
+    assert len(preds) == 5 and all(p["status"] == "ok" and p["model_patch"] for p in preds)
+    assert len(usage) == 5 and not any(u["batch"] for u in usage)
+
+
+def test_deadline_ends_the_wait_for_a_pending_batch(mock_run, tmp_path, batch_server):
+    t0 = time.time()
+    manifest, preds, usage = _run(mock_run, tmp_path, batch_server(0.0, delay=120), extra=("--deadline_s", "3"))
+
+    # The batch never completed; the run stopped polling at the deadline instead of waiting it out
+    assert time.time() - t0 < 30
+    stats = manifest["metrics"]["batch"]
+    assert stats["stopped"] and (stats["requests"], stats["succeeded"]) == (5, 0)
+    assert [b["status"] for b in stats["batches"].values()] != ["completed"]
+    assert manifest["metrics"]["run_control"]["stopped"] == "deadline"
+    assert not preds and not usage
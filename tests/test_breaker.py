@@ -0,0 +1,57 @@
+import json
+import time
+
+import pytest
+import yaml
+
+from harness.breaker import CLOSED, HALF_OPEN, OPEN, BreakerChat, CircuitBreaker, CircuitOpenError
+from harness.deadline import RunControl
+from harness.orchestrator import orchestrate_predictions
+from harness.providers.mock import MockChat
+from harness.providers.openai_compat import OpenAICompatError
+
+MSG = [{"role": "user", "content": "fix it"}]
+
+
+def test_opens_rejects_and_closes_after_a_probe(monkeypatch):
+    monkeypatch.setenv("MOCK_OUTAGE_S", "0.4")
+    breaker = CircuitBreaker("mock:m", window=4, min_calls=2, error_rate=0.5, cooldown_s=0.5)
+    chat = BreakerChat(MockChat("m"), breaker)
+    for _ in range(2):
+        with pytest.raises(OpenAICompatError):
+            chat.chat(MSG)
+    assert breaker.state == OPEN and not breaker.admit_task()
+    with pytest.raises(CircuitOpenError):
+        chat.chat(MSG)
+    time.sleep(0.6)
+    # One task is released to probe; a second waits for the verdict
+    assert breaker.admit_task() and breaker.state == HALF_OPEN
+    assert chat.chat(MSG)[0]
+    assert breaker.state == CLOSED and breaker.stats()["opened"] == 1 and breaker.stats()["rejected_calls"] == 1
+
+
+def test_failed_probe_doubles_the_cooldown():
+    breaker = CircuitBreaker("mock:m", window=2, min_calls=1, error_rate=0.5, cooldown_s=0.1)
+    breaker.record(False)
+    time.sleep(0.15)
+    assert breaker.allow() and not breaker.allow()
+    breaker.record(False)
+    assert breaker.state == OPEN and breaker.cooldown == 0.2
+
+
+def test_outage_parks_and_resumes_tasks(mock_run, monkeypatch):
+    instances, models, _ = mock_run(6)
+    monkeypatch.setenv("WORKERS", "2")
+    monkeypatch.setenv("MOCK_LATENCY", "0.05")
+    monkeypatch.setenv("MOCK_OUTAGE_S", "0.3")
+    monkeypatch.setenv("BREAKER_MIN_CALLS", "2")
+    monkeypatch.setenv("BREAKER_COOLDOWN_S", "1")
+    specs = yaml.safe_load(open(models))["models"]
+    orchestrate_predictions(run_id="br", instances_path=instances, model_specs=specs, attempts=3, control=RunControl())
+    manifest = json.loads(open("runs/br/manifest.json").read())
+    breaker = manifest["metrics"]["breaker"]
+    assert breaker["parked"] > 0 and breaker["models"]["mock:mock/a"]["state"] == CLOSED
+    rows = [json.loads(ln) for ln in open("runs/br/predictions.jsonl")]
+    assert len(rows) == 6 and all(r["status"] == "ok" for r in rows)
+    changes = [json.loads(ln)["to"] for ln in open("runs/br/logs/breaker.jsonl")]
+    assert changes[:3] == [OPEN, HALF_OPEN, CLOSED]
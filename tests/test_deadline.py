@@ -0,0 +1,185 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from harness import deadline
+from harness.orchestrator import orchestrate_predictions
+from harness.providers.openai_compat import OpenAICompatChat, OpenAICompatError, abort_inflight
+
+
+def _rows(path):
+    with open(path) as f:
+        return [json.loads(ln) for ln in f if ln.strip()]
+
+
+def _run(instances, models, control, attempts=1):
+    import yaml
+
+    specs = yaml.safe_load(open(models))["models"]
+    t0 = time.time()
+    orchestrate_predictions(run_id="dl", instances_path=instances, model_specs=specs, attempts=attempts, control=control)
+    manifest = json.loads(open("runs/dl/manifest.json").read())
+    return manifest, _rows("runs/dl/predictions.jsonl"), _rows("runs/dl/logs/attempts.jsonl"), time.time() - t0
+
+
+def test_run_deadline_stops_scheduling(mock_run, monkeypatch):
+    instances, models, _ = mock_run(20)
+    monkeypatch.setenv("WORKERS", "2")
+    monkeypatch.setenv("MOCK_LATENCY", "0.8")
+
+    # Two tasks finish at 0.8s; the next two are cut at the 1.2s deadline (give or take the 0.5s budget floor)
+    manifest, preds, attempts, wall = _run(instances, models, deadline.RunControl(1.2))
+
+    rc = manifest["metrics"]["run_control"]
+    assert rc["stopped"] == "deadline" and rc["unscheduled"] > 0
+    assert len(preds) + rc["unscheduled"] == 20
+    assert len(preds) == 4 and wall < 3.0
+    # Tasks caught by the deadline are cancelled rows, their attempts logged as "deadline"
+    cut = [p for p in preds if p["status"] == "cancelled"]
+    assert cut and all(p["usage"]["stopped"] == "deadline" for p in cut)
+    assert {a["status"] for a in attempts} == {"ok", "deadline"}
+    assert manifest["metrics"]["patch_quality"]["stopped_attempts"] == len(cut)
+    assert manifest["metrics"]["patch_quality"]["attempts"] == len(preds) - len(cut)
+
+
+def test_drain_lets_in_flight_tasks_finish(mock_run, monkeypatch):
+    instances, models, _ = mock_run(20)
+    monkeypatch.setenv("WORKERS", "2")
+    monkeypatch.setenv("MOCK_LATENCY", "1.0")
+    control = deadline.RunControl()
+    threading.Timer(0.3, control.drain).start()
+
+    manifest, preds, attempts, wall = _run(instances, models, control)
+
+    rc = manifest["metrics"]["run_control"]
+    assert rc["stopped"] == "drain" and not rc["cancelled_in_flight"]
+    assert len(preds) == 2 and all(p["status"] == "ok" for p in preds)
+    assert rc["unscheduled"] == 18
+    assert wall < 2.5
+
+
+def test_cancel_cuts_in_flight_tasks(mock_run, monkeypatch):
+    instances, models, _ = mock_run(6)
+    monkeypatch.setenv("WORKERS", "2")
+    monkeypatch.setenv("MOCK_STRAGGLER_RATE", "1")
+    monkeypatch.setenv("MOCK_STRAGGLER_LATENCY", "30")
+    control = deadline.RunControl()
+    threading.Timer(0.5, control.cancel).start()
+
+    manifest, preds, attempts, wall = _run(instances, models, control, attempts=2)
+
+    assert wall < 5.0
+    rc = manifest["metrics"]["run_control"]
+    assert rc["cancelled_in_flight"] and rc["unscheduled"] == 4
+    assert len(preds) == 2 and all(p["status"] == "cancelled" and p["usage"]["stopped"] == "cancel" for p in preds)
+    # The second attempt never starts once cancelled
+    assert [a["status"] for a in attempts] == ["cancelled", "cancelled"]
+
+
+def test_attempt_deadline_moves_on_to_the_next_attempt(mock_run, monkeypatch):
+    instances, models, _ = mock_run(1)
+    monkeypatch.setenv("ATTEMPT_DEADLINE_S", "1")
+    monkeypatch.setenv("MOCK_STRAGGLER_RATE", "1")
+    monkeypatch.setenv("MOCK_STRAGGLER_LATENCY", "30")
+
+    manifest, preds, attempts, wall = _run(instances, models, deadline.RunControl(), attempts=2)
+
+    assert wall < 5.0
+    assert [a["status"] for a in attempts] == ["deadline", "deadline"]
+    assert preds[0]["status"] == "no_valid_patch"
+
+
+def test_finished_attempts_keep_their_status_when_a_cancel_follows(mock_run, monkeypatch):
+    from harness import orchestrator
+
+    instances, models, _ = mock_run(1)
+    monkeypatch.setenv("MOCK_RESPONSE", "no diff here")
+    control = deadline.RunControl()
+    log_attempt = orchestrator._log_attempt
+
+    def log_then_cancel(path, iid, provider, model, k, *rest):
+        log_attempt(path, iid, provider, model, k, *rest)
+        if k == 1:
+            # Arrives after the last attempt finished but before the row is written
+            control.cancel()
+
+    monkeypatch.setattr(orchestrator, "_log_attempt", log_then_cancel)
+    manifest, preds, attempts, _ = _run(instances, models, control, attempts=2)
+
+    assert [a["status"] for a in attempts] == ["no_valid_patch", "no_valid_patch"]
+    assert preds[0]["status"] == "no_valid_patch" and "stopped" not in preds[0]["usage"]
+    assert manifest["metrics"]["patch_quality"]["stopped_attempts"] == 0
+
+
+class _SlowHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(5)
+
+
+def test_abort_inflight_unblocks_provider_calls(monkeypatch):
+    for k in ("http_proxy", "HTTP_PROXY"):
+        monkeypatch.delenv(k, raising=False)
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _SlowHandler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    client = OpenAICompatChat(f"http://127.0.0.1:{srv.server_address[1]}/v1/chat/completions", "k", "m", timeout=30)
+    errors = []
+
+    def call():
+        try:
+            client.chat([{"role": "user", "content": "x"}])
+        except OpenAICompatError as e:
+            errors.append(e)
+
+    t = threading.Thread(target=call)
+    t0 = time.time()
+    t.start()
+    time.sleep(0.3)
+    assert abort_inflight() == 1
+    t.join(5)
+    assert errors and time.time() - t0 < 2.0
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_cancel_aborts_only_its_own_runs_connections(monkeypatch):
+    for k in ("http_proxy", "HTTP_PROXY"):
+        monkeypatch.delenv(k, raising=False)
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _SlowHandler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    client = OpenAICompatChat(f"http://127.0.0.1:{srv.server_address[1]}/v1/chat/completions", "k", "m", timeout=30)
+    # Two sweep cells, each under its own control
+    cells = {"a": deadline.RunControl(), "b": deadline.RunControl()}
+    ended = {}
+
+    def call(name):
+        with deadline.bind(cells[name]):
+            try:
+                client.chat([{"role": "user", "content": "x"}])
+                ended[name] = "ok"
+            except OpenAICompatError:
+                ended[name] = "aborted"
+
+    threads = [threading.Thread(target=call, args=(n,)) for n in cells]
+    for t in threads:
+        t.start()
+    time.sleep(0.3)
+    cells["a"].cancel()
+    threads[0].join(2)
+    assert ended == {"a": "aborted"}
+    # b is still waiting on its response
+    assert abort_inflight(cells["b"]) == 1
+    threads[1].join(2)
+    assert ended["b"] == "aborted"
+    srv.shutdown()
+    srv.server_close()
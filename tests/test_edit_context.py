@@ -0,0 +1,45 @@
+import json
+
+from harness.agent.context import EditContext
+
+
+def _stubs(ctx):
+    return [r.elided for t in ctx.turns for r in t.results]
+
+
+def _result(obj):
+    return f"```result\n{json.dumps(obj)}\n```"
+
+
+def test_superseded_read_matches_normalised_paths():
+    ctx = EditContext("sys", "task", budget=10000)
+    ctx.add_turn("read", [("READ", {"tool": "READ", "path": "./pkg/a.py"}, _result({"ok": True, "content": "old body"}))])
+    ctx.add_turn("write", [("WRITE", {"tool": "WRITE", "path": "pkg/a.py"}, _result({"ok": True}))])
+    assert _stubs(ctx)[0] == "superseded: file was modified later"
+
+
+def test_failed_write_does_not_supersede():
+    ctx = EditContext("sys", "task", budget=10000)
+    ctx.add_turn("read", [("READ", {"tool": "READ", "path": "a.py"}, _result({"ok": True, "content": "body"}))])
+    ctx.add_turn("replace", [("REPLACE", {"tool": "REPLACE", "path": "a.py"}, _result({"ok": False, "error": "old text not found"}))])
+    assert _stubs(ctx) == [None, None]
+
+
+def test_listing_naming_a_written_file_is_superseded():
+    ctx = EditContext("sys", "task", budget=10000)
+    ctx.add_turn(
+        "find",
+        [
+            ("FIND_SYMBOL", {"tool": "FIND_SYMBOL", "name": "f"}, _result({"ok": True, "matches": [{"path": "a.py", "start_line": 3}]})),
+            ("FIND_SYMBOL", {"tool": "FIND_SYMBOL", "name": "g"}, _result({"ok": True, "matches": [{"path": "b.py", "start_line": 9}]})),
+        ],
+    )
+    ctx.add_turn("write", [("REPLACE_LINES", {"tool": "REPLACE_LINES", "path": "a.py"}, _result({"ok": True}))])
+    assert _stubs(ctx)[:2] == ["superseded: lists a file that was modified later", None]
+
+
+def test_duplicate_call_matches_normalised_args():
+    ctx = EditContext("sys", "task", budget=10000)
+    ctx.add_turn("read", [("READ", {"tool": "READ", "path": "a.py"}, "body")])
+    ctx.add_turn("read again", [("READ", {"tool": "READ", "path": "./a.py", "max_bytes": 20000}, "body")])
+    assert _stubs(ctx) == ["duplicate of a later identical call", None]
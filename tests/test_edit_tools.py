@@ -0,0 +1,58 @@
+from harness.agent.edit_controller import _replace, _replace_lines
+
+SRC = "def f():\n    return 1\n\n\ndef g():\n    return 1\n"
+
+
+def _file(tmp_path):
+    fp = tmp_path / "a.py"
+    fp.write_text(SRC)
+    return fp
+
+
+def test_replace_lines_replaces_and_inserts(tmp_path):
+    fp = _file(tmp_path)
+    res = _replace_lines(tmp_path, "a.py", 2, 2, "    return 2")
+    assert res == {"ok": True, "removed_lines": 1, "inserted_lines": 1, "total_lines": 6}
+    assert fp.read_text().splitlines()[1] == "    return 2"
+    # end_line = start_line - 1 inserts without removing
+    assert _replace_lines(tmp_path, "a.py", 1, 0, "import os\n")["removed_lines"] == 0
+    assert fp.read_text().startswith("import os\ndef f():\n")
+
+
+def test_replace_lines_rejects_bad_ranges(tmp_path):
+    fp = _file(tmp_path)
+    res = _replace_lines(tmp_path, "a.py", 5, 9, "x\n")
+    assert not res["ok"] and "file has 6 lines" in res["error"]
+    assert fp.read_text() == SRC
+
+
+def test_replace_needs_a_unique_exact_match(tmp_path):
+    fp = _file(tmp_path)
+    res = _replace(tmp_path, "a.py", "    return 1\n", "    return 3\n")
+    assert not res["ok"] and "matches 2 times" in res["error"]
+    res = _replace(tmp_path, "a.py", "return 1", "return 3", replace_all=True)
+    assert res == {"ok": True, "replacements": 2, "line": 2}
+    res = _replace(tmp_path, "a.py", "def h():", "def k():")
+    assert not res["ok"] and "not found" in res["error"]
+    assert "return 1" not in fp.read_text()
+
+
+def test_parallel_read_block_sees_the_task_deadline(tmp_path, monkeypatch):
+    from harness import deadline
+    from harness.agent import edit_controller
+
+    _file(tmp_path)
+    seen = []
+    dispatch = edit_controller._dispatch
+
+    def spy(sess, payload):
+        seen.append(deadline.remaining())
+        return dispatch(sess, payload)
+
+    monkeypatch.setattr(edit_controller, "_dispatch", spy)
+    sess = edit_controller._Session(tmp_path, "fx/calc", None)
+    blocks = ['{"tool": "READ", "path": "a.py", "start_line": %d, "end_line": %d}' % (k, k) for k in (1, 2, 5)]
+    with deadline.within(30):
+        out = edit_controller._run_calls(sess, blocks)
+    assert len(out) == 3 and len(seen) == 3
+    assert all(r is not None and 0 < r <= 30 for r in seen)
@@ -0,0 +1,83 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from conftest import REPO
+from harness.eval_pipeline import EvalPipeline, VerdictCache, follow_jsonl, summarize
+
+# Relative script path, as in the documented EVAL_CMD example
+STUB_CMD = f"{sys.executable} scripts/stub_evaluator.py --predictions_path {{predictions}} --run_id {{run_id}} --report_dir {{report_dir}}"
+GOOD = "diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/a.py\n@@ -1 +1 @@\n-x\n+y\n"
+BAD = "diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/a.py\n@@ -1 +0,0 @@\n-x\n"
+
+
+def _pred(iid, model, patch):
+    return {"instance_id": iid, "model_name_or_path": model, "model_patch": patch}
+
+
+def _rows(path):
+    with open(path) as f:
+        return [json.loads(ln) for ln in f if ln.strip()]
+
+
+def test_pipeline_with_stub_evaluator(tmp_path, monkeypatch):
+    monkeypatch.chdir(REPO)
+    monkeypatch.setenv("STUB_EVAL_SECONDS", "0")
+    monkeypatch.setenv("STUB_RESOLVE_MARKER", "+y")
+    rows = [
+        _pred("x__y-1", "m/a", GOOD),
+        _pred("x__y-1", "m/b", GOOD.replace("\n", "\r\n")),  # same patch once normalized
+        _pred("x__y-2", "m/a", BAD),
+        _pred("x__y-3", "m/a", ""),
+    ]
+    out = tmp_path / "verdicts.jsonl"
+    cache = VerdictCache(tmp_path / "cache.jsonl")
+
+    stats = EvalPipeline(out, eval_cmd=STUB_CMD, workers=2, cache=cache).run(iter(rows))
+
+    assert stats["evaluated"] == 2 and stats["dedup_hits"] + stats["cache_hits"] == 1 and stats["empty"] == 1
+    verdicts = {(r["instance_id"], r["model_name_or_path"]): r["verdict"] for r in _rows(out)}
+    assert verdicts == {
+        ("x__y-1", "m/a"): "resolved",
+        ("x__y-1", "m/b"): "resolved",
+        ("x__y-2", "m/a"): "unresolved",
+        ("x__y-3", "m/a"): "empty_patch",
+    }
+    assert summarize(out)["m/a"]["resolved_instances"] == 1
+    assert not list(REPO.glob("*.pipe-*.json"))
+
+    # A second pass is served from the verdict cache without running the evaluator
+    stats = EvalPipeline(tmp_path / "again.jsonl", eval_cmd=STUB_CMD, cache=VerdictCache(tmp_path / "cache.jsonl")).run(iter(rows))
+    assert stats["evaluated"] == 0 and stats["cache_hits"] == 3
+
+
+def test_follow_stops_when_done_after_draining(tmp_path):
+    path = tmp_path / "p.jsonl"
+    path.write_text(json.dumps({"a": 1}) + "\n" + '{"a": 2}')  # second line still being written
+    done = [False]
+    it = follow_jsonl(path, lambda: done[0], poll=0.01)
+    assert next(it) == {"a": 1}
+    with open(path, "a") as f:
+        f.write("\n")
+    assert next(it) == {"a": 2}
+    done[0] = True
+    assert list(it) == []
+
+
+def test_follow_exits_on_already_finished_run(tmp_path):
+    run = tmp_path / "runs" / "r"
+    run.mkdir(parents=True)
+    (run / "predictions.jsonl").write_text(json.dumps(_pred("x__y-1", "m/a", "")) + "\n")
+    time.sleep(0.01)
+    (run / "manifest.json").write_text("{}")
+    env = {**os.environ, "PYTHONPATH": str(REPO)}
+
+    proc = subprocess.run(
+        [sys.executable, str(REPO / "scripts" / "eval_pipeline.py"), str(run / "predictions.jsonl"), "--follow", "--eval_cmd", STUB_CMD],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60,
+    )
+
+    assert proc.returncode == 0, proc.stderr
+    assert json.loads(proc.stdout.splitlines()[0])["empty"] == 1
@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+
+from harness import latency
+from harness.latency import HedgedChat
+from harness.providers.mock import MockChat
+from harness.quota import QuotaLedger
+
+MSG = [{"role": "user", "content": "fix it"}]
+
+
+class FirstCallStraggles(MockChat):
+    """Mock provider whose first request takes `slow` seconds and the rest none."""
+
+    def __init__(self, slow):
+        super().__init__("m")
+        self.slow = slow
+        self.n = 0
+        self._lock = threading.Lock()
+
+    def chat(self, messages, temperature=0.2, max_output_tokens=2000, seed=None, timeout=None):
+        with self._lock:
+            self.n += 1
+            first = self.n == 1
+        if first:
+            time.sleep(self.slow)
+        return super().chat(messages, temperature, max_output_tokens, seed, timeout)
+
+
+@pytest.fixture
+def quota(tmp_path, monkeypatch):
+    ledger = QuotaLedger(tmp_path / "ledger.json")
+    monkeypatch.setattr(latency, "QUOTA", ledger)
+    return ledger
+
+
+def test_timeout_adapts_to_observed_latency(monkeypatch, quota):
+    chat = HedgedChat(MockChat("m", timeout=45), "mock")
+    assert chat.timeout() == 45
+    monkeypatch.setenv("TIMEOUT_MIN", "1")
+    chat = HedgedChat(MockChat("m"), "mock", history=[0.5] * 20)
+    assert chat.timeout() == 1.5
+    chat = HedgedChat(MockChat("m"), "mock", history=[0.01] * 20)
+    assert chat.timeout() == 1
+
+
+def test_straggler_is_hedged_and_both_requests_are_charged(quota):
+    chat = HedgedChat(FirstCallStraggles(1.0), "mock", hedge=True, history=[0.05] * 20)
+    t0 = time.time()
+    text, meta = chat.chat(MSG, seed=7)
+    assert time.time() - t0 < 0.8
+    assert meta["hedged"] and meta["hedge_won"] and text
+    stats = chat.stats()
+    assert (stats["hedged"], stats["hedge_wins"]) == (1, 1)
+    assert quota.used("mock") == {"requests": 2, "hedges": 1}
+
+
+def test_fast_call_is_not_hedged(quota):
+    chat = HedgedChat(MockChat("m"), "mock", hedge=True, history=[0.5] * 20)
+    _, meta = chat.chat(MSG)
+    assert "hedged" not in meta and chat.stats()["hedged"] == 0
+    assert quota.used("mock") == {"requests": 1, "hedges": 0}
+
+
+def test_quota_remaining(monkeypatch, quota):
+    monkeypatch.setenv("QUOTA_MOCK", "3")
+    quota.record("mock", requests=2)
+    assert quota.remaining("mock") == 1
+    quota.record("mock", requests=5)
+    assert quota.remaining("mock") == 0
+    assert quota.stats()["mock"]["limit"] == 3
@@ -0,0 +1,43 @@
+import os
+
+from harness.agent.edit_controller import _read
+from harness.agent.line_index import line_offsets, read_window
+
+
+def _file(tmp_path, n=100):
+    fp = tmp_path / "m.py"
+    fp.write_text("".join(f"line {i}\n" for i in range(1, n + 1)))
+    return fp
+
+
+def test_window_is_numbered_and_clamped(tmp_path):
+    fp = _file(tmp_path)
+    res = read_window(str(fp), 98, 120)
+    assert res["content"] == " 98| line 98\n 99| line 99\n100| line 100\n"
+    assert (res["start_line"], res["end_line"], res["total_lines"], res["truncated"]) == (98, 100, 100, False)
+    assert read_window(str(fp), 200, None)["content"] == ""
+
+
+def test_window_stops_at_max_bytes(tmp_path):
+    fp = _file(tmp_path)
+    res = read_window(str(fp), 1, None, max_bytes=60)
+    assert res["truncated"] and res["start_line"] == 1 and res["end_line"] < 10
+    assert res["content"].splitlines()[-1].endswith(f"line {res['end_line']}")
+
+
+def test_line_index_follows_rewrites(tmp_path):
+    fp = _file(tmp_path, 10)
+    first = line_offsets(str(fp))
+    assert line_offsets(str(fp)) is first
+    fp.write_text("a\nb\n")
+    os.utime(fp, ns=(0, 12345))
+    assert read_window(str(fp), 1, None)["content"] == "1| a\n2| b\n"
+
+
+def test_read_tool_windows(tmp_path):
+    _file(tmp_path)
+    around = _read(tmp_path, "m.py", around_line=50, context=2)
+    assert around["ok"] and (around["start_line"], around["end_line"]) == (48, 52)
+    whole = _read(tmp_path, "m.py", max_bytes=30)
+    assert whole["truncated"] and whole["total_lines"] == 100 and "around_line" in whole["hint"]
+    assert not _read(tmp_path, "../etc/passwd", start_line=1)["ok"]
@@ -0,0 +1,131 @@
+import subprocess
+import sys
+
+import pytest
+
+from harness.local_eval import evaluate_prediction, evaluate_predictions, worktree
+
+CALC = "def add(a, b):\n    return a + b\n\n\ndef sub(a, b):\n    return a + b\n"
+TESTS = (
+    "import time\n\nfrom calc import add, sub\n\n\n"
+    "def test_add():\n    assert add(2, 1) == 3\n\n\n"
+    "def test_slow():\n    time.sleep(30)\n"
+)
+TEST_PATCH = """diff --git a/test_calc.py b/test_calc.py
+--- a/test_calc.py
++++ b/test_calc.py
+@@ -11,0 +12,4 @@ def test_slow():
++
++
++def test_sub():
++    assert sub(2, 1) == 1
+"""
+FIX = """diff --git a/calc.py b/calc.py
+--- a/calc.py
++++ b/calc.py
+@@ -5,2 +5,2 @@ def add(a, b):
+ def sub(a, b):
+-    return a + b
++    return a - b
+"""
+NO_FIX = """diff --git a/calc.py b/calc.py
+--- a/calc.py
++++ b/calc.py
+@@ -1,2 +1,3 @@
+ def add(a, b):
++    # unchanged behaviour
+     return a + b
+"""
+
+
+@pytest.fixture
+def fixture_repo(tmp_path, monkeypatch):
+    """A tiny pytest repo cached at .cache/repos/fx/calc; returns its instance record."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("LOCAL_EVAL_PYTHON", sys.executable)
+    repo = tmp_path / ".cache" / "repos" / "fx" / "calc"
+    repo.mkdir(parents=True)
+    (repo / "calc.py").write_text(CALC)
+    (repo / "test_calc.py").write_text(TESTS)
+    git = ["git", "-c", "user.name=t", "-c", "user.email=t@t"]
+    subprocess.run(git + ["init", "-q"], cwd=repo, check=True)
+    subprocess.run(git + ["add", "."], cwd=repo, check=True)
+    subprocess.run(git + ["commit", "-qm", "base"], cwd=repo, check=True)
+    commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo, capture_output=True, text=True, check=True).stdout.strip()
+    return {
+        "instance_id": "fx__calc-1",
+        "repo": "fx/calc",
+        "base_commit": commit,
+        "test_patch": TEST_PATCH,
+        "FAIL_TO_PASS": '["test_calc.py::test_sub"]',
+        "PASS_TO_PASS": '["test_calc.py::test_add"]',
+    }
+
+
+def _pred(patch):
+    return {"instance_id": "fx__calc-1", "model_name_or_path": "m/a", "model_patch": patch}
+
+
+def test_verdicts(fixture_repo):
+    res = evaluate_prediction(_pred(FIX), fixture_repo)
+    assert res["status"] == "ok" and res["resolved_locally"]
+    assert res["fail_to_pass"] == {"test_calc.py::test_sub": "passed"}
+    assert res["pass_to_pass"] == {"test_calc.py::test_add": "passed"}
+
+    res = evaluate_prediction(_pred(NO_FIX), fixture_repo)
+    assert res["status"] == "ok" and not res["resolved_locally"]
+    assert res["fail_to_pass"] == {"test_calc.py::test_sub": "failed"}
+
+    assert evaluate_prediction(_pred("diff --git a/x b/x\n--- a/x\n+++ b/x\n@@ -1 +1 @@\n-a\n+b\n"), fixture_repo)["status"] == "patch_failed"
+    assert evaluate_prediction(_pred(""), fixture_repo)["status"] == "empty_patch"
+
+
+def test_per_test_timeout(fixture_repo):
+    instance = {**fixture_repo, "PASS_TO_PASS": '["test_calc.py::test_slow"]'}
+    res = evaluate_prediction(_pred(FIX), instance, test_timeout=2)
+    assert res["pass_to_pass"] == {"test_calc.py::test_slow": "timeout"}
+    assert not res["resolved_locally"]
+    assert res["duration_s"] < 20
+
+
+def test_worktree_pool_reuses_clean_slots(fixture_repo, tmp_path):
+    commit = fixture_repo["base_commit"]
+    with worktree("fx/calc", commit) as a:
+        (a / "calc.py").write_text("broken\n")
+        (a / "stray.txt").write_text("x")
+        with worktree("fx/calc", commit) as b:
+            # A leased slot is never shared
+            assert a != b
+    with worktree("fx/calc", commit) as c:
+        assert c == a
+        assert (c / "calc.py").read_text() == CALC and not (c / "stray.txt").exists()
+    slots = sorted(p.name for p in (tmp_path / ".cache" / "worktrees" / "fx__calc").iterdir() if p.is_dir())
+    assert slots == ["0", "1"]
+
+
+def test_evaluate_predictions_process_pool(fixture_repo):
+    preds = [_pred(FIX), {**_pred(NO_FIX), "model_name_or_path": "m/b"}]
+    results = {r["model_name_or_path"]: r for r in evaluate_predictions(preds, {"fx__calc-1": fixture_repo}, workers=2)}
+    assert results["m/a"]["resolved_locally"] and not results["m/b"]["resolved_locally"]
+
+
+def test_missing_commit_is_a_setup_error(fixture_repo):
+    # Warm a slot at the base commit, then ask for a commit the clone does not have
+    assert evaluate_prediction(_pred(FIX), fixture_repo)["resolved_locally"]
+    res = evaluate_prediction(_pred(FIX), {**fixture_repo, "base_commit": "0" * 40})
+    assert res["status"] == "setup_error" and not res["resolved_locally"]
+
+
+def test_reused_slot_moves_to_the_requested_commit(fixture_repo, tmp_path):
+    repo = tmp_path / ".cache" / "repos" / "fx" / "calc"
+    with worktree("fx/calc", fixture_repo["base_commit"]) as wt:
+        pass
+    (repo / "calc.py").write_text(CALC.replace("return a + b\n", "return a - b\n", 2).replace("return a - b\n", "return a + b\n", 1))
+    git = ["git", "-c", "user.name=t", "-c", "user.email=t@t"]
+    subprocess.run(git + ["commit", "-qam", "fix sub"], cwd=repo, check=True)
+    fixed = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo, capture_output=True, text=True, check=True).stdout.strip()
+    with worktree("fx/calc", fixed) as again:
+        assert again == wt
+        assert "return a - b" in (again / "calc.py").read_text()
+        head = subprocess.run(["git", "rev-parse", "HEAD"], cwd=again, capture_output=True, text=True).stdout.strip()
+        assert head == fixed
@@ -0,0 +1,84 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from harness.providers import openai_compat
+from harness.providers.openai_compat import OpenAICompatChat, OpenAICompatError
+
+REPLY = {"choices": [{"message": {"content": "hi"}, "finish_reason": "stop"}], "usage": {"prompt_tokens": 3, "completion_tokens": 1}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        srv = self.server
+        srv.paths.append(self.path)
+        srv.peers.add(self.client_address)
+        status, body = srv.reply
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        if srv.drop_after_reply:
+            # Close without announcing it, like a server timing out an idle keep-alive connection
+            self.close_connection = True
+
+
+@pytest.fixture
+def server(monkeypatch):
+    for k in ("http_proxy", "HTTP_PROXY", "https_proxy", "HTTPS_PROXY", "no_proxy", "NO_PROXY"):
+        monkeypatch.delenv(k, raising=False)
+    monkeypatch.setattr(openai_compat, "_idle", {})
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    srv.paths, srv.peers, srv.reply, srv.drop_after_reply = [], set(), (200, REPLY), False
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def _client(srv, host="127.0.0.1"):
+    return OpenAICompatChat(f"http://{host}:{srv.server_address[1]}/v1/chat/completions", "k", "m", timeout=5)
+
+
+def test_keep_alive_connection_is_reused(server):
+    client = _client(server)
+    for _ in range(3):
+        assert client.chat([{"role": "user", "content": "x"}])[0] == "hi"
+    assert len(server.paths) == 3 and len(server.peers) == 1
+
+
+def test_stale_pooled_connection_is_retried_on_a_fresh_one(server):
+    server.drop_after_reply = True
+    client = _client(server)
+    for _ in range(3):
+        assert client.chat([{"role": "user", "content": "x"}])[0] == "hi"
+    # Each call found its pooled connection closed by the server and reconnected
+    assert len(server.paths) == 3 and len(server.peers) == 3
+
+
+def test_http_error_carries_status_and_body(server):
+    server.reply = (429, {"error": {"message": "slow down, quota exceeded"}})
+    with pytest.raises(OpenAICompatError, match=r"HTTP Error 429: .*slow down, quota exceeded"):
+        _client(server).chat([{"role": "user", "content": "x"}])
+
+
+def test_http_proxy_and_no_proxy(server, monkeypatch):
+    # The test server plays the proxy: it receives the absolute URL of the real target
+    monkeypatch.setenv("http_proxy", f"http://user:pw@127.0.0.1:{server.server_address[1]}")
+    client = OpenAICompatChat("http://provider.invalid/v1/chat/completions", "k", "m", timeout=5)
+    assert client.chat([{"role": "user", "content": "x"}])[0] == "hi"
+    assert server.paths[-1] == "http://provider.invalid/v1/chat/completions"
+
+    monkeypatch.setenv("no_proxy", "127.0.0.1")
+    assert _client(server).chat([{"role": "user", "content": "x"}])[0] == "hi"
+    assert server.paths[-1] == "/v1/chat/completions"
@@ -0,0 +1,41 @@
+from harness.output_budget import AdaptiveOutputChat, learn_output_caps
+from harness.providers.mock import MockChat
+
+MSG = [{"role": "user", "content": "fix it"}]
+
+
+def test_truncated_reply_is_escalated_once(monkeypatch):
+    monkeypatch.setenv("MOCK_RESPONSE", "x" * 1000)
+    chat = AdaptiveOutputChat(MockChat("m"), baseline=200, spec={"context_tokens": 32768})
+    text, meta = chat.chat(MSG, max_output_tokens=100)
+    # 100 tokens cut the 250-token reply; the re-ask gets max(2*100, 200) = 200
+    assert len(text) == 800 and meta["escalated_to"] == 200 and meta["finish_reason"] == "length"
+    assert meta["completion_tokens"] == 100 + 200
+    stats = chat.stats()
+    assert (stats["truncated"], stats["escalations"], stats["still_truncated"]) == (1, 1, 1)
+    assert stats["reserved_output_tokens"] == 300 and stats["wasted_completion_tokens"] == 100
+
+
+def test_escalation_respects_ceiling_and_context(monkeypatch):
+    monkeypatch.setenv("MOCK_RESPONSE", "x" * 1000)
+    monkeypatch.setenv("OUTPUT_TOKENS_MAX", "150")
+    chat = AdaptiveOutputChat(MockChat("m"), baseline=100)
+    assert chat.chat(MSG, max_output_tokens=100)[1]["escalated_to"] == 150
+    monkeypatch.delenv("OUTPUT_TOKENS_MAX")
+    # No room left in a tiny context: the truncated reply is kept as is
+    tight = AdaptiveOutputChat(MockChat("m"), baseline=100, spec={"context_tokens": 300})
+    _, meta = tight.chat(MSG, max_output_tokens=100)
+    assert "escalated_to" not in meta and tight.stats()["escalations"] == 0
+
+
+def test_learned_caps():
+    specs = [
+        {"provider": "mock", "model": "a"},
+        {"provider": "mock", "model": "b"},
+        {"provider": "mock", "model": "c", "max_output_tokens": 777},
+    ]
+    history = {"mock:a": [float(i) for i in range(1, 1001)], "mock:b": [500.0] * 5}
+    caps = learn_output_caps(specs, default=2000, pct=95, history=history)
+    assert caps["mock:a"] == {"cap": 960, "source": "p95", "samples": 1000}
+    assert caps["mock:b"]["source"] == "default" and caps["mock:b"]["cap"] == 2000
+    assert caps["mock:c"]["cap"] == 777 and caps["mock:c"]["source"] == "spec"
@@ -0,0 +1,72 @@
+import pytest
+import yaml
+
+from harness import plan
+from harness.orchestrator import orchestrate_predictions
+from harness.plan import attempt_rows, check_budgets, plan_run
+from harness.quota import QuotaLedger
+
+SPEC = {"provider": "mock", "model": "mock/a", "seed": 42}
+PRICES = {"mock:mock/a": {"input": 1000.0, "output": 2000.0}}
+
+
+@pytest.fixture
+def quota(tmp_path, monkeypatch):
+    ledger = QuotaLedger(tmp_path / "ledger.json")
+    monkeypatch.setattr(plan, "QUOTA", ledger)
+    return ledger
+
+
+@pytest.fixture
+def history(mock_run):
+    instances, models, _ = mock_run(6)
+    orchestrate_predictions(run_id="past", instances_path=instances, model_specs=yaml.safe_load(open(models))["models"], attempts=1)
+    return attempt_rows()
+
+
+def test_plan_replays_past_attempts(history, quota):
+    rows = history["mock:mock/a"]
+    assert len(rows) == 6 and all(r["ok"] and r["requests"] == 1 and r["mode"] == "patch" for r in rows)
+
+    p = plan_run([SPEC], 10, 2, "patch", 5, history=history, prices=PRICES, rounds=50)
+
+    m = p["models"]["mock:mock/a"]
+    assert (m["history"], m["samples"], m["patch_rate"]) == ("model", 6, 1.0)
+    # Every past attempt produced a patch, so each task takes exactly one request
+    assert m["requests"] == {"p10": 10, "p50": 10, "p90": 10}
+    assert p["total"]["cost_complete"] and p["total"]["cost_usd"]["p50"] > 0
+    assert p["quota"]["mock"]["remaining_today"] is None
+    assert check_budgets(p) == ("ok", [])
+
+
+def test_budgets_refuse_on_the_median_and_warn_on_p90(history, quota, monkeypatch):
+    # Half the attempts fail, so with 2 attempts a task takes 1 or 2 requests
+    rows = history["mock:mock/a"]
+    for r in rows[:3]:
+        r["ok"] = False
+    p = plan_run([SPEC], 40, 2, "patch", 5, history=history, prices=PRICES, rounds=200)
+    reqs = p["quota"]["mock"]["requests"]
+    assert reqs["p10"] < reqs["p50"] < reqs["p90"]
+
+    monkeypatch.setenv("QUOTA_MOCK", str(int(reqs["p50"]) - 1))
+    verdict, reasons = check_budgets(plan_run([SPEC], 40, 2, "patch", 5, history=history, prices=PRICES))
+    assert verdict == "refuse" and "remaining quota" in reasons[0]
+
+    # 100 already spent today leaves p90 - 1: enough for the median, not for p90
+    monkeypatch.setenv("QUOTA_MOCK", str(int(reqs["p90"]) + 99))
+    quota.record("mock", requests=100)
+    verdict, reasons = check_budgets(plan_run([SPEC], 40, 2, "patch", 5, history=history, prices=PRICES))
+    assert verdict == "warn" and "p90" in reasons[0]
+
+    verdict, reasons = check_budgets(p, max_cost_usd=p["total"]["cost_usd"]["p50"] / 2)
+    assert verdict == "refuse" and reasons[0].startswith("cost_usd: median")
+
+
+def test_unseen_model_falls_back_and_is_flagged(quota):
+    p = plan_run([{"provider": "mock", "model": "mock/new"}], 3, 2, "edit", 1, history={}, prices={})
+
+    assert p["models"]["mock:mock/new"]["history"] == "default"
+    assert p["models"]["mock:mock/new"]["cost_usd"] is None and not p["total"]["cost_complete"]
+    verdict, reasons = check_budgets(p)
+    assert verdict == "ok"
+    assert reasons == ["no edit history; assumed every attempt fails for: mock:mock/new", "cost excludes models missing from the price table"]
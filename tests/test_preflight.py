@@ -0,0 +1,27 @@
+import subprocess
+
+from harness import preflight
+
+
+def test_file_hints_follow_the_requested_commit(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    repo = tmp_path / ".cache" / "repos" / "o" / "r"
+    repo.mkdir(parents=True)
+    git = ["git", "-c", "user.name=t", "-c", "user.email=t@t"]
+    subprocess.run(git + ["init", "-q"], cwd=repo, check=True)
+    commits = []
+    for name in ("header_parser.py", "header_reader.py"):
+        for old in repo.glob("*.py"):
+            old.unlink()
+        (repo / name).write_text("x = 1\n")
+        subprocess.run(git + ["add", "-A"], cwd=repo, check=True)
+        subprocess.run(git + ["commit", "-qm", name], cwd=repo, check=True)
+        commits.append(subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo, capture_output=True, text=True, check=True).stdout.strip())
+    monkeypatch.setattr(preflight, "_ls_files", {})
+
+    # Listed once per (repo, commit): a later commit of the same repo is not served the first one's paths
+    assert preflight.repo_file_hints("o/r", ("header",), commit=commits[0]) == ["header_parser.py"]
+    assert preflight.repo_file_hints("o/r", ("header",), commit=commits[1]) == ["header_reader.py"]
+    assert set(preflight._ls_files) == {("o/r", commits[0]), ("o/r", commits[1])}
+    assert preflight.repo_file_hints("o/r", ("header",), commit="0" * 40) == []
+    assert ("o/r", "0" * 40) not in preflight._ls_files
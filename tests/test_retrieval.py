@@ -0,0 +1,38 @@
+import subprocess
+
+from harness.agent import retrieval
+
+
+def _fixture(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    repo = tmp_path / ".cache" / "repos" / "o" / "r"
+    repo.mkdir(parents=True)
+    (repo / "parser.py").write_text("def parse_header(line):\n    return line.split(':')\n")
+    git = ["git", "-c", "user.name=t", "-c", "user.email=t@t"]
+    subprocess.run(git + ["init", "-q"], cwd=repo, check=True)
+    subprocess.run(git + ["add", "."], cwd=repo, check=True)
+    subprocess.run(git + ["commit", "-qm", "base"], cwd=repo, check=True)
+    return subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo, capture_output=True, text=True, check=True).stdout.strip()
+
+
+def _instance(commit):
+    return {"instance_id": "o__r-1", "repo": "o/r", "base_commit": commit, "problem_statement": "parse_header breaks on colons"}
+
+
+def test_snippets_come_from_the_base_commit(tmp_path, monkeypatch):
+    commit = _fixture(tmp_path, monkeypatch)
+    obj = retrieval.retrieve_for_instance(_instance(commit))
+    assert [s["path"] for s in obj["snippets"]] == ["parser.py"]
+    assert (tmp_path / ".cache" / "retrieval" / "o__r-1.json").exists()
+    assert not retrieval._key_locks
+
+
+def test_unresolvable_commit_is_not_indexed_or_cached(tmp_path, monkeypatch):
+    _fixture(tmp_path, monkeypatch)
+    missing = "0" * 40
+    obj = retrieval.retrieve_for_instance(_instance(missing))
+    assert obj["snippets"] == [] and obj["error"]
+    assert retrieval.get_index("o/r", missing) is None
+    assert ("o/r", missing) not in retrieval._indexes
+    assert not (tmp_path / ".cache" / "retrieval" / "o__r-1.json").exists()
+    assert not retrieval._key_locks
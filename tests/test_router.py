@@ -0,0 +1,76 @@
+import pytest
+
+from harness import latency, router
+from harness.latency import HedgedChat
+from harness.providers.mock import MockChat
+from harness.providers.openai_compat import OpenAICompatError
+from harness.quota import QuotaLedger
+from harness.router import Backend, RoutedChat, backend_specs
+
+MSG = [{"role": "user", "content": "fix it"}]
+
+
+class Failing(MockChat):
+    def __init__(self, error):
+        super().__init__("m")
+        self.error = error
+        self.calls = 0
+
+    def chat(self, *args, **kwargs):
+        self.calls += 1
+        raise OpenAICompatError(self.error)
+
+
+@pytest.fixture(autouse=True)
+def quota(tmp_path, monkeypatch):
+    ledger = QuotaLedger(tmp_path / "ledger.json")
+    monkeypatch.setattr(latency, "QUOTA", ledger)
+    monkeypatch.setattr(router, "QUOTA", ledger)
+    return ledger
+
+
+def _routed(primary_client, spec=None):
+    spec = spec or {"provider": "a", "model": "m", "backends": [{"preference": 2.0}, {"provider": "b", "model": "m-b"}]}
+    specs = backend_specs(spec)
+    clients = [primary_client, MockChat("m-b")]
+    return RoutedChat("m", [Backend(s, HedgedChat(c, s["provider"])) for s, c in zip(specs, clients)])
+
+
+def test_preferred_backend_serves_when_healthy():
+    chat = _routed(MockChat("m"))
+    _, meta = chat.chat(MSG)
+    assert meta["backend"] == "a:m" and meta["failovers"] == 0
+
+
+def test_errors_fail_over_and_lower_the_score():
+    failing = Failing("HTTP Error 500: boom")
+    chat = _routed(failing)
+    _, meta = chat.chat(MSG)
+    assert meta["backend"] == "b:m-b" and meta["failovers"] == 1
+    stats = chat.stats()
+    assert stats["failovers"] == 1 and stats["backends"]["a:m"]["errors"] == 1
+    # A 100% error rate scores the preferred backend below the other one
+    chat.chat(MSG)
+    assert failing.calls == 1 and [b.name for b in chat.ranked()] == ["b:m-b", "a:m"]
+
+
+def test_429_benches_the_backend(monkeypatch):
+    monkeypatch.setenv("ROUTER_THROTTLE_S", "60")
+    chat = _routed(Failing("HTTP Error 429: Too Many Requests"))
+    chat.chat(MSG)
+    assert [b.name for b in chat.ranked()][-1] == "a:m"
+
+
+def test_exhausted_quota_moves_traffic(monkeypatch, quota):
+    monkeypatch.setenv("QUOTA_A", "1")
+    quota.record("a")
+    chat = _routed(MockChat("m"))
+    _, meta = chat.chat(MSG)
+    assert meta["backend"] == "b:m-b"
+
+
+def test_all_backends_failing_raises():
+    spec = {"provider": "a", "model": "m"}
+    chat = RoutedChat("m", [Backend(backend_specs(spec)[0], HedgedChat(Failing("HTTP Error 503"), "a"))])
+    with pytest.raises(OpenAICompatError, match="503"):
+        chat.chat(MSG)
@@ -0,0 +1,66 @@
+import subprocess
+
+from harness import sampling
+from harness.sampling import BaseFiles, rank_candidates
+
+
+def _fixture(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    repo = tmp_path / ".cache" / "repos" / "o" / "r"
+    repo.mkdir(parents=True)
+    (repo / "parser.py").write_text("def parse_header(line):\n    return line.split(':')\n")
+    git = ["git", "-c", "user.name=t", "-c", "user.email=t@t"]
+    subprocess.run(git + ["init", "-q"], cwd=repo, check=True)
+    subprocess.run(git + ["add", "."], cwd=repo, check=True)
+    subprocess.run(git + ["commit", "-qm", "base"], cwd=repo, check=True)
+    return subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo, capture_output=True, text=True, check=True).stdout.strip()
+
+
+def _diff(old, new):
+    return (
+        "--- a/parser.py\n+++ b/parser.py\n@@ -1,2 +1,2 @@\n"
+        f" def parse_header(line):\n-    {old}\n+    {new}\n"
+    )
+
+
+STALE = _diff("return line.split(';')", "return line.split(';', 1)")
+GOOD = _diff("return line.split(':')", "return line.split(':', 1)")
+
+
+def test_applicable_candidate_ranks_first(tmp_path, monkeypatch):
+    commit = _fixture(tmp_path, monkeypatch)
+
+    best, info = rank_candidates([STALE, GOOD, GOOD], BaseFiles("o/r", commit))
+
+    assert best == GOOD
+    assert (info["valid"], info["unique"]) == (3, 2)
+    assert info["applicability"] == [1.0, 0.0]
+
+
+def test_preflight_runs_in_rank_order_until_one_passes(tmp_path, monkeypatch):
+    commit = _fixture(tmp_path, monkeypatch)
+    seen = []
+
+    def preflight(diff):
+        seen.append(diff)
+        return diff == STALE
+
+    best, info = rank_candidates([STALE, GOOD], BaseFiles("o/r", commit), preflight)
+
+    assert seen == [GOOD, STALE] and best == STALE
+    assert info["preflight"] == [False, True]
+
+
+def test_slow_git_show_scores_nothing_and_is_not_memoized(tmp_path, monkeypatch):
+    commit = _fixture(tmp_path, monkeypatch)
+    files = BaseFiles("o/r", commit)
+    real = subprocess.run
+
+    def slow(cmd, **kw):
+        assert kw["timeout"] > 0
+        raise subprocess.TimeoutExpired(cmd, kw["timeout"])
+
+    monkeypatch.setattr(sampling.subprocess, "run", slow)
+    assert sampling.applicability(GOOD, files) == 0.0
+    monkeypatch.setattr(sampling.subprocess, "run", real)
+    assert sampling.applicability(GOOD, files) == 1.0
@@ -0,0 +1,70 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from conftest import REPO
+from harness.sharding import merge_shards
+
+
+def _rows(path):
+    with open(path) as f:
+        return [json.loads(ln) for ln in f if ln.strip()]
+
+
+def _run_shards(instances, models, env, count, run_id="sh"):
+    procs = [
+        subprocess.Popen(
+            [sys.executable, str(REPO / "scripts" / "run_predictions.py"), "--run_id", run_id, "--instances", instances,
+             "--models_config", models, "--attempts", "1", "--shard", f"{i}/{count}"],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        for i in range(count)
+    ]
+    for p in procs:
+        _, err = p.communicate(timeout=120)
+        assert p.returncode == 0, err.decode()
+
+
+def test_shard_processes_merge(mock_run, tmp_path):
+    instances, models, env = mock_run(12, models=("mock/a", "mock/b"))
+    _run_shards(instances, models, env, 3)
+
+    manifest = merge_shards("sh")
+
+    preds = _rows(tmp_path / "runs/sh/predictions.jsonl")
+    assert len(preds) == manifest["predictions"] == 24
+    assert len({(r["instance_id"], r["model_name_or_path"]) for r in preds}) == 24
+    assert len(_rows(tmp_path / "runs/sh/logs/attempts.jsonl")) == 24
+    assert len(_rows(tmp_path / "runs/sh/logs/usage.jsonl")) == 24
+    metrics = manifest["metrics"]
+    assert metrics["patch_quality"]["instances"] == 24
+    assert metrics["latency"]["attempts"] == 24
+    assert sum(b["requests"] for b in metrics["usage"]["backends"].values()) == 24
+
+
+def test_merge_rejects_digest_mismatch(mock_run, tmp_path):
+    instances, models, env = mock_run(6)
+    _run_shards(instances, models, env, 2)
+    mp = tmp_path / "runs/sh/shards/1-of-2/manifest.json"
+    m = json.loads(mp.read_text())
+    m["shard"]["units_digest"] = "0" * 40
+    mp.write_text(json.dumps(m))
+
+    with pytest.raises(RuntimeError, match="digest"):
+        merge_shards("sh")
+
+
+def test_merge_treats_cancelled_rows_as_gaps(mock_run, tmp_path):
+    instances, models, env = mock_run(6)
+    _run_shards(instances, models, env, 2)
+    pp = tmp_path / "runs/sh/shards/0-of-2/predictions.jsonl"
+    rows = _rows(pp)
+    rows[0].update({"status": "cancelled", "model_patch": ""})
+    pp.write_text("".join(json.dumps(r) + "\n" for r in rows))
+
+    with pytest.raises(RuntimeError, match="cancelled"):
+        merge_shards("sh")
@@ -0,0 +1,97 @@
+import json
+import threading
+import time
+import urllib.request
+
+import pytest
+import yaml
+
+from harness import status
+from harness.orchestrator import orchestrate_predictions
+from harness.providers.mock import MockChat
+from harness.providers.openai_compat import OpenAICompatError
+from harness.status import RunStatus, StatusChat, serve_status
+
+
+def _get(url):
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+    with opener.open(url, timeout=5) as r:
+        return json.loads(r.read())
+
+
+def _run(snapshot, run_id):
+    return next(r for r in snapshot["runs"] if r["run_id"] == run_id)
+
+
+def test_endpoint_shows_a_run_live_and_finished(mock_run, monkeypatch):
+    instances, models, _ = mock_run(6)
+    monkeypatch.setenv("WORKERS", "2")
+    monkeypatch.setenv("MOCK_LATENCY", "0.4")
+    url = serve_status(0)
+    run = threading.Thread(
+        target=orchestrate_predictions,
+        kwargs={"run_id": "live", "instances_path": instances, "model_specs": yaml.safe_load(open(models))["models"], "attempts": 1},
+    )
+    run.start()
+    t0 = time.time()
+    live = None
+    while time.time() - t0 < 5:
+        snap = _get(url)
+        live = next((r for r in snap["runs"] if r["run_id"] == "live"), None)
+        if live and live["tasks"]["running"]:
+            break
+        time.sleep(0.05)
+    run.join(30)
+
+    assert live["state"] == "running" and live["workers"] == 2
+    assert live["tasks"]["total"] == 6 and live["tasks"]["running"] <= 2
+    assert live["slowest"] and all(t["model"] == "mock:mock/a" and t["instance_id"].startswith("x__y-") for t in live["slowest"])
+
+    done = _run(_get(url), "live")
+    assert done["state"] == "done" and done["eta_s"] is None
+    assert done["tasks"] == {"total": 6, "done": 6, "running": 0} and not done["slowest"]
+    m = done["models"]["mock:mock/a"]
+    assert (m["queued"], m["running"], m["done"], m["calls"], m["calls_inflight"]) == (0, 0, 6, 6, 0)
+    assert m["error_rate"] == 0.0 and m["retries_per_task"] == 0.0
+    assert done["tasks_per_min"] > 0
+
+
+class Flaky(MockChat):
+    def __init__(self):
+        super().__init__("m")
+        self.calls = 0
+
+    def chat(self, *args, **kwargs):
+        self.calls += 1
+        if self.calls % 2:
+            raise OpenAICompatError("HTTP Error 500: boom")
+        return super().chat(*args, **kwargs)
+
+
+def test_snapshot_counts_failed_calls_and_tracks_task_stage():
+    st = RunStatus("unit", {("mock", "m"): 2}, workers=1)
+    chat = StatusChat(Flaky(), st, "mock:m")
+    seen = {}
+
+    def task():
+        status.set_stage("model", attempt=1)
+        seen["mid"] = st.snapshot()
+        for _ in range(2):
+            with pytest.raises(OpenAICompatError):
+                chat.chat([{"role": "user", "content": "x"}])
+            chat.chat([{"role": "user", "content": "x"}])
+        return {"attempts": 2, "reasks": 1}
+
+    st.submitted(("mock", "m"))
+    st.run_task(("mock", "m"), "i-1", task)
+    st.finish()
+
+    mid = seen["mid"]
+    assert [(t["instance_id"], t["stage"], t["attempt"]) for t in mid["slowest"]] == [("i-1", "model", 1)]
+    assert mid["models"]["mock:m"]["running"] == 1
+    m = st.snapshot()["models"]["mock:m"]
+    assert (m["queued"], m["done"], m["calls"], m["call_errors"]) == (1, 1, 4, 2)
+    assert m["error_rate"] == 0.5
+    # One extra attempt plus one re-ask for the single finished task
+    assert m["retries_per_task"] == 2.0
+    assert status.current_task() is None
@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+
+from harness import deadline
+from harness.agent import symbol_index
+from harness.agent.symbol_index import MAX_REFS_PER_NAME, build_index, find_references, get_symbol_index
+
+
+def _repo(root, files=70, uses=4):
+    root.mkdir()
+    (root / "lib.py").write_text("def helper():\n    return 1\n")
+    for i in range(files):
+        (root / f"m{i}.py").write_text("from lib import helper\n" + "".join(f"x{k} = helper()\n" for k in range(uses)))
+    return [p.name for p in root.iterdir()]
+
+
+def test_spawn_pool_build_and_true_reference_count(tmp_path):
+    paths = _repo(tmp_path / "r")
+    index = build_index(tmp_path / "r", paths, workers=2)
+
+    res = find_references(index, "helper", limit=10)
+    # 70 files x 4 calls = 280 uses; stored lists stop at the cap
+    assert res["total"] == 280 and len(index["refs"]["helper"]) == MAX_REFS_PER_NAME
+    assert res["truncated"] and len(res["references"]) == 10
+
+
+def test_builds_do_not_block_other_repos(tmp_path, monkeypatch):
+    monkeypatch.setattr(symbol_index, "SYMBOLS_DIR", tmp_path / "symbols")
+    paths = _repo(tmp_path / "r", files=2)
+    started = threading.Event()
+    real = symbol_index.build_index
+
+    def slow_build(root, p, workers=None):
+        if "slow" in str(root):
+            started.set()
+            time.sleep(1.5)
+        return real(root, p, workers=1)
+
+    monkeypatch.setattr(symbol_index, "build_index", slow_build)
+    (tmp_path / "slow").symlink_to(tmp_path / "r")
+    t = threading.Thread(target=get_symbol_index, args=(tmp_path / "slow", "o/slow", "c1", paths))
+    t.start()
+    started.wait(5)
+    t0 = time.time()
+    get_symbol_index(tmp_path / "r", "o/fast", "c1", paths)
+    assert time.time() - t0 < 1.0
+
+    # A second caller of the cold repo waits no longer than its deadline
+    with deadline.bind(None, 0.2), pytest.raises(deadline.DeadlineExceeded):
+        get_symbol_index(tmp_path / "slow", "o/slow", "c1", paths)
+    t.join()
+    assert ("o/slow", "c1") not in symbol_index._key_locks
+
+
+def test_unverified_workspace_index_is_not_persisted(tmp_path, monkeypatch):
+    from harness.agent.edit_controller import _Session, _session_dispatch
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(symbol_index, "SYMBOLS_DIR", tmp_path / "symbols")
+    _repo(tmp_path / "ws", files=2)
+    res = _session_dispatch(_Session(tmp_path / "ws", "fx/sym", None), {"tool": "FIND_SYMBOL", "name": "helper"})
+    assert res["ok"] and res["matches"][0]["path"] == "lib.py"
+    assert not (tmp_path / "symbols").exists()
+    res = _session_dispatch(_Session(tmp_path / "ws", "fx/sym", "c1"), {"tool": "FIND_SYMBOL", "name": "helper"})
+    assert res["ok"] and (tmp_path / "symbols" / "fx__sym" / "c1.json").exists()
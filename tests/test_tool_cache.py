@@ -0,0 +1,74 @@
+import shutil
+import subprocess
+
+import pytest
+
+from harness.agent import edit_controller
+from harness.agent.edit_controller import _prepare_workspace, _Session, _session_dispatch
+from harness.agent.tool_cache import ToolResultCache, affected
+
+
+def test_lru_hit_and_eviction():
+    cache = ToolResultCache(max_bytes=400)
+    cache.put(("r", "c", "READ", "a"), {"ok": True, "content": "x" * 60})
+    cache.put(("r", "c", "READ", "b"), {"ok": True, "content": "y" * 60})
+    assert cache.get(("r", "c", "READ", "a"))["content"] == "x" * 60
+    # "a" was used last, so "b" goes first
+    for k in "cdef":
+        cache.put(("r", "c", "READ", k), {"ok": True, "content": k * 60})
+    assert cache.get(("r", "c", "READ", "b")) is None
+    stats = cache.stats()
+    assert stats["evictions"] >= 1 and stats["bytes"] <= 400 and stats["hits"] == 1
+
+
+def test_affected_paths():
+    assert affected("READ", {"path": "./pkg/a.py"}, {"pkg/a.py"})
+    assert not affected("READ", {"path": "pkg/b.py"}, {"pkg/a.py"})
+    assert not affected("GREP", {"pattern": "x", "glob": "*.txt"}, {"pkg/a.py"})
+    assert affected("LIST_TREE", {}, {"pkg/a.py"})
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    monkeypatch.setattr(edit_controller, "TOOL_CACHE", ToolResultCache(max_bytes=1 << 20))
+    (tmp_path / "a.py").write_text("x = 1\n")
+    return tmp_path
+
+
+def test_session_reuses_results_until_the_path_is_replaced(session):
+    first = _Session(session, "fx/calc", "c1")
+    read = {"tool": "READ", "path": "a.py"}
+    assert "cached" not in _session_dispatch(first, read)
+    second = _Session(session, "fx/calc", "c1")
+    assert _session_dispatch(second, dict(read))["cached"]
+    assert _session_dispatch(second, {"tool": "REPLACE", "path": "a.py", "old": "x = 1", "new": "x = 2"})["ok"]
+    res = _session_dispatch(second, dict(read))
+    assert "cached" not in res and "x = 2" in res["content"]
+    assert edit_controller.TOOL_CACHE.stats()["bypassed"] == 1
+    # The other attempt's view of the snapshot is unchanged
+    assert "x = 1" in _session_dispatch(_Session(session, "fx/calc", "c1"), dict(read))["content"]
+
+
+def test_unverified_snapshot_is_never_cached(session):
+    read = {"tool": "READ", "path": "a.py"}
+    _session_dispatch(_Session(session, "fx/calc", None), read)
+    assert "cached" not in _session_dispatch(_Session(session, "fx/calc", None), dict(read))
+    assert edit_controller.TOOL_CACHE.stats()["entries"] == 0
+
+
+def test_workspace_is_verified_only_at_the_requested_commit(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    repo = tmp_path / ".cache" / "repos" / "fx" / "calc"
+    repo.mkdir(parents=True)
+    (repo / "a.py").write_text("x = 1\n")
+    git = ["git", "-c", "user.name=t", "-c", "user.email=t@t"]
+    subprocess.run(git + ["init", "-q"], cwd=repo, check=True)
+    subprocess.run(git + ["add", "."], cwd=repo, check=True)
+    subprocess.run(git + ["commit", "-qm", "base"], cwd=repo, check=True)
+    commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo, capture_output=True, text=True, check=True).stdout.strip()
+    ws, verified = _prepare_workspace("fx/calc", commit)
+    assert verified and (ws / "a.py").read_text() == "x = 1\n"
+    shutil.rmtree(ws)
+    ws, verified = _prepare_workspace("fx/calc", "0" * 40)
+    assert not verified
+    shutil.rmtree(ws)
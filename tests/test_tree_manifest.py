@@ -0,0 +1,54 @@
+from harness.agent import tree_manifest
+from harness.agent.edit_controller import _Session, _session_dispatch
+from harness.agent.tree_manifest import get_manifest, list_tree, overlay_entries
+
+
+def _tree(root, n=12):
+    for i in range(n):
+        d = root / "pkg" / ("sub" if i % 2 else "")
+        d.mkdir(parents=True, exist_ok=True)
+        (d / f"m{i:02d}.py").write_text(f"def f{i}():\n    pass\n")
+    (root / "README.md").write_text("hi\n")
+
+
+def test_list_tree_pages_filters_and_folds(tmp_path):
+    _tree(tmp_path)
+    entries = get_manifest(tmp_path, "fx/tree", None)
+    first = list_tree(entries, "pkg", glob="*.py", limit=5)
+    assert first["total"] == 12 and first["truncated"] and len(first["entries"]) == 5
+    seen = [e["path"] for e in first["entries"]]
+    cursor = first["next_cursor"]
+    while cursor:
+        page = list_tree(entries, "pkg", glob="*.py", limit=5, cursor=cursor)
+        seen += [e["path"] for e in page["entries"]]
+        cursor = page.get("next_cursor")
+    assert len(seen) == len(set(seen)) == 12
+    folded = list_tree(entries, "pkg", depth=1)
+    sub = [e for e in folded["entries"] if e.get("type") == "dir"]
+    assert sub == [{"path": "pkg/sub/", "type": "dir", "files": 6, "bytes": sub[0]["bytes"]}]
+
+
+def test_manifest_is_reused_and_overlaid(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root = tmp_path / "ws"
+    _tree(root)
+    first = get_manifest(root, "fx/tree", "c1")
+    assert (tmp_path / ".cache" / "manifests" / "fx__tree" / "c1.json").exists()
+    # A new file in the workspace does not show in the shared manifest...
+    (root / "new.py").write_text("x = 1\n")
+    monkeypatch.setattr(tree_manifest, "_manifests", {})
+    again = get_manifest(root, "fx/tree", "c1")
+    assert again == first and "new.py" not in {e["path"] for e in again}
+    # ...only in the attempt's overlay, which also drops deleted files
+    (root / "README.md").unlink()
+    paths = {e["path"] for e in overlay_entries(again, root, {"new.py", "README.md"})}
+    assert "new.py" in paths and "README.md" not in paths
+
+
+def test_unverified_workspace_is_not_persisted(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root = tmp_path / "ws"
+    _tree(root)
+    res = _session_dispatch(_Session(root, "fx/tree", None), {"tool": "LIST_TREE", "limit": 3})
+    assert res["ok"] and res["total"] == 13
+    assert not (tmp_path / ".cache" / "manifests").exists()
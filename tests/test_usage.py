@@ -0,0 +1,82 @@
+import json
+
+import pytest
+import yaml
+
+from harness import usage
+from harness.orchestrator import orchestrate_predictions
+from harness.status import RunStatus, set_stage
+from harness.usage import UsageLedger, record_call, retrying
+from harness.warehouse import connect, cost_report, ingest
+
+PRICES = {"mock:mock/a": {"input": 1000.0, "output": 2000.0, "cached_input": 100.0}}
+
+
+def _rows(path):
+    with open(path) as f:
+        return [json.loads(ln) for ln in f if ln.strip()]
+
+
+def test_ledger_rows_carry_the_task_and_price_per_backend(tmp_path):
+    ledger = UsageLedger(str(tmp_path / "usage.jsonl"))
+    st = RunStatus("u", {("mock", "mock/a"): 1}, workers=1)
+    meta = {"elapsed": 0.5, "prompt_tokens": 1000, "completion_tokens": 100, "cached_tokens": 400}
+
+    def task():
+        set_stage("model", attempt=0)
+        record_call("mock:mock/a", meta)
+        with retrying():
+            record_call("mock:mock/b", None, ok=False, error="HTTP Error 500: " + "x" * 400)
+        record_call("mock:mock/a", meta, hedge=True)
+        return {"attempts": 1}
+
+    record_call("mock:mock/a", meta)  # outside a run: dropped
+    with usage.bind(ledger):
+        st.run_task(("mock", "mock/a"), "i-1", task)
+    ledger.close()
+
+    rows = _rows(tmp_path / "usage.jsonl")
+    assert [(r["instance_id"], r["model"], r["stage"], r["attempt"]) for r in rows] == [("i-1", "mock:mock/a", "model", 0)] * 3
+    assert [(r["backend"], r["ok"], r["retry"], r["hedge"]) for r in rows] == [
+        ("mock:mock/a", True, False, False), ("mock:mock/b", False, True, False), ("mock:mock/a", True, False, True),
+    ]
+    assert len(rows[1]["error"]) == 200 and rows[1]["prompt_tokens"] == 0.0
+
+    s = ledger.summary(PRICES)
+    a = s["backends"]["mock:mock/a"]
+    assert (a["requests"], a["hedges"], a["prompt_tokens"], a["cached_tokens"]) == (2, 1, 2000.0, 800.0)
+    # 1200 uncached + 800 cached prompt tokens and 200 completion tokens
+    assert a["cost_usd"] == pytest.approx((1200 * 1000 + 800 * 100 + 200 * 2000) / 1e6)
+    assert s["backends"]["mock:mock/b"]["failed"] == 1 and s["unpriced"] == ["mock:mock/b"]
+    assert s["cost_usd"] == pytest.approx(a["cost_usd"])
+    # A hedge loser finishing after the run closed the ledger is dropped
+    ledger.record(rows[0])
+    assert len(_rows(tmp_path / "usage.jsonl")) == 3 and ledger.totals["mock:mock/a"]["requests"] == 2
+
+
+def test_mock_run_usage_reaches_the_warehouse_cost_report(mock_run, tmp_path):
+    instances, models, _ = mock_run(4)
+    (tmp_path / "prices.yaml").write_text(yaml.safe_dump({"prices": PRICES}))
+    orchestrate_predictions(run_id="c", instances_path=instances, model_specs=yaml.safe_load(open(models))["models"], attempts=1)
+    run = tmp_path / "runs" / "c"
+    rows = _rows(run / "logs" / "usage.jsonl")
+    assert len(rows) == 4 and {r["instance_id"] for r in rows} == {f"x__y-{i}" for i in range(4)}
+    assert all(r["backend"] == "mock:mock/a" and r["ok"] and not r["batch"] for r in rows)
+    manifest = json.loads((run / "manifest.json").read_text())
+    (run / "eval").mkdir()
+    (run / "eval" / "verdicts.jsonl").write_text(
+        "".join(json.dumps({"instance_id": f"x__y-{i}", "model_name_or_path": "mock:mock/a", "verdict": v}) + "\n"
+                for i, v in enumerate(["resolved", "resolved", "unresolved", "empty_patch"]))
+    )
+
+    conn = connect(str(tmp_path / "wh.sqlite"))
+    assert ingest(conn, str(tmp_path))["ingested"] == 4
+    [report] = cost_report(conn, PRICES, "c")
+
+    assert (report["requests"], report["failed"], report["instances"], report["attempts"], report["resolved"]) == (4, 0, 4, 4, 2)
+    assert report["prompt_tokens"] == sum(r["prompt_tokens"] for r in rows)
+    assert report["cost_usd"] == pytest.approx(manifest["metrics"]["usage"]["cost_usd"]) and report["cost_usd"] > 0
+    assert report["usd_per_resolved"] == pytest.approx(report["cost_usd"] / 2)
+    assert report["usd_per_instance"] == pytest.approx(report["cost_usd"] / 4)
+    # Without a price for the backend the cost is unknown rather than zero
+    assert cost_report(conn, {}, "c")[0]["cost_usd"] is None
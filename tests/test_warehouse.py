@@ -0,0 +1,32 @@
+import json
+
+from harness.warehouse import connect, ingest
+
+
+def _write_run(root, run_id, n):
+    d = root / "runs" / run_id
+    d.mkdir(parents=True)
+    with open(d / "predictions.jsonl", "w") as f:
+        for i in range(n):
+            f.write(json.dumps({"instance_id": f"x__y-{i}", "model_name_or_path": "mock:mock/a", "model_patch": "d", "status": "ok"}) + "\n")
+    return d
+
+
+def _count(conn, run_id):
+    return conn.execute("SELECT COUNT(*) FROM predictions WHERE run_id = ?", (run_id,)).fetchone()[0]
+
+
+def test_ingest_replaces_rewritten_and_purges_deleted_files(tmp_path):
+    conn = connect(str(tmp_path / "wh.sqlite"))
+    a = _write_run(tmp_path, "a", 3)
+    _write_run(tmp_path, "b", 2)
+    assert ingest(conn, str(tmp_path))["ingested"] == 2
+    assert (_count(conn, "a"), _count(conn, "b")) == (3, 2)
+
+    (a / "predictions.jsonl").write_text((a / "predictions.jsonl").read_text().splitlines(True)[0])
+    (tmp_path / "runs" / "b" / "predictions.jsonl").unlink()
+    stats = ingest(conn, str(tmp_path))
+
+    assert stats["ingested"] == 1 and stats["purged"] == 1
+    assert (_count(conn, "a"), _count(conn, "b")) == (1, 0)
+    assert conn.execute("SELECT COUNT(*) FROM files").fetchone()[0] == 1